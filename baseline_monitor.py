@@ -1,10 +1,12 @@
 import requests
+from requests.adapters import HTTPAdapter
+import urllib3.connection
+import urllib3.connectionpool
+import urllib3.exceptions
 import time
 import webbrowser
 import os
 import subprocess
-from win10toast import ToastNotifier
-from bs4 import BeautifulSoup
 import random
 import json
 import logging
@@ -13,13 +15,32 @@ import tempfile
 import shutil
 import argparse
 import hashlib
+import importlib
+import importlib.util
 import re
 import glob
+import gzip
+import io
 import signal
+import socket
 import sys
 import threading
-from plyer import notification as plyer_notification
-import pygame
+import contextlib
+import functools
+import collections
+import email.utils
+import abc
+import asyncio
+import bisect
+import codecs
+import http.server
+import queue
+import sqlite3
+import concurrent.futures
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from html import escape as html_escape
+from html.parser import HTMLParser
 
 # 配置日志
 logging.basicConfig(
@@ -44,6 +65,58 @@ def parse_arguments():
     parser.add_argument("--only-eligible", action="store_true", help="仅检查Eligible Tasks部分，不检查Training Tasks")
     parser.add_argument("--display-expected", action="store_true", help="显示预期的Training Tasks列表，即使未检测到任何变化")
     parser.add_argument("--mp3-voice-file", type=str, default="baseline_voice.mp3", help="自定义MP3语音文件路径")
+    parser.add_argument("--fingerprint-rules", type=str, default=None, help="整页指纹规范化规则JSON文件路径")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式读取页面，只保留提取规则中container匹配的任务部分，读完后停止下载")
+    parser.add_argument("--stream-chunk", type=int, default=16384, metavar="BYTES", help="流式读取每块的字节数（默认16384）")
+    parser.add_argument("--extraction-profile", type=str, default=None, metavar="FILE",
+                        help="按任务部分配置的CSS/XPath提取规则JSON文件，修改后自动重新加载")
+    parser.add_argument("--parser", type=str, default="html.parser", choices=["auto"] + PARSER_BACKEND_ORDER,
+                        help="HTML解析后端，auto表示使用已安装的最快后端")
+    parser.add_argument("--parse-workers", type=int, default=0, metavar="N",
+                        help="在N个解析进程中解析页面，监控账号很多时避免解析在主进程中排队，0表示不启用")
+    parser.add_argument("--verify-parsers", type=str, default=None, metavar="DIR",
+                        help="用目录中保存的HTML页面验证各解析后端结果一致后退出")
+    parser.add_argument("--bless", action="store_true",
+                        help="与--verify-parsers一起使用，为没有.expected.json的页面用html.parser的结果创建基准")
+    parser.add_argument("--replay", type=str, default=None, metavar="DIR",
+                        help="把目录中保存的HTML页面当作连续检查结果回放，报告各阶段耗时和检测正确性后退出")
+    parser.add_argument("--replay-repeat", type=int, default=1, metavar="N",
+                        help="回放的轮数，轮数越多计时越稳定")
+    parser.add_argument("--check-once", action="store_true",
+                        help="无界面检查：用缓存的cookie检查一次并输出任务后退出，失败时返回非零退出码")
+    parser.add_argument("--accounts", type=str, default=None, metavar="FILE",
+                        help="多账号配置JSON文件，在一个进程中同时监控文件中的所有账号")
+    parser.add_argument("--poll-bounds", type=str, default="5-600",
+                        help="自适应调度的检查间隔上下限(秒)，格式为'最小值-最大值'")
+    parser.add_argument("--hourly-budget", type=int, default=0,
+                        help="每个账号每小时最多请求次数，0表示不限制")
+    parser.add_argument("--history-db", type=str, default=CHECK_HISTORY_DB,
+                        help="检查历史数据库文件，设为空字符串时不记录")
+    parser.add_argument("--history", type=str, nargs="+", default=None, metavar="QUERY",
+                        help="查询检查历史后退出: summary [小时数] | last <任务名称> | open [任务名称] | current")
+    parser.add_argument("--snapshot-dir", type=str, default="debug_snapshots",
+                        help="调试模式下保存页面快照的目录")
+    parser.add_argument("--snapshot-ring", type=int, default=20,
+                        help="调试模式下每个部分保留的快照数量")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="在本机该端口提供Prometheus格式的指标(/metrics)，0表示不启用")
+    parser.add_argument("--metrics-file", type=str, default=None,
+                        help="定期把Prometheus格式的指标写入该文件")
+    parser.add_argument("--notify", type=str, action="append", default=None, metavar="SINK",
+                        help="通知目标，可重复指定: desktop、console、file=路径、webhook=URL，默认desktop")
+    parser.add_argument("--notify-timeout", type=float, default=10, help="每次发送通知的超时时间(秒)")
+    parser.add_argument("--notify-retries", type=int, default=2, help="通知发送失败后的重试次数")
+    parser.add_argument("--webhook-receiver", type=int, default=None, metavar="PORT",
+                        help="在本机端口运行webhook测试服务，打印收到的通知，不进行监控")
+    parser.add_argument("--daemon", action="store_true",
+                        help="后台运行：不读取标准输入、不弹出登录提示，只使用缓存的cookie，通过控制接口操作")
+    parser.add_argument("--control-port", type=int, default=0,
+                        help="在本机该端口提供HTTP控制接口，0表示不启用")
+    parser.add_argument("--cookie-warn-before", type=int, default=43200,
+                        help="必要cookie在这么多秒内过期时提前提醒并准备新cookie，0表示不提醒（默认43200）")
+    parser.add_argument("--state-max-age", type=int, default=3600,
+                        help="启动时信任已保存比较基准的最长时间(秒)，0表示每次启动重新记录")
     
     args = parser.parse_args()
     
@@ -63,6 +136,30 @@ MAX_CHECK_INTERVAL = 15
 # Cookie缓存文件
 COOKIE_CACHE_FILE = "cookie_cache.json"
 
+# 访问Baseline必需的cookie，缺少时视为无效；它们的过期时间决定登录何时失效
+REQUIRED_COOKIES = ('_baseline_session', 'acn01')
+
+# 任务检测时间记录文件，自适应调度据此判断任务经常出现的时段
+DETECTION_HISTORY_FILE = "detection_history.json"
+
+# 页面比较基准保存文件，重启后据此继续比较，不必重新做一次不提醒的首次记录
+BASELINE_STATE_FILE = "baseline_state.json"
+
+# 检查历史数据库，每次检查的结果和任务出现的时间段记录在其中，供--history查询
+CHECK_HISTORY_DB = "check_history.db"
+
+# 请求头，会话创建时设置一次，之后每次请求复用
+REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1"
+}
+
+# 请求超时设置：连接超时15秒，读取超时45秒
+REQUEST_TIMEOUT = (15, 45)
+
 # 全局配置
 config = {
     "debug": False,
@@ -72,15 +169,23 @@ config = {
     "check_training": False,
     "only_eligible": False,
     "display_expected": False,
-    "mp3_voice_file": "baseline_voice.mp3"  # 默认MP3语音文件路径
+    "mp3_voice_file": "baseline_voice.mp3",  # 默认MP3语音文件路径
+    "fingerprint_rules": None,  # 整页指纹规范化规则文件
+    "extraction_profile": None,  # 按任务部分配置的CSS/XPath提取规则文件
+    "daemon": False,  # 后台运行，不读取标准输入、不打开登录浏览器
+    "stream": False,  # 流式读取页面，只保留提取规则锚点匹配的任务部分
+    "stream_chunk": 16384,  # 流式读取每块的字节数
+    "parser": "html.parser",  # HTML解析后端
+    "poll_bounds": (5, 600),  # 自适应调度的检查间隔上下限(秒)
+    "hourly_budget": 0,  # 每个账号每小时最多请求次数，0表示不限制
+    "state_max_age": 3600,  # 启动时信任已保存比较基准的最长时间(秒)，0表示不使用
+    "cookie_warn_before": 43200,  # 必要cookie在这么多秒内过期时提前提醒(秒)，0表示不提醒
+    "snapshot_dir": "debug_snapshots",  # 调试模式下的页面快照存档目录
+    "snapshot_ring": 20,  # 每个部分保留的快照数量
+    "metrics_file": None  # 定期写入指标的文件
 }
 
-# 初始化通知器
-toaster = ToastNotifier()
 
-# 最新会话cookies缓存
-recent_cookies = None
-recent_browser = None
 
 # 任务检测关键词
 TASK_INDICATORS = [
@@ -141,19 +246,6 @@ SPECIFIC_TASK_EXPECTED_COUNTS = {
     "Search - Podcasts Hints (suggestions) Training": 1
 }
 
-# 用于保存之前Eligible Tasks部分的HTML内容和哈希值
-previous_eligible_section_html = ""
-previous_eligible_section_hash = ""
-
-# 添加变量用于保存Training Tasks的哈希值
-previous_training_section_hash = ""
-
-# 添加变量用于保存Eligible Tasks的实际任务文本，用于比较变化
-previous_eligible_task_texts = []
-
-# 添加变量用于保存Training Tasks的实际任务文本，用于比较变化
-previous_training_task_texts = []
-
 # 需要排除的非任务文本
 NON_TASK_TEXTS = [
     "view my tasks", "next task", "task status", "task history", 
@@ -165,39 +257,758 @@ NON_TASK_TEXTS = [
     "completed", "open", "closed", "in progress", "overdue", "details"
 ]
 
+# 脚本中的时间戳（ISO格式和10/13位Unix时间）
+_SCRIPT_TIMESTAMP = re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?'
+                               r'|\b1\d{9}(?:\d{3})?\b')
+
+def _normalize_script_timestamps(match):
+    """只替换<script>块内的时间戳，页面文字中的日期和编号（如任务截止日期）保留"""
+    return match.group(1) + _SCRIPT_TIMESTAMP.sub("TIMESTAMP", match.group(2)) + match.group(3)
+
+# 整页指纹的规范化规则：(名称, 正则, 替换文本或函数)
+# 去掉每次请求都会变化但与任务无关的内容（CSRF令牌、nonce、已知的时间戳属性、脚本中的时间戳），再计算哈希；
+# 页面文字不做替换，只有日期或编号不同的任务变化不会被忽略
+PAGE_NORMALIZATION_RULES = [
+    ("csrf_meta", r'<meta[^>]*name=["\']csrf-(?:token|param)["\'][^>]*>', '<meta csrf>'),
+    ("token_input", r'<input[^>]*(?:csrf|authenticity_token|_token|nonce)[^>]*>', '<input token>'),
+    ("nonce_attr", r'\snonce=["\'][^"\']*["\']', ''),
+    ("nonce_value", r'(["\']?nonce["\']?\s*[:=]\s*)["\'][^"\']*["\']', r'\1""'),
+    ("timestamp_attr", r'(\sdata-(?:ts|timestamp|time|server-time|generated-at|rendered-at|request-id)=)(["\'])[^"\']*\2', r'\1""'),
+    ("script_timestamp", r'(?s)(<script\b[^>]*>)(.*?)(</script\s*>)', _normalize_script_timestamps),
+]
+
+# 编译后的规范化规则，启动时根据配置生成一次
+compiled_normalization_rules = []
+
+# 整页指纹快速路径的命中统计
+fingerprint_stats = {"checks": 0, "hits": 0}
+
+class StageTimer:
+    """页面处理各阶段的累计耗时和调用次数
+
+    用stage()包住代码块或用timed()装饰函数；未启用时只多一次属性判断，不影响正常轮询
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.totals = collections.defaultdict(float)
+        self.counts = collections.Counter()
+        self.listeners = []  # 每次记录时调用listener(阶段, 秒数)，用于导出指标
+
+    def reset(self):
+        self.totals.clear()
+        self.counts.clear()
+
+    def add(self, name, seconds):
+        self.totals[name] += seconds
+        self.counts[name] += 1
+        for listener in self.listeners:
+            listener(name, seconds)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """把函数的每次调用计入name阶段"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+# 页面处理阶段计时，回放基准测试或导出指标时启用
+stage_timer = StageTimer()
+
+def compile_normalization_rules(extra_rules=None, include_defaults=True):
+    """编译整页指纹的规范化规则，extra_rules为[{"name", "pattern", "replacement"}]格式"""
+    global compiled_normalization_rules
+    
+    rules = list(PAGE_NORMALIZATION_RULES) if include_defaults else []
+    for rule in extra_rules or []:
+        rules.append((rule.get("name", "custom"), rule["pattern"], rule.get("replacement", "")))
+    
+    compiled = []
+    for name, pattern, replacement in rules:
+        try:
+            compiled.append((name, re.compile(pattern, re.IGNORECASE), replacement))
+        except re.error as e:
+            logging.warning(f"忽略无效的规范化规则 {name}: {e}")
+    compiled_normalization_rules = compiled
+    return compiled
+
+def load_normalization_rules(rules_file):
+    """从JSON文件加载规范化规则
+
+    文件可以是规则列表（追加到默认规则之后），也可以是
+    {"include_defaults": false, "rules": [...]}格式以替换默认规则
+    """
+    try:
+        with open(rules_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            rules = compile_normalization_rules(data.get("rules", []), data.get("include_defaults", True))
+        else:
+            rules = compile_normalization_rules(data)
+        logging.info(f"已从 {rules_file} 加载 {len(rules)} 条页面规范化规则")
+        return True
+    except Exception as e:
+        logging.error(f"加载规范化规则失败: {e}，使用默认规则")
+        compile_normalization_rules()
+        return False
+
+def get_page_fingerprint(html, url=""):
+    """规范化整页HTML后计算指纹，用于在解析之前判断页面是否变化"""
+    if not compiled_normalization_rules:
+        compile_normalization_rules()
+    normalized = html
+    for _, pattern, replacement in compiled_normalization_rules:
+        normalized = pattern.sub(replacement, normalized)
+    return hashlib.md5(f"{url}\n{normalized}".encode('utf-8')).hexdigest()
+
 def get_html_section_hash(html_content):
     """计算HTML内容的哈希值"""
     return hashlib.md5(html_content.encode('utf-8')).hexdigest()
 
+# ==================== HTML解析后端 ====================
+# 按速度从快到慢排列，所选后端未安装时依次回退
+PARSER_BACKEND_ORDER = ["selectolax", "lxml", "html.parser"]
+
+# 每个后端依赖的模块
+PARSER_BACKEND_MODULES = {
+    "selectolax": "selectolax",
+    "lxml": "lxml",
+    "html.parser": "bs4",
+}
+
+# 当前使用的解析后端，由resolve_parser_backend在启动时确定
+active_parser_backend = None
+
+class PageText(str):
+    """selectolax后端的文本节点，行为与bs4的NavigableString一致"""
+    parent = None
+
+    @property
+    def parents(self):
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+class PageComment(PageText):
+    """注释节点，不计入get_text()"""
+
+class PageRawText(PageText):
+    """script/style/template中的文本，不计入get_text()"""
+
+# 内容不属于可见文本的标签
+RAW_TEXT_TAGS = {"script", "style", "template"}
+
+def _match_value(value, matcher):
+    """按bs4的规则匹配属性值，多值属性（class）逐个匹配后再整体匹配"""
+    if matcher is True:
+        return value is not None
+    if isinstance(value, list):
+        for item in value:
+            if _match_value(item, matcher):
+                return True
+        joined = " ".join(value)
+        if callable(matcher):
+            return bool(matcher(joined))
+        return joined == matcher
+    if callable(matcher):
+        return bool(matcher(value))
+    return value == matcher
+
+class PageNode:
+    """轻量元素节点，实现任务检测函数用到的BeautifulSoup接口子集"""
+    __slots__ = ("name", "attrs", "contents", "parent")
+
+    def __init__(self, name, attrs=None, parent=None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.contents = []
+        self.parent = parent
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f"<PageNode {self.name}>"
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    @property
+    def parents(self):
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    @property
+    def next_siblings(self):
+        if self.parent is None:
+            return
+        siblings = self.parent.contents
+        for index, child in enumerate(siblings):
+            if child is self:
+                yield from siblings[index + 1:]
+                return
+
+    @property
+    def descendants(self):
+        stack = list(reversed(self.contents))
+        while stack:
+            node = stack.pop()
+            yield node
+            if isinstance(node, PageNode):
+                stack.extend(reversed(node.contents))
+
+    def get_text(self):
+        return "".join(node for node in self.descendants if type(node) is PageText)
+
+    def _matches(self, name, class_, id_):
+        if name is not None and name is not True:
+            if isinstance(name, (list, tuple, set)):
+                if self.name not in name:
+                    return False
+            elif self.name != name:
+                return False
+        if class_ is not None and not _match_value(self.attrs.get("class"), class_):
+            return False
+        if id_ is not None and not _match_value(self.attrs.get("id"), id_):
+            return False
+        return True
+
+    def find_all(self, name=None, class_=None, id=None, string=None, limit=None):
+        results = []
+        if string is not None and name is None:
+            for node in self.descendants:
+                if isinstance(node, PageText) and (string is True or _match_value(str(node), string)):
+                    results.append(node)
+                    if limit and len(results) >= limit:
+                        break
+            return results
+        for node in self.descendants:
+            if isinstance(node, PageNode) and node._matches(name, class_, id):
+                results.append(node)
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+    def find(self, name=None, class_=None, id=None, string=None):
+        found = self.find_all(name, class_=class_, id=id, string=string, limit=1)
+        return found[0] if found else None
+
+    def find_all_previous(self, name=None):
+        """返回文档中位于该节点之前的元素，距离最近的在前"""
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        previous = []
+        for node in root.descendants:
+            if node is self:
+                break
+            if isinstance(node, PageNode) and node._matches(name, None, None):
+                previous.append(node)
+        previous.reverse()
+        return previous
+
+    def __str__(self):
+        parts = []
+        self._serialize(parts)
+        return "".join(parts)
+
+    def _serialize(self, parts):
+        attrs = "".join(
+            f' {key}="{" ".join(value) if isinstance(value, list) else value}"' if value is not None else f" {key}"
+            for key, value in self.attrs.items())
+        parts.append(f"<{self.name}{attrs}>")
+        for child in self.contents:
+            if isinstance(child, PageNode):
+                child._serialize(parts)
+            elif isinstance(child, PageComment):
+                parts.append(f"<!--{child}-->")
+            else:
+                parts.append(child.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;"))
+        parts.append(f"</{self.name}>")
+
+def _selectolax_to_page_tree(tree):
+    """把selectolax解析结果转换成PageNode树"""
+    document = PageNode("[document]")
+    if tree.root is None:
+        return document
+    stack = [(tree.root, document)]
+    while stack:
+        node, parent = stack.pop()
+        tag = node.tag
+        if tag == "-text":
+            text = node.text_content if hasattr(node, "text_content") else node.text(deep=False)
+            if text:
+                text_class = PageRawText if parent.name in RAW_TEXT_TAGS else PageText
+                child = text_class(text)
+                child.parent = parent
+                parent.contents.append(child)
+            continue
+        if tag in ("-comment", "_comment"):
+            child = PageComment(node.comment_content if hasattr(node, "comment_content") else node.text(deep=False))
+            child.parent = parent
+            parent.contents.append(child)
+            continue
+        if not tag or tag.startswith(("-", "_", "!")):
+            continue
+        attrs = dict(node.attributes)
+        if attrs.get("class") is not None:
+            attrs["class"] = attrs["class"].split()
+        element = PageNode(tag, attrs, parent)
+        parent.contents.append(element)
+        # 子节点逆序入栈，保证按文档顺序追加
+        children = list(node.iter(include_text=True))
+        for child_node in reversed(children):
+            stack.append((child_node, element))
+    return document
+
+def _parse_with_selectolax(html):
+    try:
+        from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+    except ImportError:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    return _selectolax_to_page_tree(SelectolaxParser(html))
+
+def _parse_with_bs4(html, features):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, features)
+
+# 解析后端注册表：名称 -> 解析函数
+PARSER_BACKENDS = {
+    "selectolax": _parse_with_selectolax,
+    "lxml": lambda html: _parse_with_bs4(html, "lxml"),
+    "html.parser": lambda html: _parse_with_bs4(html, "html.parser"),
+}
+
+def is_parser_backend_available(name):
+    """检查解析后端依赖的模块是否已安装"""
+    module_name = PARSER_BACKEND_MODULES.get(name)
+    if not module_name:
+        return False
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def resolve_parser_backend(name="html.parser"):
+    """确定实际使用的解析后端，所选后端不可用时按速度顺序回退"""
+    global active_parser_backend
+    
+    if name == "auto":
+        candidates = PARSER_BACKEND_ORDER
+    elif name in PARSER_BACKEND_ORDER:
+        candidates = PARSER_BACKEND_ORDER[PARSER_BACKEND_ORDER.index(name):]
+    else:
+        logging.warning(f"未知的解析后端: {name}，使用html.parser")
+        candidates = ["html.parser"]
+    
+    for candidate in candidates:
+        if is_parser_backend_available(candidate):
+            if name not in ("auto", candidate):
+                logging.warning(f"解析后端 {name} 不可用，回退到 {candidate}")
+            active_parser_backend = candidate
+            return candidate
+    
+    active_parser_backend = "html.parser"
+    return active_parser_backend
+
+def parse_html(html, backend=None):
+    """使用指定（或当前）解析后端解析HTML，返回支持find/find_all/get_text的文档根节点"""
+    backend = backend or active_parser_backend or resolve_parser_backend()
+    return PARSER_BACKENDS[backend](html)
+
+def collect_section_results(soup):
+    """对解析好的页面运行各任务部分的检测函数，返回可比较的结果"""
+    results = {}
+    page_index = build_page_index(soup)
+    with poll_text_cache(page_index):
+        for section_name in ["Eligible Tasks", "Training Tasks"]:
+            container = find_tasks_container(soup, section_name, page_index)
+            results[section_name] = {
+                "found": container is not None,
+                "tasks": extract_task_texts(container, section_name),
+                "has_tasks": has_actual_tasks(container, section_name),
+            }
+    return results
+
+def read_saved_page(path):
+    """读取保存的HTML页面，调试快照存档中的.html.gz页面自动解压"""
+    with (gzip.open if path.endswith(".gz") else open)(path, "rt", encoding="utf-8") as f:
+        return f.read()
+
+def saved_page_stem(path):
+    """页面文件去掉.html或.html.gz后缀的路径，用于查找同名的.expected.json或.label.json"""
+    return path[:-len(".html.gz")] if path.endswith(".html.gz") else os.path.splitext(path)[0]
+
+def verify_parser_backends(fixture_dir, bless=False):
+    """用保存的HTML页面验证各解析后端的检测结果与页面旁的<name>.expected.json一致
+
+    缺少.expected.json的页面算作不一致；bless为True时改为用html.parser的结果创建，
+    创建后应人工检查其内容。返回是否全部一致。
+    """
+    fixtures = sorted(glob.glob(os.path.join(fixture_dir, "*.html")) + glob.glob(os.path.join(fixture_dir, "*.html.gz")))
+    if not fixtures:
+        print(f"在 {fixture_dir} 中没有找到HTML页面")
+        return False
+    
+    backends = [name for name in reversed(PARSER_BACKEND_ORDER) if is_parser_backend_available(name)]
+    timings = {name: 0.0 for name in backends}
+    all_match = True
+    
+    for fixture in fixtures:
+        html = read_saved_page(fixture)
+        expected_file = saved_page_stem(fixture) + ".expected.json"
+        expected = None
+        if os.path.exists(expected_file):
+            with open(expected_file, "r", encoding="utf-8") as f:
+                expected = json.load(f)
+        elif not bless:
+            all_match = False
+            print(f"[缺少基准] {os.path.basename(fixture)}: 没有 {os.path.basename(expected_file)}，"
+                  f"检查页面后加上 --bless 创建")
+            continue
+        
+        for name in backends:
+            start = time.perf_counter()
+            soup = parse_html(html, name)
+            timings[name] += time.perf_counter() - start
+            results = collect_section_results(soup)
+            
+            if expected is None:
+                expected = results
+                with open(expected_file, "w", encoding="utf-8") as f:
+                    json.dump(results, f, ensure_ascii=False, indent=2)
+                print(f"已用 {name} 的结果创建基准: {expected_file}")
+            elif results != expected:
+                all_match = False
+                print(f"[不一致] {os.path.basename(fixture)} - {name}")
+                for section_name, section_result in results.items():
+                    if section_result != expected.get(section_name):
+                        print(f"  {section_name}: 预期 {expected.get(section_name)}")
+                        print(f"  {' ' * len(section_name)}  实际 {section_result}")
+            else:
+                print(f"[一致] {os.path.basename(fixture)} - {name}")
+    
+    print("\n平均解析耗时:")
+    for name in backends:
+        print(f"  {name:<12} {timings[name] / len(fixtures) * 1000:.2f} ms")
+    return all_match
+
+class ReplayResponse:
+    """回放时代替requests响应的对象，只提供检测流程用到的属性"""
+
+    def __init__(self, html, url=BASELINE_URL):
+        self.text = html
+        self.content = html.encode("utf-8")
+        self.status_code = 200
+        self.url = url
+        self.headers = {}
+
+class ReplayStreamResponse(ReplayResponse):
+    """回放流式读取时代替流式requests响应的对象，按块返回页面内容"""
+
+    def __init__(self, html, url=BASELINE_URL):
+        super().__init__(html, url)
+        self.encoding = "utf-8"
+        self.raw = io.BytesIO(self.content)
+
+    def iter_content(self, chunk_size):
+        return iter(lambda: self.raw.read(chunk_size), b"")
+
+    def close(self):
+        pass
+
+# 回放基准测试报告的阶段，按处理顺序排列
+REPLAY_STAGES = ["parse", "find_tasks_container", "extract_task_texts", "has_actual_tasks", "diff", "alert_decision"]
+
+def replay_recorded_pages(page_dir, repeat=1):
+    """把目录中保存的页面按文件名顺序当作连续的检查结果回放，报告各阶段耗时、吞吐量和检测正确性
+
+    每个页面经过与轮询相同的检测 → 比较 → 提醒判断流程，只是页面来自文件而不是网络。
+    页面旁的<name>.label.json为标注的预期结果，格式为{"alert": true/false, "tasks": ["任务名称", ...]}，
+    两项都可省略；只有第一轮回放与标注比较。指定--stream时页面经过流式读取，
+    第一轮同时完整处理页面，两者的检测结果必须一致。返回标注是否全部符合
+    """
+    paths = sorted(glob.glob(os.path.join(page_dir, "*.html")) + glob.glob(os.path.join(page_dir, "*.html.gz")))
+    if not paths:
+        print(f"在 {page_dir} 中没有找到HTML页面")
+        return False
+    # 先把页面读入内存，计时不包含磁盘读取
+    pages = [(path, read_saved_page(path)) for path in paths]
+    labels = {}
+    for path in paths:
+        label_file = saved_page_stem(path) + ".label.json"
+        if os.path.exists(label_file):
+            with open(label_file, "r", encoding="utf-8") as f:
+                labels[path] = json.load(f)
+    
+    checked = 0
+    mismatches = []
+    stream_mismatches = []
+    failed_pages = set()
+    false_positives = false_negatives = 0
+    total_time = 0.0
+    # 回放账号的比较基准和检测历史写入临时目录，不影响正在使用的文件
+    work_dir = tempfile.mkdtemp(prefix="baseline_replay_")
+    log_level = logging.getLogger().level
+    if not config.get("debug", False):
+        logging.getLogger().setLevel(logging.WARNING)
+    anchors = stream_anchors() if config.get("stream", False) else None
+    if config.get("stream", False) and anchors is None:
+        print("提取规则中没有可用于流式读取的container选择器，按完整页面回放")
+    stage_timer.reset()
+    stage_timer.enabled = True
+    try:
+        for round_number in range(max(1, repeat)):
+            account = MonitorAccount(
+                name="replay",
+                history_file=os.path.join(work_dir, "history.json"),
+                state_file=os.path.join(work_dir, "state.json"),
+            )
+            # 流式回放的第一轮用另一个账号完整处理同样的页面，比较两者的检测结果
+            full_account = None
+            if anchors is not None and round_number == 0:
+                full_account = MonitorAccount(
+                    name="replay_full",
+                    history_file=os.path.join(work_dir, "history_full.json"),
+                    state_file=os.path.join(work_dir, "state_full.json"),
+                )
+            for path, html in pages:
+                start = time.perf_counter()
+                response = ReplayResponse(html)
+                if anchors is not None:
+                    # 与轮询相同：没有找到所有部分时读取结果就是完整页面
+                    response = read_streamed_page(ReplayStreamResponse(html), anchors, account.session,
+                                                  config.get("stream_chunk", 16384))
+                tasks, success = tasks_from_response(response, "ok", account)
+                with stage_timer.stage("alert_decision"):
+                    alert = report_tasks(tasks, account.take_task_events(), account.is_first_check) if success else None
+                if success:
+                    account.is_first_check = False
+                total_time += time.perf_counter() - start
+                
+                if full_account is not None:
+                    stage_timer.enabled = False
+                    expected = tasks_from_response(ReplayResponse(html), "ok", full_account)
+                    full_account.take_task_events()
+                    stage_timer.enabled = True
+                    if (tasks, success) != expected:
+                        stream_mismatches.append(f"{os.path.basename(path)}: 流式读取结果 {(tasks, success)}，"
+                                                 f"完整页面结果 {expected}")
+                
+                
+                label = labels.get(path)
+                if round_number or label is None:
+                    continue
+                checked += 1
+                name = os.path.basename(path)
+                mismatch_count = len(mismatches)
+                if "alert" in label and bool(alert) != bool(label["alert"]):
+                    if alert:
+                        false_positives += 1
+                        mismatches.append(f"{name}: 误报，提醒内容 {alert['message']}")
+                    else:
+                        false_negatives += 1
+                        mismatches.append(f"{name}: 漏报，预期应提醒")
+                if "tasks" in label:
+                    found = sorted(record.name for records in account.previous_task_records.values()
+                                   for record in records.values())
+                    if found != sorted(label["tasks"]):
+                        mismatches.append(f"{name}: 任务不一致，预期 {sorted(label['tasks'])}，实际 {found}")
+                if len(mismatches) > mismatch_count:
+                    failed_pages.add(path)
+            account.session.close()
+            if full_account is not None:
+                full_account.session.close()
+    finally:
+        stage_timer.enabled = False
+        logging.getLogger().setLevel(log_level)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    page_count = len(pages) * max(1, repeat)
+    print(f"\n回放 {len(pages)} 个页面 × {max(1, repeat)} 轮，共 {total_time * 1000:.1f} ms，"
+          f"吞吐量 {page_count / total_time if total_time else 0:.1f} 页/秒")
+    print(f"{'阶段':<22}{'调用次数':>10}{'总耗时(ms)':>14}{'每页(ms)':>12}")
+    for stage in REPLAY_STAGES:
+        total = stage_timer.totals.get(stage, 0.0)
+        print(f"{stage:<22}{stage_timer.counts.get(stage, 0):>10}{total * 1000:>14.2f}{total / page_count * 1000:>12.3f}")
+    print(f"页面指纹快速路径命中 {fingerprint_stats['hits']}/{fingerprint_stats['checks']}")
+    
+    if anchors is not None:
+        print(f"\n流式读取与完整页面的检测结果: {len(pages) - len(stream_mismatches)}/{len(pages)} 个页面一致")
+        for mismatch in stream_mismatches:
+            print(f"  {mismatch}")
+    
+    if not labels:
+        print("没有找到.label.json标注，未检查检测正确性")
+        return not stream_mismatches
+    print(f"\n检测正确性: {checked - len(failed_pages)}/{checked} 个标注页面符合，"
+          f"误报 {false_positives}，漏报 {false_negatives}")
+    for mismatch in mismatches:
+        print(f"  {mismatch}")
+    return not mismatches and not stream_mismatches
+
+# 已尝试导入的可选模块，导入失败的记为None，不再重复尝试
+_optional_modules = {}
+
+def load_optional_module(module_name):
+    """首次使用时导入通知、音频等可选模块，导入失败（未安装或不支持当前平台）时只警告一次并返回None"""
+    if module_name not in _optional_modules:
+        if module_name == "pygame":
+            # 不打印pygame的欢迎信息
+            os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        try:
+            _optional_modules[module_name] = importlib.import_module(module_name)
+        except Exception as e:
+            logging.warning(f"无法加载 {module_name}: {e}")
+            _optional_modules[module_name] = None
+    return _optional_modules[module_name]
+
+class AudioService:
+    """语音提醒播放服务：mixer只初始化一次，解码后的音频按文件路径缓存在内存中，由后台线程依次播放
+
+    play()放入队列后立即返回，检查和提醒都不等待播放结束；同一文件正在播放或已在排队时，
+    新的请求合并到这一次播放中，不会连续重复播放
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = set()  # 正在排队或播放的文件路径
+        self.clips = {}  # {文件路径: pygame.mixer.Sound}，不能整段解码的文件记为None，改用music流式播放
+        self.pygame = None
+        self.mixer_ready = None  # None表示尚未初始化
+        self.thread = None
+
+    def _ensure_worker(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._worker, name="baseline-audio", daemon=True)
+            self.thread.start()
+
+    def preload(self, path):
+        """在后台线程中初始化mixer并解码音频文件，启动时调用，不阻塞启动"""
+        with self.lock:
+            self._ensure_worker()
+        self.queue.put(("load", path))
+
+    def play(self, path):
+        """排队播放音频文件，返回True表示已排队或已合并到正在进行的播放中"""
+        with self.lock:
+            if path in self.pending:
+                logging.info(f"语音提醒正在播放或排队，合并本次提醒: {path}")
+                return True
+            self.pending.add(path)
+            self._ensure_worker()
+        self.queue.put(("play", path))
+        return True
+
+    def _init_mixer(self):
+        if self.mixer_ready is None:
+            self.pygame = load_optional_module("pygame")
+            try:
+                if self.pygame is None:
+                    raise RuntimeError("pygame不可用")
+                # 较小的缓冲区，缩短从开始播放到听到声音的延迟
+                self.pygame.mixer.init(buffer=512)
+                self.mixer_ready = True
+            except Exception as e:
+                logging.error(f"初始化音频失败: {e}")
+                self.mixer_ready = False
+        return self.mixer_ready
+
+    def _clip(self, path):
+        if path not in self.clips:
+            try:
+                self.clips[path] = self.pygame.mixer.Sound(path)
+                logging.info(f"已加载语音文件: {path}")
+            except Exception as e:
+                logging.debug(f"无法整段解码 {path}: {e}，改用流式播放")
+                self.clips[path] = None
+        return self.clips[path]
+
+    def _play_now(self, path):
+        clip = self._clip(path)
+        if clip is not None:
+            clip.play()
+            # 等待播放结束再处理下一个请求，期间到达的同一提醒被合并
+            time.sleep(clip.get_length())
+            return
+        music = self.pygame.mixer.music
+        music.load(path)
+        music.play()
+        while music.get_busy():
+            time.sleep(0.1)
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            action, path = item
+            try:
+                if self._init_mixer():
+                    if action == "load":
+                        self._clip(path)
+                    else:
+                        logging.info(f"播放MP3语音文件: {path}")
+                        self._play_now(path)
+            except Exception as e:
+                logging.error(f"播放MP3语音文件失败: {e}")
+            finally:
+                if action == "play":
+                    with self.lock:
+                        self.pending.discard(path)
+
+    def close(self, timeout=5):
+        """播放完已排队的语音后关闭mixer"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=timeout)
+            self.thread = None
+        if self.mixer_ready:
+            try:
+                self.pygame.mixer.quit()
+            except Exception:
+                pass
+            self.mixer_ready = None
+
+# 语音播放服务，整个进程共用
+audio_service = AudioService()
+
 def play_mp3_voice(mp3_file_path=None):
-    """播放MP3语音文件"""
+    """把MP3语音文件交给语音播放服务，立即返回"""
     global config
     
     # 使用配置中的MP3文件路径或默认路径
     if mp3_file_path is None:
         mp3_file_path = config.get("mp3_voice_file", "baseline_voice.mp3")
     
-    logging.info(f"播放MP3语音文件: {mp3_file_path}")
-    try:
-        # 检查文件是否存在
-        if not os.path.exists(mp3_file_path):
-            logging.error(f"找不到MP3语音文件: {mp3_file_path}")
-            return False
-            
-        # 初始化pygame
-        pygame.mixer.init()
-        # 加载并播放MP3文件
-        pygame.mixer.music.load(mp3_file_path)
-        pygame.mixer.music.play()
-        # 等待播放完成
-        while pygame.mixer.music.get_busy():
-            pygame.time.Clock().tick(10)
-        # 关闭mixer
-        pygame.mixer.quit()
-        return True
-    except Exception as e:
-        logging.error(f"播放MP3语音文件失败: {e}")
+    # 检查文件是否存在
+    if not os.path.exists(mp3_file_path):
+        logging.error(f"找不到MP3语音文件: {mp3_file_path}")
         return False
+    return audio_service.play(mp3_file_path)
 
 def speak_voice(message=None):
     """播放语音消息，使用MP3文件"""
@@ -216,117 +1027,317 @@ def speak_voice(message=None):
     else:
         logging.warning(f"找不到MP3语音文件: {mp3_file}，无法播放语音提醒")
 
-def send_notification(title, message, duration=10):
-    """发送桌面通知"""
-    logging.info(f"发送通知: {title} - {message}")
-    try:
+def _notify_plyer(title, message, duration, icon_path, timeout):
+    plyer = load_optional_module("plyer")
+    if plyer is None:
+        return False
+    plyer.notification.notify(
+        title=title,
+        message=message,
+        app_name="Apple Baseline Monitor",
+        timeout=duration,
+        app_icon=icon_path
+    )
+    return True
+
+def _notify_powershell(title, message, duration, icon_path, timeout):
+    # 准备PowerShell命令
+    ps_script = f'''
+    [Windows.UI.Notifications.ToastNotificationManager, Windows.UI.Notifications, ContentType = WindowsRuntime] | Out-Null
+    [Windows.Data.Xml.Dom.XmlDocument, Windows.Data.Xml.Dom.XmlDocument, ContentType = WindowsRuntime] | Out-Null
+
+    $APP_ID = 'Apple.Baseline.Monitor'
+    $template = @"
+    <toast scenario="default">
+        <visual>
+            <binding template="ToastGeneric">
+                <text>{title}</text>
+                <text>{message}</text>
+            </binding>
+        </visual>
+        <actions>
+            <action activationType="protocol" content="打开网站" arguments="https://baseline.apple.com/"/>
+        </actions>
+    </toast>
+    "@
+
+    $xml = New-Object Windows.Data.Xml.Dom.XmlDocument
+    $xml.LoadXml($template)
+    $toast = [Windows.UI.Notifications.ToastNotification]::new($xml)
+    [Windows.UI.Notifications.ToastNotificationManager]::CreateToastNotifier($APP_ID).Show($toast)
+    '''
+    
+    # 执行PowerShell命令 - 使用更可靠的方式，超时后结束进程
+    subprocess.run(['powershell', '-Command', ps_script],
+                   capture_output=True,
+                   text=True,
+                   check=True,
+                   timeout=timeout)
+    return True
+
+# win10toast通知器，首次使用时创建
+_toaster = None
+
+def _notify_win10toast(title, message, duration, icon_path, timeout):
+    global _toaster
+    if _toaster is None:
+        win10toast = load_optional_module("win10toast")
+        if win10toast is None:
+            return False
+        _toaster = win10toast.ToastNotifier()
+    _toaster.show_toast(
+        title,
+        message,
+        icon_path=icon_path,
+        duration=duration,
+        threaded=True,
+        callback_on_click=open_new_browser_window  # 添加点击回调函数以打开浏览器
+    )
+    return True
+
+def _notify_msg(title, message, duration, icon_path, timeout):
+    # 使用系统内置通知机制
+    subprocess.run(f'msg "%username%" "{title}: {message}"', shell=True, timeout=timeout)
+    return True
+
+# 桌面通知后端注册表，按顺序尝试直到一个成功：(名称, 发送函数, 适用的os.name，None表示所有平台)
+NOTIFICATION_BACKENDS = [
+    ("Plyer", _notify_plyer, None),  # 跨平台支持
+    ("PowerShell UWP API", _notify_powershell, ("nt",)),  # Windows 10 UWP API通知 (最可靠)
+    ("win10toast", _notify_win10toast, ("nt",)),
+    ("系统消息", _notify_msg, ("nt",)),  # Windows系统消息服务作为最后的备用
+]
+
+# 通知图标和当前平台可用的通知后端，首次发送通知时确定一次
+_notification_icon = None
+_platform_notification_backends = None
+
+def resolve_notification_icon():
+    """查找通知图标：优先使用脚本目录下的apple_icon.ico，其次当前目录中任意.ico文件，都没有时返回None使用默认图标"""
+    global _notification_icon
+    if _notification_icon is None:
         # 设置icon参数以保证通知在Action Center中保留
         icon_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "apple_icon.ico"))
-        
-        # 检查图标文件是否存在，如果不存在使用系统默认图标
         if not os.path.exists(icon_path):
-            # 尝试创建一个简单的图标文件
-            try:
-                # 如果没有图标，尝试查找任何可用的.ico文件
-                ico_files = glob.glob("*.ico")
-                if ico_files:
-                    icon_path = os.path.abspath(ico_files[0])
-                else:
-                    icon_path = None  # 如果没有找到图标文件，使用None让win10toast使用默认图标
-            except:
-                icon_path = None
-        
-        notification_success = False
-        
-        # 方法1: 使用Plyer库 (跨平台支持)
-        try:
-            plyer_notification.notify(
-                title=title,
-                message=message,
-                app_name="Apple Baseline Monitor",
-                timeout=duration,
-                app_icon=icon_path
-            )
-            logging.info("使用Plyer库发送通知成功")
-            notification_success = True
-        except Exception as plyer_error:
-            logging.warning(f"Plyer通知失败: {plyer_error}，尝试其他方法")
-        
-        # 方法2: 使用Windows 10 UWP API通知 (最可靠)
-        if not notification_success and os.name == 'nt':
-            try:
-                # 准备PowerShell命令
-                ps_script = f'''
-                [Windows.UI.Notifications.ToastNotificationManager, Windows.UI.Notifications, ContentType = WindowsRuntime] | Out-Null
-                [Windows.Data.Xml.Dom.XmlDocument, Windows.Data.Xml.Dom.XmlDocument, ContentType = WindowsRuntime] | Out-Null
-
-                $APP_ID = 'Apple.Baseline.Monitor'
-                $template = @"
-                <toast scenario="default">
-                    <visual>
-                        <binding template="ToastGeneric">
-                            <text>{title}</text>
-                            <text>{message}</text>
-                        </binding>
-                    </visual>
-                    <actions>
-                        <action activationType="protocol" content="打开网站" arguments="https://baseline.apple.com/"/>
-                    </actions>
-                </toast>
-                "@
-
-                $xml = New-Object Windows.Data.Xml.Dom.XmlDocument
-                $xml.LoadXml($template)
-                $toast = [Windows.UI.Notifications.ToastNotification]::new($xml)
-                [Windows.UI.Notifications.ToastNotificationManager]::CreateToastNotifier($APP_ID).Show($toast)
-                '''
-                
-                # 执行PowerShell命令 - 使用更可靠的方式
-                process = subprocess.run(['powershell', '-Command', ps_script], 
-                                     capture_output=True,
-                                     text=True,
-                                     check=True)
-                logging.info("使用PowerShell UWP API发送通知成功")
-                notification_success = True
-            except Exception as ps_error:
-                logging.warning(f"PowerShell UWP通知失败: {ps_error}，尝试其他方法")
-        
-        # 方法3: 使用win10toast库
-        if not notification_success:
-            try:
-                # 如果PowerShell方法失败或不是Windows系统，使用win10toast
-                toaster.show_toast(
-                    title,
-                    message,
-                    icon_path=icon_path,
-                    duration=duration,
-                    threaded=True,
-                    callback_on_click=open_new_browser_window  # 添加点击回调函数以打开浏览器
-                )
-                logging.info("使用win10toast发送通知成功")
-                notification_success = True
-            except Exception as toast_error:
-                logging.error(f"win10toast通知失败: {toast_error}")
-        
-        # 方法4: 使用Windows系统消息服务作为最后的备用
-        if not notification_success and os.name == 'nt':
+            ico_files = glob.glob("*.ico")
+            icon_path = os.path.abspath(ico_files[0]) if ico_files else ""
+        _notification_icon = icon_path
+    return _notification_icon or None
+
+def platform_notification_backends():
+    """NOTIFICATION_BACKENDS中适用于当前平台的后端"""
+    global _platform_notification_backends
+    if _platform_notification_backends is None:
+        _platform_notification_backends = [
+            (name, notify) for name, notify, platforms in NOTIFICATION_BACKENDS
+            if platforms is None or os.name in platforms
+        ]
+    return _platform_notification_backends
+
+def send_notification(title, message, duration=10, timeout=None):
+    """发送桌面通知，依次尝试当前平台可用的通知后端，返回是否成功；后端依赖的模块在首次使用时才加载
+
+    timeout限制通过外部命令发送的后端的等待时间，None表示不限制
+    """
+    logging.info(f"发送通知: {title} - {message}")
+    try:
+        icon_path = resolve_notification_icon()
+        for name, notify in platform_notification_backends():
             try:
-                # 使用系统内置通知机制
-                os.system(f'msg "%username%" "{title}: {message}"')
-                logging.info("使用系统消息发送通知")
-                notification_success = True
-            except Exception as msg_error:
-                logging.error(f"系统消息通知失败: {msg_error}")
+                if notify(title, message, duration, icon_path, timeout):
+                    logging.info(f"使用{name}发送通知成功")
+                    return True
+            except Exception as backend_error:
+                logging.warning(f"{name}通知失败: {backend_error}，尝试其他方法")
         
         # 如果所有方法都失败，显示错误日志
-        if not notification_success:
-            logging.error("所有通知方法都失败")
+        logging.error("所有通知方法都失败")
     except Exception as e:
         logging.error(f"发送通知失败: {e}")
+    return False
+
+class NotificationSink(abc.ABC):
+    """通知目标：每个目标有自己的队列和工作线程，发送超时或失败时按次数重试
+
+    队列满时丢弃最旧的通知，submit()从不阻塞；一个目标变慢只会让它自己的队列积压，
+    不影响其他目标，也不影响检查。超时由send()交给底层调用（请求、外部命令），
+    发送只在工作线程中进行，超时重试时不会留下仍在发送的线程
+    """
+
+    name = "sink"
+
+    def __init__(self, timeout=10, retries=2, max_queue=20):
+        self.timeout = timeout
+        self.retries = retries
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.closing = False
+        self.thread = threading.Thread(target=self._worker, name=f"baseline-notify-{self.name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, event):
+        """排队一条通知，event为None表示停止信号"""
+        if self.closing and event is not None:
+            logging.warning(f"{self.name}通知目标已关闭，丢弃: {event['title']}")
+            return
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    dropped = self.queue.get_nowait()
+                except queue.Empty:
+                    continue
+                if dropped is None:
+                    # 停止信号不能丢弃，放回队列
+                    if event is not None:
+                        logging.warning(f"{self.name}通知目标已关闭，丢弃: {event['title']}")
+                    event = None
+                    continue
+                logging.warning(f"{self.name}通知积压，丢弃: {dropped['title']}")
+
+    @abc.abstractmethod
+    def send(self, event):
+        """发送一条通知，成功时返回True；等待时间不超过self.timeout"""
+
+    def _worker(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                return
+            for attempt in range(self.retries + 1):
+                try:
+                    if self.send(event):
+                        break
+                    error = "发送失败"
+                except Exception as e:
+                    error = e
+                if attempt < self.retries:
+                    logging.warning(f"{self.name}通知失败: {error}，{2 ** attempt} 秒后重试")
+                    time.sleep(2 ** attempt)
+                else:
+                    logging.error(f"{self.name}通知失败: {error}，已放弃: {event['title']}")
+
+    def close(self, timeout=5):
+        self.closing = True
+        self.submit(None)
+        self.thread.join(timeout)
+
+class DesktopSink(NotificationSink):
+    name = "desktop"
 
-def open_new_browser_window():
+    def send(self, event):
+        return send_notification(event["title"], event["message"], timeout=self.timeout)
+
+class ConsoleSink(NotificationSink):
+    name = "console"
+
+    def send(self, event):
+        print(f"\n[{event['time']}] {event['title']}: {event['message']}", flush=True)
+        return True
+
+class FileSink(NotificationSink):
+    """每条通知以一行JSON追加到文件"""
+    name = "file"
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def send(self, event):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        return True
+
+class WebhookSink(NotificationSink):
+    """把通知以JSON POST到URL，2xx响应视为成功；会话只在该目标的工作线程中使用"""
+    name = "webhook"
+
+    def __init__(self, url, **kwargs):
+        self.url = url
+        self.session = requests.Session()
+        super().__init__(**kwargs)
+
+    def send(self, event):
+        response = self.session.post(self.url, json=event, timeout=self.timeout)
+        if response.status_code // 100 != 2:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return True
+
+def create_notification_sink(spec, timeout=10, retries=2):
+    """按"desktop"、"console"、"file=路径"、"webhook=URL"格式的配置创建通知目标"""
+    kind, _, target = spec.partition("=")
+    kind = kind.strip().lower()
+    if kind == "desktop":
+        return DesktopSink(timeout=timeout, retries=retries)
+    if kind == "console":
+        return ConsoleSink(timeout=timeout, retries=retries)
+    if kind == "file" and target:
+        return FileSink(target, timeout=timeout, retries=retries)
+    if kind == "webhook" and target:
+        return WebhookSink(target, timeout=timeout, retries=retries)
+    raise ValueError(f"无效的通知目标: {spec}")
+
+class NotificationDispatcher:
+    """把通知分发给所有通知目标，只排队不等待发送"""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def dispatch(self, title, message, account=None):
+        event = {
+            "title": title,
+            "message": message,
+            "account": getattr(account, "name", None),
+            "time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        for sink in self.sinks:
+            sink.submit(event)
+
+    def close(self, timeout=5):
+        """等待各目标发完已排队的通知（每个目标最多timeout秒）"""
+        for sink in self.sinks:
+            sink.close(timeout)
+
+# 通知分发器，在main中按--notify创建；未创建时直接发送桌面通知
+notification_dispatcher = None
+
+def notify(title, message, account=None):
+    """发送一条提醒通知：有分发器时交给各通知目标排队发送，否则直接发送桌面通知"""
+    if notification_dispatcher:
+        notification_dispatcher.dispatch(title, message, account)
+    else:
+        send_notification(title, message)
+
+def run_webhook_receiver(port):
+    """在本机端口上运行接收webhook通知的测试服务，打印收到的每条通知，直到Ctrl+C"""
+
+    class WebhookReceiver(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                event = json.loads(body.decode("utf-8"))
+                print(f"[{event.get('time')}] {event.get('title')}: {event.get('message')}", flush=True)
+                self.send_response(204)
+            except ValueError:
+                self.send_response(400)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            logging.debug(f"webhook请求: {format % args}")
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), WebhookReceiver)
+    print(f"webhook测试服务: http://127.0.0.1:{server.server_port}/ ，按Ctrl+C退出")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def open_new_browser_window(account=None):
     """使用Chrome打开新的浏览器窗口访问baseline.apple.com"""
-    global recent_browser
+    account = account or default_account
     logging.info("正在尝试打开Chrome浏览器访问baseline.apple.com...")
     
     success = False
@@ -339,14 +1350,14 @@ def open_new_browser_window():
             subprocess.Popen(chrome_cmd, shell=True)
             success = True
             # 记录最近成功的浏览器
-            recent_browser = 'chrome'
+            account.browser = 'chrome'
         else:
             # 对于Mac/Linux系统
             logging.info("尝试使用Chrome打开新窗口...")
             chrome_cmd = f'chrome --new-window "{BASELINE_URL}"'
             subprocess.Popen(chrome_cmd, shell=True)
             success = True
-            recent_browser = 'chrome'
+            account.browser = 'chrome'
     except Exception as e:
         logging.error(f"打开Chrome新窗口失败: {e}")
         success = False
@@ -431,190 +1442,1243 @@ def format_training_tasks_output(tasks):
     # 如果有格式化的任务，返回这些任务；否则返回原始任务列表
     return formatted_tasks if formatted_tasks else original_tasks
 
-def check_baseline_tasks():
-    """检查Baseline页面是否有任务"""
-    global recent_cookies, recent_browser
-    
-    update_operation_time()  # 更新操作时间
-    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    logging.info(f"{current_time} - 开始检查任务...")
-    
-    # 使用手动设置的cookie
-    if recent_cookies and recent_browser:
-        # 降级为debug级别，避免频繁输出
-        logging.debug(f"使用{recent_browser} cookies访问...")
+# 记录当前线程中新建连接的握手和域名解析耗时，由BaselineSession在每次请求前后读取
+_handshake_probe = threading.local()
+
+class _TimedHTTPSConnection(urllib3.connection.HTTPSConnection):
+    """记录域名解析和TCP + TLS握手耗时的HTTPS连接
+
+    通过代理的请求使用requests自己的代理连接池，不计时
+    """
+
+    def _new_conn(self):
+        # 计时请求中先单独解析一次域名并记录耗时，再按urllib3原流程连接（此时通常由系统解析缓存直接返回）；
+        # 解析失败时按urllib3的方式报告，不再重复解析
+        dns = getattr(_handshake_probe, "dns", None)
+        if dns is not None:
+            start = time.perf_counter()
+            try:
+                socket.getaddrinfo(self._dns_host, self.port, type=socket.SOCK_STREAM)
+            except socket.gaierror as e:
+                raise urllib3.exceptions.NameResolutionError(self.host, self, e) from e
+            finally:
+                dns.append(time.perf_counter() - start)
+        return super()._new_conn()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            durations = getattr(_handshake_probe, "durations", None)
+            if durations is not None:
+                durations.append(time.perf_counter() - start)
+
+class _TimedHTTPSConnectionPool(urllib3.connectionpool.HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """HTTPS连接池使用可计时连接的适配器"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        pool_classes = dict(self.poolmanager.pool_classes_by_scheme)
+        pool_classes["https"] = _TimedHTTPSConnectionPool
+        self.poolmanager.pool_classes_by_scheme = pool_classes
+
+class BaselineSession:
+    """长期存活的HTTP会话，持有cookie jar并在多次检查之间复用连接"""
+
+    def __init__(self, pool_maxsize=4, adapter=None, on_request=None):
+        self.session = requests.Session()
+        # 每次发送请求时调用，账号用它统计每小时请求预算（重试、回退的完整请求和登录验证都计入）
+        self.on_request = on_request
+        self.session.headers.update(REQUEST_HEADERS)
+        # 多个账号的会话可以传入同一个适配器，共用连接池，cookies仍各自独立
+        self.adapter = adapter or _TimedHTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", self.adapter)
+        self.stats = {
+            "requests": 0,
+            "reused_connections": 0,
+            "new_connections": 0,
+            "total_handshake_ms": 0.0,
+            "last_handshake_ms": 0.0,
+            "last_reused": False,
+            "not_modified": 0,
+            "body_unchanged": 0,
+            "streamed": 0,
+            "stream_stopped_early": 0,
+            "streamed_bytes": 0,
+        }
+        # 上一次成功处理的200响应的验证信息，按URL保存: {"etag", "last_modified", "body_hash"}
+        self.validators = {}
+        # 最近一次请求各阶段的耗时(秒): dns、connect、ttfb、download
+        self.last_timings = {}
+
+    @property
+    def cookies(self):
+        return self.session.cookies
+
+    def replace_cookies(self, cookie_jar):
+        """原地替换cookie jar内容，保持会话和已建立的连接不变"""
+        if cookie_jar is self.session.cookies:
+            return self.session.cookies
+        self.session.cookies.clear()
+        if isinstance(cookie_jar, requests.cookies.RequestsCookieJar):
+            self.session.cookies.update(cookie_jar)
+        elif isinstance(cookie_jar, dict):
+            for name, value in cookie_jar.items():
+                if name:
+                    self.session.cookies.set(str(name), str(value), domain='.apple.com', path='/')
+        else:
+            # Cookie对象列表（从缓存文件读取）直接放入会话的jar
+            for cookie in cookie_jar:
+                self.session.cookies.set_cookie(cookie)
+        # 登录身份变化后，旧的验证信息不再可信
+        self.validators.clear()
+        return self.session.cookies
+
+    def get(self, url=None, conditional=True, **kwargs):
+        """发送GET请求并记录本次请求的连接复用情况和握手耗时
+
+        conditional为True时，带上一次200响应的ETag/Last-Modified发送条件请求
+        """
+        url = url or BASELINE_URL
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        if self.on_request is not None:
+            self.on_request()
+        if conditional:
+            validator = self.validators.get(url)
+            if validator:
+                headers = dict(kwargs.pop("headers", None) or {})
+                if validator.get("etag"):
+                    headers["If-None-Match"] = validator["etag"]
+                if validator.get("last_modified"):
+                    headers["If-Modified-Since"] = validator["last_modified"]
+                kwargs["headers"] = headers
+        _handshake_probe.durations = []
+        _handshake_probe.dns = []
+        # 流式请求返回时正文还没有读取，下载耗时由record_stream记录
+        streaming = kwargs.get("stream", False)
+        response = None
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, **kwargs)
+            return response
+        finally:
+            wall = time.perf_counter() - start
+            durations = _handshake_probe.durations
+            dns = sum(_handshake_probe.dns)
+            _handshake_probe.durations = _handshake_probe.dns = None
+            handshake_ms = sum(durations) * 1000
+            self.record_timings(response, wall, dns, handshake_ms / 1000 - dns if durations else None, not streaming)
+            self.stats["requests"] += 1
+            self.stats["last_handshake_ms"] = handshake_ms
+            self.stats["last_reused"] = not durations
+            if durations:
+                self.stats["new_connections"] += len(durations)
+                self.stats["total_handshake_ms"] += handshake_ms
+            else:
+                self.stats["reused_connections"] += 1
+
+    def record_timings(self, response, wall, dns, connect, download=True):
+        """把一次请求拆分为域名解析、建立连接、首字节和下载耗时，启用指标时记入直方图
+
+        首字节耗时为requests记录的发出请求到收到响应头的时间（含重定向）减去建立连接的时间，
+        下载耗时为整个请求的时间减去该时间；复用连接时没有域名解析和建立连接阶段
+        """
+        timings = {}
+        if connect is not None:
+            timings["dns"] = dns
+            timings["connect"] = max(0.0, connect)
+        if response is not None:
+            elapsed = sum((r.elapsed.total_seconds() for r in response.history), response.elapsed.total_seconds())
+            timings["ttfb"] = max(0.0, elapsed - (dns + connect if connect is not None else 0.0))
+            if download:
+                timings["download"] = max(0.0, wall - elapsed)
+        self.last_timings = timings
+        if metrics:
+            for stage, seconds in timings.items():
+                metrics.observe(stage, seconds)
+
+    def record_stream(self, seconds, downloaded, stopped):
+        """记录一次流式读取的下载耗时和字节数"""
+        self.last_timings["download"] = seconds
+        self.stats["streamed"] += 1
+        self.stats["streamed_bytes"] += downloaded
+        if stopped:
+            self.stats["stream_stopped_early"] += 1
+        if metrics:
+            metrics.observe("download", seconds)
+
+    def is_unchanged(self, response, url=None):
+        """判断响应内容是否与上一次成功处理的页面相同
+
+        服务器返回304，或忽略了条件请求但返回的正文哈希与上次相同时返回True
+        """
+        if response.status_code == 304:
+            self.stats["not_modified"] += 1
+            return True
+        if response.status_code != 200:
+            return False
+        validator = self.validators.get(url or BASELINE_URL)
+        if validator and validator.get("body_hash") == hashlib.md5(response.content).hexdigest():
+            self.stats["body_unchanged"] += 1
+            return True
+        return False
+
+    def remember_validators(self, response, url=None):
+        """页面处理成功后，保存200响应的验证信息供下一次条件请求使用"""
+        if response.status_code != 200:
+            return
+        self.validators[url or BASELINE_URL] = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "body_hash": hashlib.md5(response.content).hexdigest(),
+        }
+
+    def reuse_rate(self):
+        """返回连接复用率(0-1)"""
+        if not self.stats["requests"]:
+            return 0.0
+        return self.stats["reused_connections"] / self.stats["requests"]
+
+    def log_connection_stats(self):
+        """记录本次检查的连接复用情况"""
+        logging.info(f"连接{'复用' if self.stats['last_reused'] else '新建'}，"
+                     f"握手耗时 {self.stats['last_handshake_ms']:.1f} ms，"
+                     f"连接复用率 {self.reuse_rate() * 100:.1f}% "
+                     f"({self.stats['reused_connections']}/{self.stats['requests']})")
+
+    def close(self):
+        self.session.close()
+
+class AdaptiveScheduler:
+    """自适应检查调度：根据历史检测时间调整间隔，失败时指数退避，并遵守间隔上下限和每小时请求预算
+
+    检测历史按一天中的小时统计（相邻小时按一半计入，越早的记录权重越低）：
+    任务经常出现的时段缩短间隔，很少出现的时段延长间隔；没有历史时与固定随机间隔相同
+    """
+
+    # 检测记录的权重半衰期（秒）和最多保留的记录数
+    HISTORY_HALF_LIFE = 14 * 24 * 3600
+    MAX_HISTORY = 500
+    # 间隔缩放系数的范围
+    MIN_FACTOR = 0.25
+    MAX_FACTOR = 4.0
+    # 退避基准（秒）：限流/服务器错误和其他失败
+    THROTTLE_BACKOFF = 60
+    FAILURE_BACKOFF = 10
+
+    def __init__(self, history_file):
+        self.history_file = history_file
+        self.detections = None  # 首次使用时从文件加载
+        self.request_times = collections.deque()
+        self.consecutive_failures = 0
+        self.throttled = False
+        self.retry_after = 0.0
+
+    # ---------- 检测历史 ----------
+    def _load_history(self):
+        if self.detections is not None:
+            return
+        self.detections = []
+        if not os.path.exists(self.history_file):
+            return
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.detections = [float(ts) for ts in data.get("detections", [])][-self.MAX_HISTORY:]
+            logging.info(f"已从 {self.history_file} 加载 {len(self.detections)} 条任务检测记录")
+        except Exception as e:
+            logging.warning(f"加载检测历史失败: {e}，将重新记录")
+
+    def _save_history(self):
+        # 先写临时文件再替换，避免中途退出留下损坏的文件
+        temp_file = f"{self.history_file}.tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({"detections": self.detections}, f)
+            os.replace(temp_file, self.history_file)
+        except Exception as e:
+            logging.warning(f"保存检测历史失败: {e}")
+
+    def record_detection(self, when=None):
+        """记录一次检测到新任务的时间并保存"""
+        self._load_history()
+        self.detections.append(when or time.time())
+        del self.detections[:-self.MAX_HISTORY]
+        self._save_history()
+
+    def heat(self, now=None):
+        """当前时段的任务热度：1为平均水平，大于1表示任务经常在此时段出现"""
+        self._load_history()
+        now = now or time.time()
+        buckets = [0.0] * 24
+        for ts in self.detections:
+            weight = 0.5 ** (max(0.0, now - ts) / self.HISTORY_HALF_LIFE)
+            hour = datetime.fromtimestamp(ts).hour
+            buckets[hour] += weight
+            buckets[(hour - 1) % 24] += weight * 0.5
+            buckets[(hour + 1) % 24] += weight * 0.5
+        mean = sum(buckets) / 24
+        # 加1平滑，记录很少时热度接近1
+        return (buckets[datetime.fromtimestamp(now).hour] + 1) / (mean + 1)
+
+    # ---------- 请求结果 ----------
+    def record_request(self, now=None):
+        """记录一次请求，用于计算每小时请求预算"""
+        self.request_times.append(now or time.time())
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.throttled = False
+        self.retry_after = 0.0
+
+    def record_failure(self, response=None):
+        """记录一次失败；429和5xx视为限流，按Retry-After和更长的基准退避"""
+        self.consecutive_failures += 1
+        status_code = getattr(response, "status_code", None)
+        self.throttled = status_code is not None and (status_code == 429 or status_code >= 500)
+        self.retry_after = parse_retry_after(response.headers.get("Retry-After")) if self.throttled else 0.0
+
+    # ---------- 计算等待时间 ----------
+    def next_delay(self, interval, now=None):
+        """返回(等待秒数, 说明)，interval为账号的(最小值, 最大值)基础间隔"""
+        now = now or time.time()
+        min_bound, max_bound = config.get("poll_bounds") or (MIN_CHECK_INTERVAL, MAX_CHECK_INTERVAL)
         
-        # 添加快速重试机制
-        max_quick_retries = 3  # 快速重试次数
-        quick_retry_delay = 2  # 快速重试间隔（秒）
-        retry_count = 0
+        if self.consecutive_failures:
+            # 指数退避加随机抖动，在[退避/2, 退避]之间取值
+            base = self.THROTTLE_BACKOFF if self.throttled else self.FAILURE_BACKOFF
+            backoff = min(max_bound, base * 2 ** (self.consecutive_failures - 1))
+            delay = random.uniform(backoff / 2, backoff)
+            reason = f"{'限流/服务器错误' if self.throttled else '检查失败'}退避(第{self.consecutive_failures}次)"
+        else:
+            heat = self.heat(now)
+            factor = min(self.MAX_FACTOR, max(self.MIN_FACTOR, 1 / heat))
+            delay = random.uniform(*interval) * factor
+            reason = f"时段热度 {heat:.2f}"
+        delay = min(max_bound, max(min_bound, delay))
         
-        # 确保cookies是请求库可以使用的格式
-        if not isinstance(recent_cookies, requests.cookies.RequestsCookieJar) and isinstance(recent_cookies, dict):
-            try:
-                cookie_jar = requests.cookies.RequestsCookieJar()
-                for name, value in recent_cookies.items():
-                    if name:
-                        cookie_jar.set(str(name), str(value), domain='.apple.com', path='/')
-                recent_cookies = cookie_jar
-                logging.debug("已将字典格式的cookies转换为RequestsCookieJar格式")
-            except Exception as e:
-                logging.error(f"转换cookie格式失败: {e}")
-                # 如果转换失败，重新获取cookie
-                return None, False
+        # 服务器要求的Retry-After优先于间隔上限，只有下限始终有效
+        if self.consecutive_failures and self.retry_after > delay:
+            if self.retry_after > max_bound:
+                logging.warning(f"服务器要求 {self.retry_after:.0f} 秒后重试，超过间隔上限 {max_bound} 秒，按服务器要求等待")
+            delay = self.retry_after
+            reason = f"服务器要求 Retry-After {self.retry_after:.0f} 秒"
         
-        # 确保cookies是有效的请求库可用的对象
-        if not isinstance(recent_cookies, requests.cookies.RequestsCookieJar):
-            logging.error("cookies不是有效的RequestsCookieJar对象")
-            return None, False
+        # 每小时请求预算：过去一小时的请求数已达上限时，等到最早的请求移出窗口
+        budget = config.get("hourly_budget")
+        while self.request_times and self.request_times[0] <= now - 3600:
+            self.request_times.popleft()
+        if budget and len(self.request_times) >= budget:
+            wait = self.request_times[len(self.request_times) - budget] + 3600 - now
+            if wait > delay:
+                delay = wait
+                reason = f"已用完每小时 {budget} 次请求预算"
+        return delay, reason
+
+class BaselineStateStore:
+    """页面比较基准的持久化：各部分哈希、整页指纹和任务记录
+
+    每次成功检查后保存，先写临时文件再替换；内容没有变化时只更新文件修改时间，
+    文件修改时间即基准最后一次得到确认的时间，启动时据此判断是否仍可信任
+    """
+
+    VERSION = 1
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.saved_state = None  # 最近一次写入文件的内容，用于判断是否需要重写
+
+    def snapshot(self, account):
+        """账号当前的比较基准"""
+        return {
+            "version": self.VERSION,
+            "eligible_section_hash": account.previous_eligible_section_hash,
+            "training_section_hash": account.previous_training_section_hash,
+            "page_fingerprint": account.previous_page_fingerprint,
+            "steady_tasks": list(account.previous_steady_tasks),
+            "task_records": {
+                section: [[record.section, record.name, record.count, record.source] for record in records.values()]
+                for section, records in account.previous_task_records.items()
+            },
+        }
+
+    def save(self, account):
+        """保存账号的比较基准，state_file为None时不保存"""
+        if not self.state_file:
+            return
+        state = self.snapshot(account)
+        try:
+            if state == self.saved_state and os.path.exists(self.state_file):
+                os.utime(self.state_file)
+                return
+            temp_file = f"{self.state_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(temp_file, self.state_file)
+            self.saved_state = state
+        except Exception as e:
+            logging.warning(f"保存比较基准失败: {e}")
+
+    def load(self, account, max_age):
+        """恢复不超过max_age秒的比较基准，成功时返回True"""
+        if not max_age or not self.state_file or not os.path.exists(self.state_file):
+            return False
+        try:
+            age = time.time() - os.path.getmtime(self.state_file)
+            if age > max_age:
+                logging.info(f"{account.label}保存的比较基准已有 {age / 60:.0f} 分钟，超过 {max_age} 秒，将重新记录")
+                return False
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("version") != self.VERSION:
+                return False
+            task_records = {}
+            for section, items in state.get("task_records", {}).items():
+                records = [TaskRecord(*item) for item in items]
+                task_records[section] = {record.key: record for record in records}
+        except Exception as e:
+            logging.warning(f"加载比较基准失败: {e}，将重新记录")
+            return False
         
-        while retry_count < max_quick_retries:
+        account.previous_eligible_section_hash = state.get("eligible_section_hash", "")
+        account.previous_training_section_hash = state.get("training_section_hash", "")
+        account.previous_page_fingerprint = state.get("page_fingerprint", "")
+        account.previous_steady_tasks = list(state.get("steady_tasks", []))
+        account.previous_task_records = task_records
+        self.saved_state = state
+        logging.info(f"{account.label}已从 {self.state_file} 恢复 {age:.0f} 秒前的比较基准")
+        return True
+
+class CookieHealth:
+    """账号cookie的生命周期：服务器刷新的cookie、必要cookie的过期时间和暂存的替换cookie
+
+    requests会把响应中的Set-Cookie（含Expires和Max-Age）合并进会话的cookie jar，
+    每次成功请求后比较jar的内容，有变化时写回cookie缓存文件；必要cookie即将过期时只提醒一次，
+    提前获取的替换cookie先暂存，当前cookie过期或检测到登录页面时再换上
+    """
+
+    def __init__(self, account):
+        self.account = account
+        self.fingerprint = None  # 上一次加载或保存时jar的内容
+        self.warned_expiry = None  # 已经提醒过的过期时间
+        self.staged = None  # 暂存的替换cookie: (cookie_jar, 来源)
+
+    @staticmethod
+    def jar_fingerprint(cookie_jar):
+        return {(cookie.domain, cookie.path, cookie.name): (cookie.value, cookie.expires) for cookie in cookie_jar}
+
+    def remember(self):
+        """记录当前jar的内容，加载或保存cookie文件后调用"""
+        self.fingerprint = self.jar_fingerprint(self.account.cookies)
+
+    def observe(self):
+        """成功请求后调用：服务器刷新了cookie时写回缓存文件，返回jar是否有变化"""
+        fingerprint = self.jar_fingerprint(self.account.cookies)
+        if fingerprint == self.fingerprint:
+            return False
+        previous = self.fingerprint or {}
+        changed = sorted({key[2] for key in fingerprint.keys() | previous.keys() if fingerprint.get(key) != previous.get(key)})
+        logging.info(f"{self.account.label}服务器刷新了cookie: {', '.join(changed)}")
+        if not save_cookies_to_file(self.account.cookies, self.account):
+            # 保存失败（例如必要cookie被清除）时不再重复尝试，等待重新登录
+            self.fingerprint = fingerprint
+        return True
+
+    def expiry(self):
+        """必要cookie中最早的过期时间戳，都是会话cookie（没有过期时间）时返回None"""
+        expires = [cookie.expires for cookie in self.account.cookies
+                   if cookie.name in REQUIRED_COOKIES and cookie.expires]
+        return min(expires) if expires else None
+
+    def expired(self, now=None):
+        expiry = self.expiry()
+        return expiry is not None and expiry <= (now or time.time())
+
+    def expiring(self, warn_before, now=None):
+        """必要cookie将在warn_before秒内过期且这个过期时间还没有提醒过时返回剩余秒数，否则返回None"""
+        expiry = self.expiry()
+        if not warn_before or expiry is None or expiry == self.warned_expiry:
+            return None
+        remaining = expiry - (now or time.time())
+        if remaining > warn_before:
+            return None
+        self.warned_expiry = expiry
+        return remaining
+
+    def stage(self, cookie_jar, browser):
+        """暂存提前获取的替换cookie"""
+        self.staged = (cookie_jar, browser)
+
+    def promote(self):
+        """换上暂存的替换cookie并保存到缓存文件，没有暂存的cookie时返回False"""
+        if self.staged is None:
+            return False
+        cookie_jar, browser = self.staged
+        self.staged = None
+        self.warned_expiry = None
+        replace_session_cookies(cookie_jar, self.account)
+        self.account.browser = browser
+        save_cookies_to_file(cookie_jar, self.account)
+        return True
+
+def normalize_cookie_value(value):
+    """手动输入和旧格式缓存中的cookie值转换：undefined为空，true/false为1/0"""
+    value = str(value)
+    lowered = value.lower()
+    if lowered == 'undefined':
+        return ''
+    if lowered == 'true':
+        return '1'
+    if lowered == 'false':
+        return '0'
+    return value
+
+class CookieStore:
+    """cookie缓存文件：每个cookie保存名称、值、域、路径、过期时间和secure标记
+
+    先写临时文件再替换，进程被终止时不会留下写了一半的文件；内容与上次写入或读取的相同时不重写。
+    读取时直接创建Cookie对象放入会话；旧格式（名称到值的字典）仍可读取，下次保存时转换为新格式
+    """
+
+    VERSION = 2
+
+    def __init__(self, cookie_file):
+        self.cookie_file = cookie_file
+        self.saved = None  # 最近一次写入或读取的(cookie记录, 来源)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def records(cookies):
+        return [{"name": cookie.name, "value": cookie.value, "domain": cookie.domain, "path": cookie.path,
+                 "expires": cookie.expires, "secure": bool(cookie.secure)} for cookie in cookies]
+
+    def save(self, cookie_jar, browser):
+        """保存cookie jar，返回是否写入了文件"""
+        records = self.records(cookie_jar)
+        with self.lock:
+            if (records, browser) == self.saved and os.path.exists(self.cookie_file):
+                return False
+            temp_file = f"{self.cookie_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': self.VERSION,
+                    'cookies': records,
+                    'browser': browser,
+                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                }, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.cookie_file)
+            self.saved = (records, browser)
+            return True
+
+    def load(self):
+        """读取缓存文件，返回(Cookie对象列表, 来源, 保存时间)"""
+        with self.lock:
+            with open(self.cookie_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        items = data.get('cookies')
+        browser = data.get('browser', 'manual')
+        if isinstance(items, list):
+            cookies = [
+                requests.cookies.create_cookie(
+                    item['name'], item['value'], domain=item.get('domain', '.apple.com'), path=item.get('path', '/'),
+                    expires=item.get('expires'), secure=item.get('secure', False))
+                for item in items if item.get('name')
+            ]
+            self.saved = (self.records(cookies), browser)
+        elif isinstance(items, dict):
+            # 旧格式只有名称和值，过期时间单独保存
+            expires = data.get('expires') or {}
+            cookies = [
+                requests.cookies.create_cookie(str(name), normalize_cookie_value(value), domain='.apple.com', path='/',
+                                               expires=expires.get(name))
+                for name, value in items.items() if name
+            ]
+        else:
+            cookies = []
+        return cookies, browser, data.get('timestamp', '')
+
+class CheckHistory:
+    """检查结果历史数据库（SQLite）：每次检查一行，任务按连续出现的时间段记录
+
+    checks表记录时间、账号、状态、耗时、各部分哈希和任务数量；task_spans表中每行是一个任务从出现到消失的一段时间，
+    任务仍在页面上时只更新last_seen，因此行数与任务变化次数成正比而不是与检查次数成正比。
+    写入由后台线程批量提交，轮询只把记录放入队列，不等待磁盘
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS checks (
+            ts REAL NOT NULL, account TEXT NOT NULL, status TEXT NOT NULL, success INTEGER NOT NULL,
+            latency REAL, eligible_hash TEXT, training_hash TEXT,
+            eligible_count INTEGER, training_count INTEGER, new_events INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_checks_ts ON checks (ts);
+        CREATE TABLE IF NOT EXISTS task_spans (
+            id INTEGER PRIMARY KEY, account TEXT NOT NULL, section TEXT NOT NULL, name TEXT NOT NULL,
+            first_seen REAL NOT NULL, last_seen REAL NOT NULL, max_count INTEGER, closed INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_spans_name ON task_spans (name COLLATE NOCASE, last_seen);
+        CREATE INDEX IF NOT EXISTS idx_spans_open ON task_spans (account, closed);
+    """
+
+    # 每批最多提交的记录数
+    BATCH_SIZE = 200
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.queue = queue.Queue()
+        self.open_spans = {}  # {(账号, 部分, 名称): (行id, 最大数量)}，只由写入线程使用
+        self.thread = None
+
+    def connect(self):
+        connection = sqlite3.connect(self.db_file, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(self.SCHEMA)
+        return connection
+
+    def start(self):
+        """打开数据库并启动写入线程"""
+        self.connection = self.connect()
+        for span_id, account, section, name, max_count in self.connection.execute(
+                "SELECT id, account, section, name, max_count FROM task_spans WHERE closed = 0"):
+            self.open_spans[(account, section, name)] = (span_id, max_count)
+        self.thread = threading.Thread(target=self._writer, name="baseline-history", daemon=True)
+        self.thread.start()
+        logging.info(f"检查历史写入 {self.db_file}")
+
+    def record(self, account, status, success, latency, now=None):
+        """记录一次检查结果；成功时附带账号当前的任务记录，由写入线程更新任务时间段"""
+        if self.thread is None:
+            return
+        tasks = None
+        counts = {}
+        if success:
+            tasks = []
+            for section, records in account.previous_task_records.items():
+                counts[section] = len(records)
+                tasks.extend((record.section, record.name, record.count) for record in records.values())
+        row = (now or time.time(), account.name, status, int(bool(success)), latency,
+               account.previous_eligible_section_hash or None, account.previous_training_section_hash or None,
+               counts.get("Eligible Tasks"), counts.get("Training Tasks"),
+               sum(1 for event in account.task_events if event.is_new_work))
+        self.queue.put((row, tasks))
+
+    def _writer(self):
+        while True:
+            item = self.queue.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.BATCH_SIZE:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            # 在副本上修改未结束的时间段，事务提交后才替换；回滚时内存中的行id与数据库保持一致
+            open_spans = dict(self.open_spans)
             try:
-                # 增加超时设置，连接超时15秒，读取超时45秒
-                response = requests.get(BASELINE_URL, 
-                    cookies=recent_cookies,
-                    headers={
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                        "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                        "Connection": "keep-alive",
-                        "Upgrade-Insecure-Requests": "1"
-                    },
-                    timeout=(15, 45)  # 连接超时15秒，读取超时45秒
-                )
-                
-                # 检查HTTP状态码
-                if response.status_code != 200:
-                    logging.warning(f"HTTP请求失败: 状态码 {response.status_code}")
-                    # 保存错误响应内容用于调试
-                    with open("error_response.html", "w", encoding="utf-8") as f:
-                        f.write(response.text)
-                    retry_count += 1
-                    if retry_count < max_quick_retries:
-                        logging.info(f"快速重试 ({retry_count}/{max_quick_retries})...")
-                        time.sleep(quick_retry_delay)
-                        continue
-                    return None, False
-                    
-                # 检查是否是登录页面
-                if "You are being logged in" not in response.text and "auto-sign-in" not in response.text:
-                    logging.debug("cookie成功访问")  # 降级为debug级别
-                    tasks, success = process_response(response)
-                    
-                    # 格式化Training Tasks的输出
-                    if tasks and success and any("Training" in task for task in tasks):
-                        formatted_tasks = format_training_tasks_output(tasks)
-                        return formatted_tasks, success
-                    return tasks, success
-                else:
-                    logging.warning("cookie已失效，检测到登录页面")
-                    # 保存登录页面用于调试
-                    with open("login_page.html", "w", encoding="utf-8") as f:
-                        f.write(response.text)
-                        
-                    # 如果使用的是临时浏览器会话cookie，可以尝试重新获取
-                    if recent_browser == 'manual_clean':
-                        logging.info("尝试重新打开临时浏览器会话获取新cookie...")
-                        cookie_str = open_clean_browser_for_login()
-                        if cookie_str and isinstance(cookie_str, str) and len(cookie_str.strip()) > 10:
-                            cookie_jar = create_cookie_jar_from_string(cookie_str)
-                            if cookie_jar and isinstance(cookie_jar, requests.cookies.RequestsCookieJar) and len(cookie_jar) > 0:
-                                recent_cookies = cookie_jar
-                                recent_browser = 'manual_clean'
-                                # 保存新获取的cookie到文件
-                                save_cookies_to_file(cookie_jar)
-                                logging.info("成功获取新cookie并保存，再次尝试访问...")
-                                
-                                # 使用新cookie尝试访问，同样添加超时设置
-                                try:
-                                    response = requests.get(BASELINE_URL, 
-                                        cookies=recent_cookies,
-                                        headers={
-                                            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                                            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                                            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-                                            "Connection": "keep-alive",
-                                            "Upgrade-Insecure-Requests": "1"
-                                        },
-                                        timeout=(15, 45)  # 连接超时15秒，读取超时45秒
-                                    )
-                                    
-                                    if response.status_code == 200 and "You are being logged in" not in response.text and "auto-sign-in" not in response.text:
-                                        logging.info("使用新cookie成功访问")
-                                        return process_response(response)
-                                    else:
-                                        logging.warning("使用新cookie访问失败，需要重新登录")
-                                        speak_voice("登录已失效，请重新登录")  # 只在确认cookie失效时播放语音
-                                except Exception as e2:
-                                    logging.error(f"使用新cookie尝试访问时出错: {e2}")
-                                    speak_voice("使用新登录信息失败，请重新登录")
-                            else:
-                                logging.error("无法创建cookie jar，cookie字符串可能无效")
-                                speak_voice("登录信息无效，请重新登录")  # 只在确认cookie无效时播放语音
-                        else:
-                            logging.error("未能获取新的cookie字符串")
-                            speak_voice("无法获取登录信息，请重新登录")  # 只在确认无法获取cookie时播放语音
-                    else:
-                        speak_voice("登录已失效，请重新登录")  # 只在确认cookie失效时播放语音
-                    return None, False
-                    
-            except requests.exceptions.Timeout as e:
-                logging.error(f"请求超时: {e}")
-                retry_count += 1
-                if retry_count < max_quick_retries:
-                    logging.info(f"快速重试 ({retry_count}/{max_quick_retries})...")
-                    time.sleep(quick_retry_delay)
-                    continue
-                # 只在所有重试都失败后返回，不播放语音
-                return None, False
-            except requests.exceptions.ConnectionError as e:
-                logging.error(f"连接错误: {e}")
-                retry_count += 1
-                if retry_count < max_quick_retries:
-                    logging.info(f"快速重试 ({retry_count}/{max_quick_retries})...")
-                    time.sleep(quick_retry_delay)
-                    continue
-                # 只在所有重试都失败后返回，不播放语音
-                return None, False
-            except requests.exceptions.RequestException as e:
-                logging.error(f"请求异常: {e}")
-                retry_count += 1
-                if retry_count < max_quick_retries:
-                    logging.info(f"快速重试 ({retry_count}/{max_quick_retries})...")
-                    time.sleep(quick_retry_delay)
-                    continue
-                # 只在所有重试都失败后返回，不播放语音
-                return None, False
+                with self.connection:
+                    for row, tasks in batch:
+                        self._write(row, tasks, open_spans)
+                self.open_spans = open_spans
             except Exception as e:
-                logging.error(f"使用cookie访问失败: {e}")
+                logging.warning(f"写入检查历史失败: {e}")
+            if item is None:
+                self.connection.close()
+                return
+
+    def _write(self, row, tasks, open_spans):
+        self.connection.execute("INSERT INTO checks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+        if tasks is None:
+            return
+        ts, account = row[0], row[1]
+        # 先结束已消失任务的时间段（last_seen保留为最后一次看到的时间），
+        # 再用一条语句更新其余未结束时间段的last_seen，最后为新出现的任务开始新的时间段
+        current = {(account, section, name): count for section, name, count in tasks}
+        for key in [key for key in open_spans if key[0] == account and key not in current]:
+            span_id, _ = open_spans.pop(key)
+            self.connection.execute("UPDATE task_spans SET closed = 1 WHERE id = ?", (span_id,))
+        self.connection.execute("UPDATE task_spans SET last_seen = ? WHERE account = ? AND closed = 0", (ts, account))
+        for key, count in current.items():
+            span = open_spans.get(key)
+            if span is None:
+                cursor = self.connection.execute(
+                    "INSERT INTO task_spans (account, section, name, first_seen, last_seen, max_count) VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, ts, ts, count))
+                open_spans[key] = (cursor.lastrowid, count)
+            elif count is not None and (span[1] is None or count > span[1]):
+                self.connection.execute("UPDATE task_spans SET max_count = ? WHERE id = ?", (count, span[0]))
+                open_spans[key] = (span[0], count)
+
+    def close(self):
+        """写完队列中的记录后关闭数据库"""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout=10)
+        self.thread = None
+
+# 检查历史数据库，启用时在main中创建
+check_history = None
+
+def _format_ts(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+
+def _format_duration(seconds):
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f} 小时"
+    if seconds >= 60:
+        return f"{seconds / 60:.1f} 分钟"
+    return f"{seconds:.0f} 秒"
+
+def _sql_median(connection, query, params=()):
+    """在一次排序中用窗口函数取中位数和总数，query须返回名为value的一列；没有数据时返回(None, 0)"""
+    row = connection.execute(
+        f"SELECT value, n FROM (SELECT value, ROW_NUMBER() OVER (ORDER BY value) AS rn, COUNT(*) OVER () AS n "
+        f"FROM ({query})) WHERE rn = n / 2 + 1", params).fetchone()
+    return row if row else (None, 0)
+
+def _like_prefix(text):
+    """把任务名称转换为前缀匹配的LIKE模式，名称中的通配符按原样匹配；前缀匹配可以使用名称索引"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def query_check_history(db_file, query, argument=None):
+    """回答关于检查历史的查询并打印结果
+
+    summary [小时数]   最近一段时间（默认24小时）的检查次数、状态分布和耗时中位数
+    last <任务名称>    任务最近几次出现的时间（先精确匹配，没有结果时按前缀匹配）
+    open [任务名称]    任务从出现到消失持续时间的中位数（按名称前缀筛选）
+    current           当前仍在页面上的任务
+
+    名称比较不区分大小写，精确匹配和前缀匹配都使用task_spans的名称索引
+    """
+    if not os.path.exists(db_file):
+        print(f"检查历史数据库不存在: {db_file}")
+        return False
+    connection = sqlite3.connect(db_file)
+    connection.executescript(CheckHistory.SCHEMA)
+    try:
+        if query == "summary":
+            hours = float(argument or 24)
+            since = time.time() - hours * 3600
+            print(f"最近 {hours:g} 小时的检查:")
+            for status, success, count in connection.execute(
+                    "SELECT status, success, COUNT(*) FROM checks WHERE ts >= ? GROUP BY status, success ORDER BY 3 DESC",
+                    (since,)):
+                print(f"  {status:<10} {'成功' if success else '失败'} {count} 次")
+            median, count = _sql_median(
+                connection, "SELECT latency AS value FROM checks WHERE ts >= ? AND latency IS NOT NULL", (since,))
+            if count:
+                print(f"  请求耗时中位数: {median * 1000:.0f} ms（{count} 次）")
+            new_events = connection.execute(
+                "SELECT COALESCE(SUM(new_events), 0) FROM checks WHERE ts >= ?", (since,)).fetchone()[0]
+            print(f"  新任务事件: {new_events}")
+        elif query == "last":
+            if not argument:
+                print("请指定任务名称，例如: --history last \"Search - Apple Music Top Hits\"")
+                return False
+            sql = ("SELECT account, section, name, first_seen, last_seen, closed, max_count FROM task_spans "
+                   "WHERE name = ? COLLATE NOCASE ORDER BY last_seen DESC LIMIT 10")
+            rows = connection.execute(sql, (argument,)).fetchall()
+            if not rows:
+                rows = connection.execute(sql.replace("name = ? COLLATE NOCASE", "name LIKE ? ESCAPE '\\'"),
+                                          (_like_prefix(argument),)).fetchall()
+            if not rows:
+                print(f"没有找到任务: {argument}")
+                return False
+            for account, section, name, first_seen, last_seen, closed, max_count in rows:
+                state = "已消失" if closed else "仍在页面上"
+                count = "" if max_count is None else f" 最大数量 {max_count}"
+                print(f"  [{account}] [{section}] {name}: {_format_ts(first_seen)} 至 {_format_ts(last_seen)}"
+                      f"（{_format_duration(last_seen - first_seen)}，{state}）{count}")
+        elif query == "open":
+            where, params = "closed = 1", ()
+            if argument:
+                where, params = "closed = 1 AND name LIKE ? ESCAPE '\\'", (_like_prefix(argument),)
+            median, count = _sql_median(
+                connection, f"SELECT last_seen - first_seen AS value FROM task_spans WHERE {where}", params)
+            if not count:
+                print("还没有已结束的任务记录")
+                return False
+            print(f"任务持续时间中位数: {_format_duration(median)}（{count} 段）")
+        elif query == "current":
+            rows = connection.execute(
+                "SELECT account, section, name, first_seen, max_count FROM task_spans WHERE closed = 0 ORDER BY first_seen").fetchall()
+            if not rows:
+                print("当前没有任务")
+            for account, section, name, first_seen, max_count in rows:
+                count = "" if max_count is None else f" ({max_count})"
+                print(f"  [{account}] [{section}] {name}{count} 自 {_format_ts(first_seen)}")
+        else:
+            print(f"未知的查询: {query}，可用查询: summary, last, open, current")
+            return False
+    finally:
+        connection.close()
+    return True
+
+class MonitorMetrics:
+    """监控指标：各阶段耗时直方图、检查结果计数器和cookie年龄，按Prometheus文本格式输出
+
+    每次记录只做一次二分查找和几次加法；cookie年龄在输出时根据cookie缓存文件的修改时间计算，不占用轮询
+    """
+
+    # 直方图桶上限(秒)
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    COUNTERS = {
+        "baseline_checks_total": "页面检查次数，按结果区分",
+        "baseline_relogins_total": "重新登录次数",
+        "baseline_alerts_total": "新任务提醒次数",
+    }
+
+    def __init__(self, accounts=None):
+        self.lock = threading.Lock()
+        self.accounts = list(accounts or [default_account])
+        self.histograms = {}  # {阶段: [各桶计数..., +Inf计数]}
+        self.sums = collections.defaultdict(float)
+        self.counters = collections.Counter()  # {(指标名, 标签元组): 值}
+        self.last_dump = 0.0
+
+    def observe(self, stage, seconds):
+        """记录一次阶段耗时"""
+        index = bisect.bisect_left(self.BUCKETS, seconds)
+        with self.lock:
+            buckets = self.histograms.get(stage)
+            if buckets is None:
+                buckets = self.histograms[stage] = [0] * (len(self.BUCKETS) + 1)
+            buckets[index] += 1
+            self.sums[stage] += seconds
+
+    def increment(self, name, account, **labels):
+        key = (name, (("account", account.name),) + tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] += 1
+
+    def render(self):
+        """生成Prometheus文本格式的指标"""
+        lines = ["# HELP baseline_stage_duration_seconds 检查各阶段耗时",
+                 "# TYPE baseline_stage_duration_seconds histogram"]
+        with self.lock:
+            histograms = {stage: list(buckets) for stage, buckets in self.histograms.items()}
+            sums = dict(self.sums)
+            counters = dict(self.counters)
+        for stage in sorted(histograms):
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + ("+Inf",), histograms[stage]):
+                cumulative += count
+                lines.append(f'baseline_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'baseline_stage_duration_seconds_sum{{stage="{stage}"}} {sums[stage]:.6f}')
+            lines.append(f'baseline_stage_duration_seconds_count{{stage="{stage}"}} {cumulative}')
+        for name, description in self.COUNTERS.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                    lines.append(f"{name}{{{label_text}}} {value}")
+        lines += ["# HELP baseline_cookie_age_seconds 距cookie缓存文件上次保存的时间",
+                  "# TYPE baseline_cookie_age_seconds gauge"]
+        now = time.time()
+        for account in self.accounts:
+            try:
+                age = now - os.path.getmtime(account.cookie_file)
+            except OSError:
+                continue
+            lines.append(f'baseline_cookie_age_seconds{{account="{account.name}"}} {age:.0f}')
+        lines += ["# HELP baseline_cookie_expiry_seconds 距必要cookie中最早过期的时间",
+                  "# TYPE baseline_cookie_expiry_seconds gauge"]
+        for account in self.accounts:
+            expiry = account.cookie_health.expiry()
+            if expiry is not None:
+                lines.append(f'baseline_cookie_expiry_seconds{{account="{account.name}"}} {expiry - now:.0f}')
+        if parse_pool is not None:
+            lines += parse_pool.metrics_lines()
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path, min_interval=10):
+        """把指标写入文件，min_interval秒内最多写一次"""
+        now = time.time()
+        if now - self.last_dump < min_interval:
+            return
+        self.last_dump = now
+        temp_file = f"{path}.tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(temp_file, path)
+        except Exception as e:
+            logging.warning(f"写入指标文件失败: {e}")
+
+    def serve(self, port):
+        """在本机端口上提供/metrics，返回HTTP服务器"""
+        metrics = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(f"指标请求: {format % args}")
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="baseline-metrics", daemon=True).start()
+        logging.info(f"指标地址: http://127.0.0.1:{server.server_port}/metrics")
+        return server
+
+# 监控指标，指定--metrics-port或--metrics-file时在main中创建
+metrics = None
+
+def parse_retry_after(value):
+    """解析Retry-After响应头（秒数或HTTP日期），返回需要等待的秒数"""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_time = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_time.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+def parse_interval(text):
+    """解析'最小值-最大值'格式的检查间隔，格式无效时返回None"""
+    try:
+        min_val, max_val = map(int, str(text).split("-"))
+        return min_val, max_val
+    except ValueError:
+        return None
+
+class MonitorAccount:
+    """一个Baseline账号的监控状态：会话和cookies、页面比较基准、轮询状态和检查间隔"""
+
+    def __init__(self, name="default", cookie_file=COOKIE_CACHE_FILE, interval=None, adapter=None,
+                 history_file=DETECTION_HISTORY_FILE, state_file=BASELINE_STATE_FILE):
+        self.name = name
+        self.cookie_file = cookie_file
+        # 检查间隔(最小值, 最大值)，None表示使用全局的检查间隔
+        self.interval = interval
+        # 根据该账号的任务检测历史调整检查间隔
+        self.scheduler = AdaptiveScheduler(history_file)
+        # 比较基准保存在磁盘上，重启后继续使用
+        self.state_store = BaselineStateStore(state_file)
+        self.session = BaselineSession(adapter=adapter, on_request=self.scheduler.record_request)
+        # cookies的来源（manual_clean、manual、chrome等）
+        self.browser = None
+        # cookie缓存文件，以及服务器刷新的cookie和过期时间
+        self.cookie_store = CookieStore(cookie_file)
+        self.cookie_health = CookieHealth(self)
+        
+        # 用于保存之前Eligible Tasks部分的哈希值
+        self.previous_eligible_section_hash = ""
+        # 用于保存Training Tasks的哈希值
+        self.previous_training_section_hash = ""
+        # 各部分上一次的任务记录，按部分名称保存{(部分, 名称): TaskRecord}，用于比较变化
+        self.previous_task_records = {}
+        # 最近一次解析页面得到的任务差异事件，由轮询取走后交给提醒
+        self.task_events = []
+        # 页面未变化时process_response应返回的任务列表（不含变化提示），供304/正文未变化时直接复用
+        self.previous_steady_tasks = []
+        # 上一次成功处理的页面指纹
+        self.previous_page_fingerprint = ""
+        
+        # 轮询状态
+        self.is_first_check = True
+        self.failed_attempts = 0
+        self.relogin_task = None
+        self.check_now = None  # 异步监控运行时创建的立即检查事件
+        self.last_check = None  # 最近一次检查: {"time", "status", "success"}
+        self.needs_cookie = False  # 后台运行时cookie失效，等待通过控制接口重新加载
+
+    @property
+    def cookies(self):
+        return self.session.cookies
+
+    def take_task_events(self):
+        """取走最近一次检测得到的任务差异事件"""
+        events, self.task_events = self.task_events, []
+        return events
+
+    @property
+    def label(self):
+        """日志和提示中使用的账号前缀，单账号模式下为空"""
+        return "" if self is default_account else f"[{self.name}] "
+
+    def next_delay(self):
+        """由调度器计算下一次检查前的等待时间，返回(秒数, 说明)"""
+        return self.scheduler.next_delay(self.interval or (MIN_CHECK_INTERVAL, MAX_CHECK_INTERVAL))
+
+    def restore_state(self):
+        """恢复保存的比较基准，成功时之后的第一次检查即可正常提醒"""
+        if self.state_store.load(self, config.get("state_max_age")):
+            self.is_first_check = False
+            return True
+        return False
+
+    def save_state(self):
+        self.state_store.save(self)
+
+def load_accounts(accounts_file):
+    """从JSON文件加载账号列表
+
+    文件格式为[{"name": "alice", "cookie_file": "...", "interval": "10-15", "history_file": "...", "state_file": "..."}, ...]，
+    cookie_file默认为cookie_cache_<name>.json，history_file默认为detection_history_<name>.json，
+    state_file默认为baseline_state_<name>.json，interval默认使用全局检查间隔
+    """
+    with open(accounts_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    # 所有账号的会话共用一个连接池，连接数按账号数量放大，保证各账号可以同时请求
+    adapter = _TimedHTTPAdapter(pool_connections=1, pool_maxsize=max(4, len(data)))
+    accounts = []
+    for i, entry in enumerate(data, 1):
+        name = str(entry.get("name") or f"account{i}")
+        if any(account.name == name for account in accounts):
+            raise ValueError(f"账号名称重复: {name}")
+        interval = None
+        if entry.get("interval"):
+            interval = parse_interval(entry["interval"])
+            if interval is None:
+                logging.warning(f"账号 {name} 的间隔格式无效: {entry['interval']}，使用全局间隔")
+        accounts.append(MonitorAccount(
+            name=name,
+            cookie_file=entry.get("cookie_file") or f"cookie_cache_{name}.json",
+            interval=interval,
+            adapter=adapter,
+            history_file=entry.get("history_file") or f"detection_history_{name}.json",
+            state_file=entry.get("state_file") or f"baseline_state_{name}.json",
+        ))
+    if not accounts:
+        raise ValueError("账号文件中没有任何账号")
+    return accounts
+
+# 单账号模式使用的默认账号，全局HTTP会话即其会话，在整个监控过程中复用
+default_account = MonitorAccount()
+http_session = default_account.session
+
+def replace_session_cookies(cookie_jar, account=None):
+    """用新的cookie jar替换账号会话中的cookies（原地替换）"""
+    account = account or default_account
+    return account.session.replace_cookies(cookie_jar)
+
+def fetch_baseline_page(account=None):
+    """请求Baseline页面（含快速重试），返回(response, 状态)
+
+    状态取值: "ok" 需要解析, "unchanged" 页面未变化, "login" 检测到登录页面,
+    "no_cookies" 没有可用cookie, "error" 请求失败
+    """
+    account = account or default_account
+    session = account.session
+    
+    # 使用账号会话中的cookie
+    if not (len(session.cookies) and account.browser):
+        return None, "no_cookies"
+    
+    # 降级为debug级别，避免频繁输出
+    logging.debug(f"{account.label}使用{account.browser} cookies访问...")
+    
+    # 添加快速重试机制
+    max_quick_retries = 3  # 快速重试次数
+    quick_retry_delay = 2  # 快速重试间隔（秒）
+    retry_count = 0
+    
+    while retry_count < max_quick_retries:
+        try:
+            # 通过长连接会话请求，复用已建立的TCP/TLS连接；流式模式下只读取任务部分
+            anchors = stream_anchors() if config.get("stream") else None
+            response = session.get(BASELINE_URL, stream=anchors is not None)
+            session.log_connection_stats()
+            if anchors is not None and response.status_code == 200 and "thank" not in response.url.lower():
+                response = read_streamed_page(response, anchors, session, config.get("stream_chunk", 16384))
+            elif anchors is not None:
+                # 304、错误和感谢页面很小，直接读完以释放连接
+                response.content
+            
+            # 页面自上次成功检查后没有变化（304或正文哈希相同），跳过解析
+            if session.is_unchanged(response):
+                account.cookie_health.observe()
+                logging.info(f"页面未变化（{'304 Not Modified' if response.status_code == 304 else '正文哈希相同'}），跳过解析")
+                return response, "unchanged"
+            
+            # 检查HTTP状态码
+            if response.status_code != 200:
+                logging.warning(f"HTTP请求失败: 状态码 {response.status_code}")
+                # 保存错误响应内容用于调试
+                with open("error_response.html", "w", encoding="utf-8") as f:
+                    f.write(response.text)
+                # 限流或服务器错误时不快速重试，由调度器退避
+                if response.status_code == 429 or response.status_code >= 500:
+                    return response, "error"
                 retry_count += 1
                 if retry_count < max_quick_retries:
                     logging.info(f"快速重试 ({retry_count}/{max_quick_retries})...")
                     time.sleep(quick_retry_delay)
                     continue
-                # 只在所有重试都失败后返回，不播放语音
-                return None, False
+                return response, "error"
+                
+            # 检查是否是登录页面
+            if "You are being logged in" not in response.text and "auto-sign-in" not in response.text:
+                logging.debug("cookie成功访问")  # 降级为debug级别
+                account.cookie_health.observe()
+                return response, "ok"
+            
+            logging.warning("cookie已失效，检测到登录页面")
+            # 保存登录页面用于调试
+            with open("login_page.html", "w", encoding="utf-8") as f:
+                f.write(response.text)
+            return response, "login"
+                
+        except requests.exceptions.Timeout as e:
+            logging.error(f"请求超时: {e}")
+        except requests.exceptions.ConnectionError as e:
+            logging.error(f"连接错误: {e}")
+        except requests.exceptions.RequestException as e:
+            logging.error(f"请求异常: {e}")
+        except Exception as e:
+            logging.error(f"使用cookie访问失败: {e}")
+        
+        retry_count += 1
+        if retry_count < max_quick_retries:
+            logging.info(f"快速重试 ({retry_count}/{max_quick_retries})...")
+            time.sleep(quick_retry_delay)
+            continue
+        # 只在所有重试都失败后返回，不播放语音
+        return None, "error"
+    
+    return None, "error"
+
+def tasks_from_response(response, status, account=None):
+    """把fetch_baseline_page的结果转换为(tasks, success)，仅处理"ok"和"unchanged"两种状态"""
+    account = account or default_account
+    if status == "unchanged":
+        account.save_state()
+        tasks = list(account.previous_steady_tasks)
+        if tasks and any("Training" in task for task in tasks):
+            return format_training_tasks_output(tasks), True
+        return tasks, True
+    
+    if status != "ok":
+        return None, False
     
-    # 如果没有cookie，返回失败并播放语音提示
-    logging.error("没有可用的cookie，请重新获取")
-    speak_voice("没有可用的登录信息，请重新登录")  # 这个提示保留，因为这是配置问题而不是临时错误
+    tasks, success = process_response(response, account)
+    if success:
+        account.session.remember_validators(response)
+        account.save_state()
+    
+    # 格式化Training Tasks的输出
+    if tasks and success and any("Training" in task for task in tasks):
+        formatted_tasks = format_training_tasks_output(tasks)
+        return formatted_tasks, success
+    return tasks, success
+
+def mark_needs_cookie(account):
+    """后台运行时cookie失效：只提醒一次，等待更新cookie文件后通过控制接口重新加载"""
+    if account.needs_cookie:
+        return
+    account.needs_cookie = True
+    logging.warning(f"{account.label}cookie已失效，请更新 {account.cookie_file} 后调用控制接口 reload-cookies")
+    notify("Apple Baseline 需要重新登录", f"{account.name} 的cookie已失效，请更新cookie文件", account)
+
+def check_baseline_tasks(account=None):
+    """检查Baseline页面是否有任务"""
+    account = account or default_account
+    
+    update_operation_time()  # 更新操作时间
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    logging.info(f"{account.label}{current_time} - 开始检查任务...")
+    
+    response, status = fetch_baseline_page(account)
+    
+    if status == "no_cookies":
+        # 如果没有cookie，返回失败并播放语音提示
+        logging.error("没有可用的cookie，请重新获取")
+        speak_voice("没有可用的登录信息，请重新登录")  # 这个提示保留，因为这是配置问题而不是临时错误
+        return None, False
+    
+    if status != "login":
+        return tasks_from_response(response, status, account)
+    
+    # 后台运行时没有人完成登录，不打开浏览器
+    if config.get("daemon", False):
+        mark_needs_cookie(account)
+        return None, False
+    
+    # 如果使用的是临时浏览器会话cookie，可以尝试重新获取
+    if account.browser == 'manual_clean':
+        logging.info("尝试重新打开临时浏览器会话获取新cookie...")
+        cookie_str = open_clean_browser_for_login()
+        if cookie_str and isinstance(cookie_str, str) and len(cookie_str.strip()) > 10:
+            cookie_jar = create_cookie_jar_from_string(cookie_str)
+            if cookie_jar and isinstance(cookie_jar, requests.cookies.RequestsCookieJar) and len(cookie_jar) > 0:
+                replace_session_cookies(cookie_jar, account)
+                account.browser = 'manual_clean'
+                # 保存新获取的cookie到文件
+                save_cookies_to_file(cookie_jar, account)
+                logging.info("成功获取新cookie并保存，再次尝试访问...")
+                
+                # 使用新cookie尝试访问，会话中的cookie jar已原地替换
+                try:
+                    response = account.session.get(BASELINE_URL)
+                    
+                    if response.status_code == 200 and "You are being logged in" not in response.text and "auto-sign-in" not in response.text:
+                        logging.info("使用新cookie成功访问")
+                        tasks, success = process_response(response, account)
+                        if success:
+                            account.session.remember_validators(response)
+                            account.save_state()
+                        return tasks, success
+                    else:
+                        logging.warning("使用新cookie访问失败，需要重新登录")
+                        speak_voice("登录已失效，请重新登录")  # 只在确认cookie失效时播放语音
+                except Exception as e2:
+                    logging.error(f"使用新cookie尝试访问时出错: {e2}")
+                    speak_voice("使用新登录信息失败，请重新登录")
+            else:
+                logging.error("无法创建cookie jar，cookie字符串可能无效")
+                speak_voice("登录信息无效，请重新登录")  # 只在确认cookie无效时播放语音
+        else:
+            logging.error("未能获取新的cookie字符串")
+            speak_voice("无法获取登录信息，请重新登录")  # 只在确认无法获取cookie时播放语音
+    else:
+        speak_voice("登录已失效，请重新登录")  # 只在确认cookie失效时播放语音
     return None, False
 
+@stage_timer.timed("has_actual_tasks")
 def has_actual_tasks(section, section_name="Eligible Tasks"):
     """检查指定的任务部分是否有实际的任务内容"""
     if not section:
         return False
     
-    section_text = section.get_text().lower()
+    rule = section_rule(section_name)
+    if rule:
+        has_tasks = rule_has_tasks(section, rule)
+        if has_tasks is not None:
+            return has_tasks
+    
+    section_text = node_text_lower(section)
     section_name_lower = section_name.lower()
     
     # 尝试检查该部分是否有实际内容（不只是标题）
     # 首先删除标题元素
     for heading in section.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-        if heading.get_text().strip().lower() == section_name_lower:
+        heading_text = node_text(heading).strip()
+        if heading_text.lower() == section_name_lower:
             heading_parent = heading.parent
             # 如果标题的父元素只包含这个标题，可能就是没有任务的空部分
-            if heading_parent and len(heading_parent.get_text().strip()) <= len(heading.get_text().strip()) + 10:
+            if heading_parent and len(node_text(heading_parent).strip()) <= len(heading_text) + 10:
                 return False
     
     # 如果是共用容器，尝试提取特定部分的内容
@@ -625,7 +2689,7 @@ def has_actual_tasks(section, section_name="Eligible Tasks"):
     # 如果找到多个块，尝试定位特定任务类型的块
     if len(section_blocks) > 1:
         for block in section_blocks:
-            block_text = block.get_text().lower()
+            block_text = node_text_lower(block)
             if section_name_lower in block_text:
                 # 如果找到包含特定任务类型名称的块，在其中检查任务
                 section = block
@@ -702,21 +2766,22 @@ def has_actual_tasks(section, section_name="Eligible Tasks"):
             context_text = ""
             
             # 向上查找最近的标题
-            for heading in element.find_all_previous(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])[:3]:  # 只看最近的3个标题
-                context_text += heading.get_text().lower() + " "
-                
-            if section_name_lower in context_text or any(indicator in element.get_text().lower() for indicator in task_indicators):
+            for heading in previous_headings(element, 3):  # 只看最近的3个标题
+                context_text += node_text_lower(heading) + " "
+            
+            element_text = node_text_lower(element)
+            if section_name_lower in context_text or any(indicator in element_text for indicator in task_indicators):
                 return True
     
     # 检查是否有按钮或链接，但排除"查看更多"等通用导航
     action_elements = section.find_all(['button', 'a'])
     for element in action_elements:
-        element_text = element.get_text().lower() if element.get_text() else ""
+        element_text = node_text_lower(element)
         if element_text and any(term in element_text for term in ['enroll', 'join', 'apply', 'start', 'view task']):
             # 检查此元素是否属于当前任务类型
             for parent in element.parents:
-                if parent == section:  # 确认在同一部分内
-                    parent_text = parent.get_text().lower()
+                if parent is section:  # 确认在同一部分内
+                    parent_text = node_text_lower(parent)
                     if section_name_lower in parent_text:
                         return True
     
@@ -728,24 +2793,16 @@ def has_actual_tasks(section, section_name="Eligible Tasks"):
     
     return False
 
-def process_response(response):
+def process_response(response, account=None):
     """处理响应，提取任务并返回"""
-    global previous_eligible_section_html, previous_eligible_section_hash
-    global config, previous_training_section_hash, previous_eligible_task_texts, previous_training_task_texts
-    
-    # 添加变量用于保存Training Tasks的哈希值
-    global previous_training_section_hash
-    if 'previous_training_section_hash' not in globals():
-        previous_training_section_hash = ""
+    account = account or default_account
     
     # 获取当前时间戳
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    # 只在调试模式下保存当前页面到标准位置
+    # 只在调试模式下保存当前页面的快照
     html = response.text
-    if config.get("debug", False):
-        with open("page_content.html", "w", encoding="utf-8") as f:
-            f.write(html)
+    save_debug_snapshot("page", html, account, timestamp)
     
     # 检查响应状态码
     if response.status_code != 200:
@@ -760,26 +2817,339 @@ def process_response(response):
     # 检查是否是thank you页面（没有任务时的默认页面）
     if "thank" in response.url.lower() or "thankyou" in response.url.lower():
         logging.debug("当前是thank you页面，表示已登录但没有可用任务")  # 降级为debug
+        account.previous_steady_tasks = []
         return [], True  # 返回空任务列表，但是检查成功
     
-    # 解析页面寻找任务
-    soup = BeautifulSoup(html, 'html.parser')
+    # 解析前先比较规范化后的整页指纹，未变化时直接复用上一次的结果；
+    # 提取规则文件修改后重新编译，规则的摘要计入指纹，规则变化后页面会重新检测
+    profile_digest = ""
+    if extraction_profile is not None:
+        extraction_profile.refresh()
+        profile_digest = extraction_profile.digest
+    page_fingerprint = get_page_fingerprint(html, response.url + profile_digest)
+    fingerprint_stats["checks"] += 1
+    if account.previous_page_fingerprint and page_fingerprint == account.previous_page_fingerprint:
+        fingerprint_stats["hits"] += 1
+        logging.info(f"页面指纹未变化，跳过解析 (快速路径命中 {fingerprint_stats['hits']}/{fingerprint_stats['checks']})")
+        return list(account.previous_steady_tasks), True
+    
+    # 启用解析进程池时，页面在解析进程中解析并提取任务部分，只传回字符串结果
+    page_loaded = getattr(response, "page_loaded", None)
+    page_scan = parse_pool.scan_response(response) if parse_pool is not None else None
+    if page_scan is not None:
+        tasks, success = detect_page_tasks(page_scan, html, timestamp, account, page_loaded)
+    else:
+        # 使用所选的解析后端解析页面寻找任务，并一次遍历建立页面索引供各部分查找共用
+        with stage_timer.stage("parse"):
+            soup = parse_html(html)
+            page_index = build_page_index(soup)
+        
+        # 检测期间各函数共用页面索引的文本缓存，检测结束后丢弃
+        with poll_text_cache(page_index):
+            tasks, success = detect_page_tasks(scan_page(soup, page_index), html, timestamp, account, page_loaded)
+    
+    if success:
+        account.previous_page_fingerprint = page_fingerprint
+    return tasks, success
+
+class SectionScan:
+    """页面中一个任务部分的查找结果：部分的HTML和哈希、任务条目[(文本, 来源元素描述)]和是否有实际任务
+
+    在本进程中任务条目和是否有任务在第一次使用时才提取（需在poll_text_cache期间）；
+    在解析进程中全部提取后转换为字典，只把字符串结果传回主进程
+    """
+    __slots__ = ("section_name", "container", "html", "hash", "_entries", "_has_tasks")
+
+    def __init__(self, section_name, html, section_hash, container=None, entries=None, has_tasks=None):
+        self.section_name = section_name
+        self.container = container
+        self.html = html
+        self.hash = section_hash
+        self._entries = entries
+        self._has_tasks = has_tasks
+
+    @classmethod
+    def from_container(cls, section_name, container):
+        section_html = str(container)
+        return cls(section_name, section_html, get_html_section_hash(section_html), container)
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            self._entries = [(text, describe_element(source))
+                             for text, source in extract_task_entries(self.container, self.section_name)]
+        return self._entries
+
+    @property
+    def has_tasks(self):
+        if self._has_tasks is None:
+            self._has_tasks = has_actual_tasks(self.container, self.section_name)
+        return self._has_tasks
+
+    def to_dict(self, keep_html=False):
+        """提取全部结果，keep_html为False时不带部分的HTML（只在调试快照中使用）"""
+        return {"html": self.html if keep_html else None, "hash": self.hash,
+                "entries": self.entries, "has_tasks": self.has_tasks}
+
+    @classmethod
+    def from_dict(cls, section_name, data):
+        return cls(section_name, data["html"], data["hash"], entries=[tuple(entry) for entry in data["entries"]],
+                   has_tasks=data["has_tasks"])
+
+class PageScan:
+    """一个页面中各任务部分的查找结果，以及页面是否明确表示没有可用任务"""
+    __slots__ = ("sections", "no_tasks_message")
+
+    def __init__(self, sections, no_tasks_message=False):
+        self.sections = sections  # 部分名称 -> SectionScan，没有找到的部分为None
+        self.no_tasks_message = no_tasks_message
+
+    def to_dict(self, keep_html=False):
+        return {"sections": {name: section.to_dict(keep_html) if section else None
+                             for name, section in self.sections.items()},
+                "no_tasks_message": self.no_tasks_message}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({name: SectionScan.from_dict(name, section) if section else None
+                    for name, section in data["sections"].items()}, data["no_tasks_message"])
+
+# 页面正确加载时应包含的文本（不区分大小写）
+PAGE_LOADED_MARKERS = ("apple", "baseline", "account", "profile", "health", "research")
+
+def has_page_loaded_marker(html):
+    """页面是否包含正确加载时应有的内容"""
+    html_lower = html.lower()
+    return any(marker in html_lower for marker in PAGE_LOADED_MARKERS)
+
+# 页面明确表示没有可用任务的文本
+NO_TASKS_INDICATORS = ["no programs available", "no eligible tasks", "no tasks available",
+                       "no studies available", "check back later", "no studies at this time"]
+
+def scan_page(soup, page_index):
+    """在解析好的页面中查找要检查的各任务部分"""
+    section_names = (["Training Tasks"] if config.get("check_training", False) else []) + ["Eligible Tasks"]
+    sections = {}
+    for section_name in section_names:
+        container = find_tasks_container(soup, section_name, page_index)
+        sections[section_name] = SectionScan.from_container(section_name, container) if container else None
     
+    # 检查是否有明确表示"无任务"的内容
+    no_tasks_message = False
+    for indicator in NO_TASKS_INDICATORS:
+        if page_index.find_string(indicator) is not None:
+            no_tasks_message = True
+            logging.debug(f"页面明确表示没有可用任务: '{indicator}'")  # 降级为debug
+            break
+    return PageScan(sections, no_tasks_message)
+
+# ==================== 解析进程池 ====================
+def parse_worker_settings():
+    """解析进程需要与主进程一致的设置，随每个页面一起发送"""
+    return {
+        "check_training": config.get("check_training", False),
+        "debug": config.get("debug", False),
+        "parser": active_parser_backend or resolve_parser_backend(config.get("parser", "html.parser")),
+        "extraction_profile": config.get("extraction_profile"),
+        "log_level": logging.getLogger().level,
+        "timing": stage_timer.enabled,
+    }
+
+def apply_parse_worker_settings(settings):
+    """在解析进程中应用主进程的设置，提取规则文件修改后重新加载"""
+    global active_parser_backend, extraction_profile
+    config["check_training"] = settings["check_training"]
+    config["debug"] = settings["debug"]
+    active_parser_backend = settings["parser"]
+    logging.getLogger().setLevel(settings["log_level"])
+    stage_timer.enabled = settings["timing"]
+    profile_file = settings["extraction_profile"]
+    if not profile_file:
+        extraction_profile = None
+    elif extraction_profile is None or extraction_profile.profile_file != profile_file:
+        load_extraction_profile(profile_file)
+    else:
+        extraction_profile.refresh()
+
+def init_parse_worker():
+    """解析进程忽略Ctrl+C：主进程用它暂停监控，解析进程不应随之退出"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def scan_page_in_worker(content, encoding, settings):
+    """在解析进程中解码、解析页面并查找各任务部分，只返回可序列化的字符串结果"""
+    apply_parse_worker_settings(settings)
+    stages = []
+    stage_timer.listeners = [lambda name, seconds: stages.append((name, seconds))]
+    stage_timer.reset()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    try:
+        html = content.decode(encoding, errors="replace")
+    except LookupError:
+        html = content.decode("utf-8", errors="replace")
+    with stage_timer.stage("parse"):
+        soup = parse_html(html)
+        page_index = build_page_index(soup)
+    with poll_text_cache(page_index):
+        # 调试模式下主进程需要任务部分的HTML保存快照，其余情况只传回哈希
+        page_scan = scan_page(soup, page_index).to_dict(keep_html=settings["debug"])
+    return {
+        "scan": page_scan,
+        "stages": stages,
+        "seconds": time.perf_counter() - start,
+        "cpu_seconds": time.process_time() - cpu_start,
+        "pid": os.getpid(),
+        "process_cpu_seconds": time.process_time(),
+    }
+
+class ParseWorkerPool:
+    """解析进程池：页面的原始字节发送到解析进程，解析和任务提取在其中进行，只传回任务部分的查找结果
+
+    账号很多时解析不再在主进程中排队等待GIL。解析进程异常退出后进程池不可用，
+    此时重新创建进程池并重试一次；仍然失败或超时的页面在主进程中解析
+    """
+
+    def __init__(self, size, timeout=60):
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.restarts = 0
+        self.fallbacks = 0  # 改为在主进程中解析的页面数
+        self.workers = {}  # {进程号: {"pages": 页面数, "parse_seconds": 解析总耗时, "cpu_seconds": 进程CPU时间}}
+        self.executor = self._create()
+
+    def _create(self):
+        # 使用spawn启动解析进程，不继承主进程的线程、会话和打开的文件
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.size,
+                                                          mp_context=multiprocessing.get_context("spawn"),
+                                                          initializer=init_parse_worker)
+        # 预先启动解析进程，第一个页面不必等待进程导入模块
+        for _ in range(self.size):
+            executor.submit(os.getpid)
+        return executor
+
+    def _restart(self, broken):
+        with self.lock:
+            if self.executor is not broken:
+                return  # 其他线程已经重新创建
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._create()
+            self.restarts += 1
+            # 旧进程都已退出，不再保留它们的统计和指标标签
+            self.workers.clear()
+        logging.warning(f"已重新创建解析进程池 (第{self.restarts}次)")
+
+    def scan(self, content, encoding):
+        """在解析进程中查找页面的任务部分，进程池损坏时重新创建并重试一次"""
+        settings = parse_worker_settings()
+        for attempt in range(2):
+            executor = self.executor
+            try:
+                return executor.submit(scan_page_in_worker, content, encoding, settings).result(self.timeout)
+            except concurrent.futures.process.BrokenProcessPool as e:
+                logging.warning(f"解析进程异常退出: {e}")
+                self._restart(executor)
+        return None
+
+    def scan_response(self, response):
+        """解析响应页面，返回PageScan；失败时返回None，由调用方在主进程中解析"""
+        encoding = getattr(response, "encoding", None)
+        if encoding:
+            content = response.content
+        else:
+            # 响应没有声明编码（或是流式读取截取的部分），发送已解码的文本
+            content, encoding = response.text.encode("utf-8"), "utf-8"
+        try:
+            result = self.scan(content, encoding)
+        except concurrent.futures.TimeoutError:
+            logging.warning(f"解析进程{self.timeout}秒内没有返回结果，在本进程中解析")
+            result = None
+        except Exception as e:
+            logging.warning(f"解析进程解析页面失败: {e}，在本进程中解析")
+            result = None
+        if result is None:
+            with self.lock:
+                self.fallbacks += 1
+            return None
+        
+        pid = result["pid"]
+        with self.lock:
+            worker = self.workers.setdefault(pid, {"pages": 0, "parse_seconds": 0.0, "cpu_seconds": 0.0})
+            worker["pages"] += 1
+            worker["parse_seconds"] += result["seconds"]
+            worker["cpu_seconds"] = result["process_cpu_seconds"]
+        if stage_timer.enabled:
+            for name, seconds in result["stages"]:
+                stage_timer.add(name, seconds)
+        logging.debug(f"解析进程 {pid} 处理页面用时 {result['seconds'] * 1000:.1f}ms (CPU {result['cpu_seconds'] * 1000:.1f}ms)")
+        return PageScan.from_dict(result["scan"])
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": self.size,
+                "restarts": self.restarts,
+                "fallbacks": self.fallbacks,
+                "workers": {
+                    str(pid): {"pages": worker["pages"],
+                               "avg_parse_ms": round(worker["parse_seconds"] * 1000 / worker["pages"], 2),
+                               "cpu_seconds": round(worker["cpu_seconds"], 3)}
+                    for pid, worker in self.workers.items()
+                },
+            }
+
+    def metrics_lines(self):
+        """Prometheus格式的解析进程指标"""
+        with self.lock:
+            workers = {pid: dict(worker) for pid, worker in self.workers.items()}
+            restarts = self.restarts
+        lines = ["# HELP baseline_parse_worker_pages_total 解析进程处理的页面数",
+                 "# TYPE baseline_parse_worker_pages_total counter"]
+        lines += [f'baseline_parse_worker_pages_total{{worker="{pid}"}} {worker["pages"]}'
+                  for pid, worker in sorted(workers.items())]
+        lines += ["# HELP baseline_parse_worker_cpu_seconds_total 解析进程使用的CPU时间",
+                  "# TYPE baseline_parse_worker_cpu_seconds_total counter"]
+        lines += [f'baseline_parse_worker_cpu_seconds_total{{worker="{pid}"}} {worker["cpu_seconds"]:.3f}'
+                  for pid, worker in sorted(workers.items())]
+        lines += ["# HELP baseline_parse_worker_restarts_total 解析进程池重新创建次数",
+                  "# TYPE baseline_parse_worker_restarts_total counter",
+                  f"baseline_parse_worker_restarts_total {restarts}"]
+        return lines
+
+    def close(self):
+        """记录各解析进程的统计后关闭进程池"""
+        for pid, worker in self.stats()["workers"].items():
+            logging.info(f"解析进程 {pid}: {worker['pages']}个页面，平均用时 {worker['avg_parse_ms']}ms，CPU {worker['cpu_seconds']}秒")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# 解析进程池，指定--parse-workers时在main中创建
+parse_pool = None
+
+def detect_page_tasks(page_scan, html, timestamp, account, page_loaded=None):
+    """根据页面各任务部分的查找结果检测账号页面的变化，返回(任务列表, 是否成功)
+
+    page_loaded为None时在html中检查页面是否正确加载
+    """
     tasks = []
+    steady_tasks = []  # 页面不变时同样会返回的任务（特定Training任务）
+    events = []  # 与上一次检查相比的任务差异事件
     
     # 确定要检查的部分
     check_training = config.get("check_training", False)  # 默认不检查 Training Tasks
     
     # 先检查 Training Tasks（如果需要）
     if check_training:
-        target_training_section = find_tasks_container(soup, "Training Tasks")
+        target_training_section = page_scan.sections.get("Training Tasks")
         if target_training_section:
             # 保存并检查目标部分是否有变化
-            section_html = str(target_training_section)
-            current_hash = get_html_section_hash(section_html)
+            section_html = target_training_section.html
+            current_hash = target_training_section.hash
             
             # 提取当前的Training任务
-            current_tasks = extract_task_texts(target_training_section)
+            current_entries = target_training_section.entries
+            current_tasks = [text for text, _ in current_entries]
+            current_records = build_task_records("Training Tasks", current_entries)
+            previous_records = account.previous_task_records.get("Training Tasks")
             
             # 查找可能包含指定Training任务的内容
             specific_tasks_found = []
@@ -796,30 +3166,30 @@ def process_response(response):
                 # 不添加标题行到tasks列表，以避免在日志中显示
                 # tasks.append("Training Tasks\tEvaluation\tIncomplete Tests")
                 tasks.extend(specific_tasks_found)
+                steady_tasks.extend(specific_tasks_found)
                 
                 # 首次检查时，直接添加此消息，正确显示任务数量
-                if not previous_training_section_hash:
+                if not account.previous_training_section_hash:
                     tasks.append(f"首次检查发现{len(specific_tasks_found)}个Training Tasks")
             
             # 正常的任务检测逻辑
             has_real_changes = False
-            if previous_training_section_hash and current_hash != previous_training_section_hash:
-                # 检查是否有实际任务内容变化
-                if previous_training_task_texts and set(current_tasks) != set(previous_training_task_texts):
+            if account.previous_training_section_hash and current_hash != account.previous_training_section_hash:
+                # 按任务名称比较记录，检查是否有实际任务内容变化
+                section_events = diff_task_records(previous_records, current_records) if previous_records else []
+                if section_events:
+                    events.extend(section_events)
                     has_real_changes = True
                     logging.info(f"检测到Training Tasks实际任务内容发生变化")
                         
-                    # 只在调试模式下保存文件
-                    if config.get("debug", False):
-                        # 保存一个带时间戳的版本用于历史记录
-                        with open(f"training_tasks_{timestamp}.html", "w", encoding="utf-8") as f:
-                            f.write(section_html)
+                    # 只在调试模式下保存快照
+                    save_debug_snapshot("training", section_html, account, timestamp)
                         
                     # 添加到任务列表
                     tasks.append(f"检测到Training Tasks的任务发生变化，可能有新任务")
                         
                     # 检查是否有实际的任务内容
-                    has_tasks_content = has_actual_tasks(target_training_section, "Training Tasks")
+                    has_tasks_content = target_training_section.has_tasks
                     if has_tasks_content:
                         tasks.append(f"检测到Training Tasks部分有新的任务内容")
                             
@@ -829,7 +3199,7 @@ def process_response(response):
                                 tasks.append(f"Training任务: {task}")
                             if len(current_tasks) > 5:
                                 tasks.append(f"...还有{len(current_tasks)-5}个Training任务")
-            elif not previous_training_task_texts:
+            elif not previous_records:
                 # 首次记录，不触发提醒但显示找到的任务
                 logging.info(f"首次记录Training Tasks内容，将用于后续比较")
                         
@@ -846,91 +3216,67 @@ def process_response(response):
                     if len(current_tasks) > 10:
                         tasks.append(f"...还有{len(current_tasks)-10}个Training任务")
                         
-                # 只保存最新版本
-                if config.get("debug", False):
-                    with open(f"training_tasks_latest.html", "w", encoding="utf-8") as f:
-                        f.write(section_html)
+                save_debug_snapshot("training", section_html, account, timestamp)
             
-            # 更新任务文本记录
-            previous_training_task_texts = current_tasks
+            # 更新任务记录
+            account.previous_task_records["Training Tasks"] = current_records
                     
             # 更新Training Tasks的哈希值    
-            previous_training_section_hash = current_hash
+            account.previous_training_section_hash = current_hash
     
     # 检查 Eligible Tasks (始终检查)
-    target_eligible_section = find_tasks_container(soup, "Eligible Tasks")
+    target_eligible_section = page_scan.sections.get("Eligible Tasks")
     
     if target_eligible_section:
         # 保存并检查目标部分是否有变化
-        section_html = str(target_eligible_section)
-        current_hash = get_html_section_hash(section_html)
+        section_html = target_eligible_section.html
+        current_hash = target_eligible_section.hash
         
         # 检查是否有变化，只在有变化时保存文件
         section_changed = False
         has_real_changes = False
-        if previous_eligible_section_hash and current_hash != previous_eligible_section_hash:
+        if account.previous_eligible_section_hash and current_hash != account.previous_eligible_section_hash:
             logging.info(f"检测到Eligible Tasks部分发生变化")
             section_changed = True
             
             # 检查是否有实际内容变化，而不仅仅是时间戳或其他动态元素变化
             # 提取并比较页面中实际任务的内容
-            current_tasks = extract_task_texts(target_eligible_section)
+            current_records = build_task_records("Eligible Tasks", target_eligible_section.entries)
+            previous_records = account.previous_task_records.get("Eligible Tasks")
             
-            # 现在检查任务是否真的发生了变化
-            if previous_eligible_task_texts and set(current_tasks) != set(previous_eligible_task_texts):
+            # 现在按任务名称比较记录，检查任务是否真的发生了变化
+            section_events = diff_task_records(previous_records, current_records) if previous_records else []
+            if section_events:
+                events.extend(section_events)
                 has_real_changes = True
                 logging.info("检测到实际任务内容发生变化")
-            elif not previous_eligible_task_texts:
+            elif not previous_records:
                 # 如果没有之前的任务记录，先记录但不触发提醒
                 has_real_changes = False
                 logging.info("首次记录任务内容，将用于后续比较")
             else:
                 logging.info("页面有变化但任务内容未变化（可能是时间戳或其他动态元素更新）")
             
-            # 更新任务文本记录
-            previous_eligible_task_texts = current_tasks
+            # 更新任务记录
+            account.previous_task_records["Eligible Tasks"] = current_records
             
-            # 只在调试模式下保存文件
-            if config.get("debug", False):
-                # 有变化时才保存文件
-                with open(f"eligible_tasks_{timestamp}.html", "w", encoding="utf-8") as f:
-                    f.write(section_html)
-            
-                # 保存之前的版本用于比较
-                if previous_eligible_section_html:
-                    with open("eligible_tasks_previous.html", "w", encoding="utf-8") as f:
-                        f.write(previous_eligible_section_html)
-                        
-                # 保存当前的标准版本
-                with open("eligible_tasks_section.html", "w", encoding="utf-8") as f:
-                    f.write(section_html)
+            # 只在调试模式下保存快照，之前的版本已在存档中
+            save_debug_snapshot("eligible", section_html, account, timestamp)
             
             # 如果检测到实际变化，添加到任务列表
             if has_real_changes:
                 tasks.append(f"检测到Eligible Tasks部分的任务发生变化，可能有新任务")
-        elif not previous_eligible_section_hash:
+        elif not account.previous_eligible_section_hash:
             # 首次检查，记录任务内容但不触发提醒
-            previous_eligible_task_texts = extract_task_texts(target_eligible_section)
+            account.previous_task_records["Eligible Tasks"] = build_task_records(
+                "Eligible Tasks", target_eligible_section.entries)
             logging.info("首次记录Eligible Tasks内容，将用于后续比较")
         
-        # 更新保存的HTML和哈希值
-        previous_eligible_section_html = section_html
-        previous_eligible_section_hash = current_hash
-    
-    # 检查是否有明确表示"无任务"的内容
-    no_tasks_indicators = ["no programs available", "no eligible tasks", "no tasks available", 
-                          "no studies available", "check back later", "no studies at this time"]
-    has_no_tasks_message = False
-    
-    for indicator in no_tasks_indicators:
-        no_tasks = soup.find(string=lambda text: text and indicator.lower() in text.lower())
-        if no_tasks:
-            has_no_tasks_message = True
-            logging.debug(f"页面明确表示没有可用任务: '{indicator}'")  # 降级为debug
-            break
+        # 更新保存的哈希值
+        account.previous_eligible_section_hash = current_hash
     
     # 如果页面确定显示无任务但我们又发现了任务指标，可能是误报
-    if has_no_tasks_message and tasks:
+    if page_scan.no_tasks_message and tasks:
         logging.info("页面标明无可用任务，但发现了潜在的任务指标，需要进一步确认")
     
     # 特别处理 - 如果检测到了指定的Training任务，调整输出格式
@@ -938,13 +3284,9 @@ def process_response(response):
         # 这里不调用format_training_tasks_output，因为我们在check_baseline_tasks中处理
         logging.info("检测到特定Training任务，将以特定格式显示")
     
-    # 检查页面是否成功加载（包含某些预期的内容）
-    page_loaded = False
-    expected_contents = ["Apple", "Baseline", "account", "profile", "health", "research"]
-    for content in expected_contents:
-        if content.lower() in html.lower():
-            page_loaded = True
-            break
+    # 检查页面是否成功加载（包含某些预期的内容）；流式读取的响应只有任务部分，由读取时的检查结果决定
+    if page_loaded is None:
+        page_loaded = has_page_loaded_marker(html)
     
     if not page_loaded:
         logging.warning("页面可能未正确加载，未找到预期内容")
@@ -956,11 +3298,19 @@ def process_response(response):
     # 即使没有任务，只要页面正确加载，也应视为成功的检查
     if not has_tasks:
         logging.info(f"页面已成功加载，但未检测到任务")
-        
+    
+    account.previous_steady_tasks = steady_tasks
+    # 事件保留到轮询取走为止，启动验证cookie时检测到的变化也会在第一次轮询时提醒
+    account.task_events.extend(events)
+    for event in events:
+        logging.info(f"任务变化: {event}")
     return tasks, True
 
-def open_clean_browser_for_login():
-    """打开一个干净的浏览器环境供用户登录，并提供简化的cookie获取方法"""
+def open_clean_browser_for_login(prompt_func=input):
+    """打开一个干净的浏览器环境供用户登录，并提供简化的cookie获取方法
+
+    prompt_func用于读取用户粘贴的Cookie，异步监控时由操作台提供，避免与其争用标准输入
+    """
     logging.info("正在启动干净的浏览器会话...")
     
     try:
@@ -993,7 +3343,7 @@ def open_clean_browser_for_login():
                 process = subprocess.Popen(browser_cmd, shell=True)
                 
                 # 等待用户登录并获取cookie
-                cookie_str = input("请粘贴完整的Cookie值: ")
+                cookie_str = prompt_func("请粘贴完整的Cookie值: ")
                 
                 # 清理临时目录
                 try:
@@ -1030,7 +3380,7 @@ def open_clean_browser_for_login():
                     process = subprocess.Popen(browser_cmd, shell=True)
                     
                     # 等待用户登录并获取cookie
-                    cookie_str = input("请粘贴完整的Cookie值: ")
+                    cookie_str = prompt_func("请粘贴完整的Cookie值: ")
                     
                     # 清理临时目录
                     try:
@@ -1060,7 +3410,7 @@ def open_clean_browser_for_login():
         print("9. 返回命令行窗口粘贴")
         print("="*80 + "\n")
         
-        cookie_str = input("请粘贴完整的Cookie值: ")
+        cookie_str = prompt_func("请粘贴完整的Cookie值: ")
         
         # 清理临时目录
         try:
@@ -1086,7 +3436,7 @@ def open_clean_browser_for_login():
         print("7. 右键点击Cookie值，选择'Copy Value'或'复制值'")
         print("="*80 + "\n")
         
-        cookie_str = input("请粘贴Cookie字符串: ")
+        cookie_str = prompt_func("请粘贴Cookie字符串: ")
         return cookie_str
 
 def create_cookie_jar_from_string(cookie_str):
@@ -1153,8 +3503,7 @@ def create_cookie_jar_from_string(cookie_str):
             return None
             
         # 验证cookie jar是否包含必要的cookie
-        required_cookies = ['_baseline_session', 'acn01']  # 添加其他必要的cookie名称
-        missing_cookies = [name for name in required_cookies if name not in cookie_jar]
+        missing_cookies = [name for name in REQUIRED_COOKIES if name not in cookie_jar]
         
         if missing_cookies:
             logging.warning(f"缺少必要的cookie: {', '.join(missing_cookies)}")
@@ -1166,77 +3515,136 @@ def create_cookie_jar_from_string(cookie_str):
         logging.error(f"创建cookie jar失败: {e}")
         return None
 
-def clean_old_files(pattern, max_files=5):
-    """清理旧的HTML文件，保留最新的几个"""
-    try:
-        # 避免使用通配符，使用指定的文件扩展
-        if pattern == "page_content_*.html":
-            files = sorted(glob.glob("page_content_*.html"), key=os.path.getmtime, reverse=True)
-        elif pattern == "eligible_tasks_*.html":
-            files = sorted(glob.glob("eligible_tasks_*.html"), key=os.path.getmtime, reverse=True)
-        elif pattern == "training_tasks_*.html":
-            files = sorted(glob.glob("training_tasks_*.html"), key=os.path.getmtime, reverse=True)
-        else:
-            logging.warning(f"未知的文件模式: {pattern}")
+class SnapshotArchive:
+    """调试模式下的页面快照存档：按内容哈希去重、gzip压缩，每个部分保留固定数量的最近快照
+
+    快照文件为<目录>/<部分>/<sha256>.html.gz，相同内容只写一次；index.json记录各部分的
+    [时间戳, 哈希]列表。每个部分是一个定长环，新快照挤出最旧的一条，
+    没有任何记录再引用的文件随即删除，不需要扫描目录
+    """
+
+    def __init__(self, directory, ring_size=20):
+        self.directory = directory
+        self.ring_size = max(1, ring_size)
+        self.index_file = os.path.join(directory, "index.json")
+        self.rings = {}  # {部分: deque([(时间戳, 哈希), ...])}
+        self.refcounts = collections.Counter()  # {(部分, 哈希): 引用次数}
+        # 多个解析线程可能同时保存快照，环、引用计数和索引文件的修改在锁内进行
+        self.lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_file):
             return
-            
-        # 只保留指定数量的最新文件
-        if len(files) > max_files:
-            for old_file in files[max_files:]:
-                try:
-                    os.remove(old_file)
-                    logging.debug(f"清理旧文件: {old_file}")
-                except:
-                    logging.warning(f"无法删除文件: {old_file}")
-    except Exception as e:
-        logging.error(f"清理文件失败: {e}")
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for section, entries in data.items():
+                ring = self.rings[section] = collections.deque()
+                for ts, digest in entries[-self.ring_size:]:
+                    ring.append((ts, digest))
+                    self.refcounts[(section, digest)] += 1
+        except Exception as e:
+            logging.warning(f"加载快照索引失败: {e}，将重新记录")
+            self.rings.clear()
+            self.refcounts.clear()
+
+    def _save_index(self):
+        temp_file = f"{self.index_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({section: list(ring) for section, ring in self.rings.items()}, f)
+        os.replace(temp_file, self.index_file)
+
+    def path(self, section, digest):
+        return os.path.join(self.directory, section, f"{digest}.html.gz")
+
+    def put(self, section, html, timestamp=None):
+        """保存一个快照，返回内容哈希；与该部分上一个快照相同时不做任何写入"""
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            ring = self.rings.setdefault(section, collections.deque())
+            if ring and ring[-1][1] == digest:
+                return digest
+            try:
+                if not self.refcounts[(section, digest)]:
+                    os.makedirs(os.path.join(self.directory, section), exist_ok=True)
+                    with gzip.open(self.path(section, digest), 'wb', compresslevel=6) as f:
+                        f.write(data)
+                ring.append((timestamp or datetime.now().strftime("%Y%m%d_%H%M%S"), digest))
+                self.refcounts[(section, digest)] += 1
+                if len(ring) > self.ring_size:
+                    self._release(section, ring.popleft()[1])
+                self._save_index()
+            except Exception as e:
+                logging.warning(f"保存{section}快照失败: {e}")
+        return digest
+
+    def _release(self, section, digest):
+        key = (section, digest)
+        self.refcounts[key] -= 1
+        if self.refcounts[key] <= 0:
+            del self.refcounts[key]
+            try:
+                os.remove(self.path(section, digest))
+                logging.debug(f"清理旧快照: {section}/{digest}")
+            except OSError:
+                pass
+
+    def get(self, section, index=-1):
+        """读取部分的第index个快照（默认最新），没有时返回None"""
+        with self.lock:
+            ring = self.rings.get(section)
+            if not ring:
+                return None
+            digest = ring[index][1]
+        with gzip.open(self.path(section, digest), 'rb') as f:
+            return f.read().decode("utf-8")
+
+# 调试快照存档，调试模式下首次保存时创建
+snapshot_archive = None
+_snapshot_archive_lock = threading.Lock()
+
+def save_debug_snapshot(section, html, account=None, timestamp=None):
+    """调试模式下把页面或任务部分的HTML存入快照存档，非调试模式不做任何事"""
+    global snapshot_archive
+    if not config.get("debug", False):
+        return
+    with _snapshot_archive_lock:
+        if snapshot_archive is None:
+            snapshot_archive = SnapshotArchive(config.get("snapshot_dir", "debug_snapshots"), config.get("snapshot_ring", 20))
+    account = account or default_account
+    if account is not default_account:
+        section = f"{account.name}/{section}"
+    snapshot_archive.put(section, html, timestamp)
 
 # 保存cookies到文件
-def save_cookies_to_file(cookies):
-    """将cookies保存到文件"""
-    global recent_cookies, recent_browser
+def save_cookies_to_file(cookies, account=None):
+    """将cookies保存到账号的cookie缓存文件，内容没有变化时不重写"""
+    account = account or default_account
     
     if not cookies:
         logging.warning("没有可保存的cookies")
         return False
         
     try:
-        cookie_dict = {}
-        
         if isinstance(cookies, requests.cookies.RequestsCookieJar):
-            for cookie in cookies:
-                if hasattr(cookie, 'name') and hasattr(cookie, 'value'):
-                    name = str(cookie.name)
-                    value = str(cookie.value)
-                    if value.lower() == 'undefined':
-                        value = ''
-                    elif value.lower() == 'true':
-                        value = '1'
-                    elif value.lower() == 'false':
-                        value = '0'
-                    cookie_dict[name] = value
+            cookie_jar = cookies
         elif isinstance(cookies, dict):
-            for k, v in cookies.items():
-                if k:
-                    name = str(k)
-                    value = str(v)
-                    if value.lower() == 'undefined':
-                        value = ''
-                    elif value.lower() == 'true':
-                        value = '1'
-                    elif value.lower() == 'false':
-                        value = '0'
-                    cookie_dict[name] = value
+            # 名称到值的字典没有域和路径信息，按.apple.com保存
+            cookie_jar = requests.cookies.RequestsCookieJar()
+            for name, value in cookies.items():
+                if name:
+                    cookie_jar.set(str(name), normalize_cookie_value(value), domain='.apple.com', path='/')
         else:
             logging.warning(f"未知的cookie类型: {type(cookies)}")
             return False
             
-        if not cookie_dict:
+        if not len(cookie_jar):
             logging.warning("没有有效的cookie数据可保存")
             return False
             
-        required_cookies = ['_baseline_session', 'acn01']
-        missing_cookies = [name for name in required_cookies if name not in cookie_dict]
+        missing_cookies = [name for name in REQUIRED_COOKIES if name not in cookie_jar]
         
         if missing_cookies:
             logging.warning(f"缺少必要的cookie: {', '.join(missing_cookies)}")
@@ -1244,81 +3652,52 @@ def save_cookies_to_file(cookies):
             
         # 保存到文件
         try:
-            with open(COOKIE_CACHE_FILE, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'cookies': cookie_dict,
-                    'browser': recent_browser or 'manual',
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }, f, ensure_ascii=False, indent=2)
-                
-            # 只有成功保存后才更新全局变量
-            if isinstance(cookies, requests.cookies.RequestsCookieJar):
-                recent_cookies = cookies
-            else:
-                # 如果原始输入不是RequestsCookieJar，创建一个新的
-                cookie_jar = requests.cookies.RequestsCookieJar()
-                for name, value in cookie_dict.items():
-                    cookie_jar.set(name, value, domain='.apple.com', path='/')
-                recent_cookies = cookie_jar
-                
-            logging.info(f"已将cookies保存到 {COOKIE_CACHE_FILE}")
-            return True
+            written = account.cookie_store.save(cookie_jar, account.browser or 'manual')
         except Exception as file_error:
             logging.error(f"写入cookie文件失败: {file_error}")
             return False
+            
+        # 只有成功保存后才更新账号会话中的cookies
+        replace_session_cookies(cookie_jar, account)
+        account.cookie_health.remember()
+        
+        if written:
+            logging.info(f"已将cookies保存到 {account.cookie_file}")
+        else:
+            logging.debug(f"cookies没有变化，不重写 {account.cookie_file}")
+        return True
     except Exception as e:
         logging.error(f"保存cookies失败: {e}")
         return False
 
 # 从文件加载cookies
-def load_cookies_from_file():
-    """从文件加载cookies"""
-    global recent_cookies, recent_browser
+def load_cookies_from_file(account=None):
+    """从账号的cookie缓存文件加载cookies"""
+    account = account or default_account
     
-    if not os.path.exists(COOKIE_CACHE_FILE):
-        logging.info(f"Cookie缓存文件不存在: {COOKIE_CACHE_FILE}")
+    if not os.path.exists(account.cookie_file):
+        logging.info(f"Cookie缓存文件不存在: {account.cookie_file}")
         return False
         
     try:
-        with open(COOKIE_CACHE_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        cookie_dict = data.get('cookies', {})
-        browser_type = data.get('browser', 'manual')
-        timestamp = data.get('timestamp', '')
+        cookies, browser_type, timestamp = account.cookie_store.load()
         
-        if not cookie_dict or not isinstance(cookie_dict, dict):
+        if not cookies:
             logging.warning("缓存文件中没有有效的cookies")
             return False
             
-        cookie_jar = requests.cookies.RequestsCookieJar()
-        for name, value in cookie_dict.items():
-            if name:
-                name = str(name)
-                value = str(value)
-                if value.lower() == 'undefined':
-                    value = ''
-                elif value.lower() == 'true':
-                    value = '1'
-                elif value.lower() == 'false':
-                    value = '0'
-                cookie_jar.set(name, value, domain='.apple.com', path='/')
-        
-        if not cookie_jar or len(cookie_jar) == 0:
-            logging.warning("无法创建有效的cookie jar")
-            return False
-            
         # 验证必要的cookie是否存在
-        required_cookies = ['_baseline_session', 'acn01']
-        missing_cookies = [name for name in required_cookies if name not in cookie_jar]
+        names = {cookie.name for cookie in cookies}
+        missing_cookies = [name for name in REQUIRED_COOKIES if name not in names]
         
         if missing_cookies:
             logging.warning(f"缺少必要的cookie: {', '.join(missing_cookies)}")
             return False
             
-        # 只有cookie_jar是有效的RequestsCookieJar对象且包含必要的cookie时才设置全局变量
-        recent_cookies = cookie_jar
-        recent_browser = browser_type
+        # 包含必要的cookie时才直接载入账号会话
+        replace_session_cookies(cookies, account)
+        account.browser = browser_type
+        account.cookie_health.remember()
         
         logging.info(f"已从缓存加载cookies (保存于: {timestamp})")
         return True
@@ -1326,111 +3705,856 @@ def load_cookies_from_file():
         logging.error(f"加载cookies失败: {e}")
         return False
 
+# 已判断过的字符串类型是否计入get_text()（bs4中排除Comment、Script等子类）
+_visible_text_types = {}
+
+def _is_visible_text(node):
+    """判断字符串节点是否计入get_text()（排除注释、script/style等内容）"""
+    node_type = type(node)
+    visible = _visible_text_types.get(node_type)
+    if visible is None:
+        visible = node_type is PageText or (
+            node_type.__module__ == "bs4.element" and node_type.__name__ in ("NavigableString", "CData"))
+        _visible_text_types[node_type] = visible
+    return visible
+
+class PageIndex:
+    """一次遍历页面建立的索引，供所有任务部分的查找复用
+
+    元素按文档顺序编号，位置0是文档根节点；每个元素记录标签名、小写的class字符串、
+    id、role、aria-controls、父元素位置和子树范围，字符串节点按文档顺序保存。
+    """
+    __slots__ = ("nodes", "names", "classes", "ids", "roles", "aria_controls", "parents",
+                 "ends", "str_starts", "str_ends", "strings", "string_parents", "visible",
+                 "id_map", "positions", "text_cache", "lower_text_cache")
+
+    def __init__(self, root):
+        self.nodes = []
+        self.names = []
+        self.classes = []
+        self.ids = []
+        self.roles = []
+        self.aria_controls = []
+        self.parents = []
+        self.ends = []
+        self.str_starts = []
+        self.str_ends = []
+        self.strings = []
+        self.string_parents = []
+        self.visible = []
+        self.id_map = {}
+        self.positions = {}
+        # 本次检查内的文本缓存：元素位置 -> get_text()结果 / 小写结果
+        self.text_cache = {}
+        self.lower_text_cache = {}
+        self._build(root)
+
+    def _build(self, root):
+        # 热点循环，把列表方法绑定到局部变量
+        nodes, names, classes, ids = self.nodes, self.names, self.classes, self.ids
+        roles, aria_controls, parents = self.roles, self.aria_controls, self.parents
+        ends, str_starts, str_ends = self.ends, self.str_starts, self.str_ends
+        strings, string_parents, visible = self.strings, self.string_parents, self.visible
+        id_map, positions = self.id_map, self.positions
+        
+        def add_element(node, parent_pos):
+            pos = len(nodes)
+            attrs = node.attrs
+            nodes.append(node)
+            names.append(node.name)
+            if attrs:
+                class_value = attrs.get("class")
+                if isinstance(class_value, list):
+                    class_value = " ".join(class_value)
+                element_id = attrs.get("id")
+                classes.append(class_value.lower() if class_value else "")
+                ids.append(element_id)
+                roles.append(attrs.get("role"))
+                aria_controls.append(attrs.get("aria-controls"))
+            else:
+                element_id = None
+                classes.append("")
+                ids.append(None)
+                roles.append(None)
+                aria_controls.append(None)
+            parents.append(parent_pos)
+            ends.append(pos + 1)
+            str_starts.append(len(strings))
+            str_ends.append(0)
+            positions[id(node)] = pos
+            if element_id and element_id not in id_map:
+                id_map[element_id] = pos
+            return pos
+        
+        add_element(root, -1)
+        # 栈中保存(子节点迭代器, 元素位置)，按文档顺序深度优先遍历
+        stack = [(iter(root.contents), 0)]
+        while stack:
+            children, pos = stack[-1]
+            for child in children:
+                if isinstance(child, str):
+                    strings.append(child)
+                    string_parents.append(pos)
+                    visible.append(_is_visible_text(child))
+                elif child.name is not None:
+                    stack.append((iter(child.contents), add_element(child, pos)))
+                    break
+            else:
+                stack.pop()
+                ends[pos] = len(nodes)
+                str_ends[pos] = len(strings)
+
+    def position(self, node):
+        return self.positions.get(id(node))
+
+    def ancestors(self, pos):
+        """元素的祖先位置，由近到远"""
+        pos = self.parents[pos]
+        while pos != -1:
+            yield pos
+            pos = self.parents[pos]
+
+    def text(self, pos):
+        """元素的get_text()结果，每个子树只拼接一次"""
+        text = self.text_cache.get(pos)
+        if text is None:
+            strings = self.strings
+            visible = self.visible
+            text = "".join(strings[i] for i in range(self.str_starts[pos], self.str_ends[pos]) if visible[i])
+            self.text_cache[pos] = text
+        return text
+
+    def text_lower(self, pos):
+        """元素小写后的get_text()结果"""
+        text = self.lower_text_cache.get(pos)
+        if text is None:
+            text = self.text(pos).lower()
+            self.lower_text_cache[pos] = text
+        return text
+
+    def previous_elements(self, pos, names, limit):
+        """文档中位于该元素之前、标签名属于names的元素位置，由近到远，最多limit个"""
+        found = []
+        node_names = self.names
+        for previous in range(pos - 1, 0, -1):
+            if node_names[previous] in names:
+                found.append(previous)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def clear_text_cache(self):
+        self.text_cache.clear()
+        self.lower_text_cache.clear()
+
+    def descendant_count(self, pos):
+        return self.ends[pos] - pos - 1
+
+    def find_string(self, needle_lower, start_pos=0):
+        """返回子树中第一个小写后包含needle_lower的字符串序号（包括注释和脚本），没有则返回None"""
+        strings = self.strings
+        for i in range(self.str_starts[start_pos], self.str_ends[start_pos]):
+            if needle_lower in strings[i].lower():
+                return i
+        return None
+
+    def iter_elements(self, names, start_pos=0):
+        """按文档顺序遍历子树中（不含自身）标签名属于names的元素位置"""
+        node_names = self.names
+        for pos in range(start_pos + 1, self.ends[start_pos]):
+            if node_names[pos] in names:
+                yield pos
+
+def build_page_index(soup):
+    """为解析后的页面建立索引"""
+    return PageIndex(soup)
+
+# ==================== 提取规则 ====================
+# CSS子集：标签、#id、.class、[attr]、[attr=v]/[attr~=v]/[attr*=v]/[attr^=v]/[attr$=v]、
+# :contains("文本")，后代(空格)和子元素(>)组合，逗号分隔多个选择器
+_CSS_TOKEN = re.compile(
+    r"""\s*(>)\s*|(\s+)|([a-zA-Z][\w-]*|\*)|#([\w-]+)|\.([\w-]+)"""
+    r"""|\[\s*([\w-]+)\s*(?:([~^$*]?=)\s*(?:"([^"]*)"|'([^']*)'|([^\]\s]+))\s*)?\]"""
+    r"""|:contains\(\s*(?:"([^"]*)"|'([^']*)')\s*\)""")
+
+# XPath子集：/或//分隔的步骤，谓词支持[@attr]、[@attr='v']、[contains(@attr,'v')]、
+# [starts-with(@attr,'v')]和[contains(., 'v')]/[contains(text(), 'v')]
+_XPATH_STEP = re.compile(r"(//|/)([a-zA-Z][\w-]*|\*)((?:\[[^\]]*\])*)")
+_XPATH_PREDICATE = re.compile(
+    r"""\[\s*(?:@([\w-]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'))?"""
+    r"""|(contains|starts-with)\(\s*(?:@([\w-]+)|\.|text\(\))\s*,\s*(?:"([^"]*)"|'([^']*)')\s*\))\s*\]""")
+
+def _split_selector_list(text):
+    """按不在引号和括号中的逗号分割选择器列表"""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in "[(":
+            depth += 1
+        elif char in "])":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+def _make_condition(name, op, value):
+    """属性条件(名称, 运算符, 值)，class和文本(.)按小写比较"""
+    name = name.lower()
+    if value is not None and name in ("class", "."):
+        value = value.lower()
+    return (name, op, value)
+
+def _compile_css(text):
+    steps = []
+    compound = None
+    combinator = " "
+    pos = 0
+    while pos < len(text):
+        match = _CSS_TOKEN.match(text, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"无法解析的CSS选择器: {text!r}（位置{pos}）")
+        pos = match.end()
+        child, space, tag, element_id, class_name, attr, op = match.groups()[:7]
+        if child or space:
+            if compound is not None:
+                steps.append((combinator, compound))
+                compound = None
+            combinator = ">" if child else " "
+            continue
+        if compound is None:
+            compound = {"tag": None, "id": None, "classes": [], "conditions": []}
+        if tag:
+            compound["tag"] = None if tag == "*" else tag.lower()
+        elif element_id:
+            compound["id"] = element_id
+        elif class_name:
+            compound["classes"].append(class_name.lower())
+        elif attr:
+            value = next((v for v in match.groups()[7:10] if v is not None), None)
+            compound["conditions"].append(_make_condition(attr, op, value))
+        else:
+            value = next(v for v in match.groups()[10:12] if v is not None)
+            compound["conditions"].append(_make_condition(".", "*=", value))
+    if compound is None:
+        raise ValueError(f"CSS选择器不完整: {text!r}")
+    steps.append((combinator, compound))
+    return steps
+
+def _compile_xpath(text):
+    steps = []
+    pos = 0
+    while pos < len(text):
+        match = _XPATH_STEP.match(text, pos)
+        if not match:
+            raise ValueError(f"无法解析的XPath: {text!r}（位置{pos}）")
+        pos = match.end()
+        separator, tag, predicates = match.groups()
+        compound = {"tag": None if tag == "*" else tag.lower(), "id": None, "classes": [], "conditions": []}
+        predicate_pos = 0
+        while predicate_pos < len(predicates):
+            predicate = _XPATH_PREDICATE.match(predicates, predicate_pos)
+            if not predicate:
+                raise ValueError(f"不支持的XPath谓词: {predicates[predicate_pos:]!r}")
+            predicate_pos = predicate.end()
+            attr, value1, value2, function, function_attr, value3, value4 = predicate.groups()
+            if attr:
+                value = value1 if value1 is not None else value2
+                compound["conditions"].append(_make_condition(attr, None if value is None else "=", value))
+            else:
+                value = value3 if value3 is not None else value4
+                op = "*=" if function == "contains" else "^="
+                compound["conditions"].append(_make_condition(function_attr or ".", op, value))
+        # 第一个步骤相对于查找范围，/和//都在整个范围内查找
+        steps.append((">" if separator == "/" and steps else " ", compound))
+    return steps
+
+class CompiledSelector:
+    """编译后的CSS/XPath选择器，在页面索引上匹配，与所用的解析后端无关
+
+    每个备选选择器编译为[(组合方式, 条件)]步骤列表，从最后一步开始匹配元素，再沿父元素向上检查前面的步骤；
+    最后一步有标签名时先按标签名筛选，只有id时直接查id表
+    """
+
+    def __init__(self, text):
+        self.text = text
+        if text.startswith("/"):
+            alternatives = [_compile_xpath(part) for part in text.split("|")]
+        else:
+            alternatives = [_compile_css(part) for part in _split_selector_list(text)]
+        if not alternatives:
+            raise ValueError("选择器为空")
+        self.alternatives = [
+            [(combinator, (c["tag"], c["id"], tuple(c["classes"]), tuple(c["conditions"]))) for combinator, c in steps]
+            for steps in alternatives
+        ]
+        # 含文本条件的选择器需要元素的全部内容，不能在流式读取的开始标签处判断
+        self.uses_text = any(name == "." for steps in self.alternatives
+                             for _, compound in steps for name, _, _ in compound[3])
+        last_tags = {steps[-1][1][0] for steps in self.alternatives}
+        self.tags = None if None in last_tags else last_tags
+        last_ids = {steps[-1][1][1] for steps in self.alternatives}
+        self.element_id = last_ids.pop() if len(self.alternatives) == 1 and None not in last_ids else None
+
+    @staticmethod
+    def _attribute(index, pos, name):
+        if name == ".":
+            return index.text_lower(pos)
+        if name == "class":
+            return index.classes[pos]
+        if name == "id":
+            return index.ids[pos]
+        attrs = index.nodes[pos].attrs
+        value = attrs.get(name) if attrs else None
+        if isinstance(value, list):
+            value = " ".join(value)
+        return value
+
+    def _compound_matches(self, index, pos, compound):
+        tag, element_id, classes, conditions = compound
+        if tag is not None and index.names[pos] != tag:
+            return False
+        if element_id is not None and index.ids[pos] != element_id:
+            return False
+        if classes:
+            tokens = index.classes[pos].split()
+            if any(class_name not in tokens for class_name in classes):
+                return False
+        for name, op, value in conditions:
+            actual = self._attribute(index, pos, name)
+            if actual is None:
+                return False
+            if op is None:
+                continue
+            if name not in ("class", "."):
+                actual = str(actual)
+            if op == "=" and actual != value:
+                return False
+            if op == "~=" and value not in actual.split():
+                return False
+            if op == "*=" and value not in actual:
+                return False
+            if op == "^=" and not actual.startswith(value):
+                return False
+            if op == "$=" and not actual.endswith(value):
+                return False
+        return True
+
+    def _ancestors_match(self, index, pos, steps, step):
+        """steps[step]已与pos匹配，检查前面的步骤"""
+        if step == 0:
+            return True
+        combinator = steps[step][0]
+        compound = steps[step - 1][1]
+        parent = index.parents[pos]
+        while parent != -1:
+            if self._compound_matches(index, parent, compound) and self._ancestors_match(index, parent, steps, step - 1):
+                return True
+            if combinator == ">":
+                return False
+            parent = index.parents[parent]
+        return False
+
+    def matches(self, index, pos):
+        for steps in self.alternatives:
+            if self._compound_matches(index, pos, steps[-1][1]) and \
+                    self._ancestors_match(index, pos, steps, len(steps) - 1):
+                return True
+        return False
+
+    def iter_matches(self, index, root=0):
+        """按文档顺序遍历root子树中（不含自身）匹配的元素位置"""
+        end = index.ends[root]
+        if self.element_id is not None:
+            pos = index.id_map.get(self.element_id)
+            if pos is not None and root < pos < end and self.matches(index, pos):
+                yield pos
+            return
+        names = index.names
+        tags = self.tags
+        for pos in range(root + 1, end):
+            if (tags is None or names[pos] in tags) and self.matches(index, pos):
+                yield pos
+
+    def select(self, index, root=0):
+        return list(self.iter_matches(index, root))
+
+    def first(self, index, root=0):
+        return next(self.iter_matches(index, root), None)
+
+class ExtractionProfile:
+    """按任务部分配置的提取规则，启动时编译，规则文件修改后在下一次检查前重新编译
+
+    文件格式为{"sections": {"Eligible Tasks": {"container": ..., "task": ..., "name": ..., "count": ..., "empty": ...}}}，
+    container在整页中查找，其余在容器中查找，name/count在每个任务元素中查找；选择器以/开头时按XPath解析，
+    否则按CSS解析。规则没有匹配到时仍使用启发式查找
+    """
+
+    FIELDS = ("container", "task", "name", "count", "empty")
+
+    def __init__(self, profile_file):
+        self.profile_file = profile_file
+        self.mtime = None
+        self.digest = ""  # 规则文件内容的摘要，计入整页指纹，规则变化后页面会重新检测
+        self.sections = {}
+        self.lock = threading.Lock()  # 抓取线程（流式读取的锚点）和解析线程都会检查规则文件
+
+    def refresh(self):
+        """规则文件修改时间变化时重新编译，编译失败时保留之前的规则；返回是否重新加载"""
+        with self.lock:
+            return self._refresh()
+
+    def _refresh(self):
+        try:
+            mtime = os.path.getmtime(self.profile_file)
+        except OSError as e:
+            if self.mtime is not None:
+                logging.warning(f"无法读取提取规则文件: {e}，继续使用已加载的规则")
+                self.mtime = None
+            return False
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        try:
+            with open(self.profile_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            sections = {}
+            for section_name, rule in json.loads(content).get("sections", {}).items():
+                compiled = {}
+                for field in self.FIELDS:
+                    if rule.get(field):
+                        try:
+                            compiled[field] = CompiledSelector(rule[field])
+                        except ValueError as e:
+                            raise ValueError(f"{section_name}.{field}: {e}")
+                sections[section_name.lower()] = compiled
+        except Exception as e:
+            logging.error(f"加载提取规则失败: {e}，继续使用{'之前的规则' if self.sections else '启发式查找'}")
+            return False
+        self.sections = sections
+        self.digest = hashlib.md5(content.encode('utf-8')).hexdigest()
+        logging.info(f"已从 {self.profile_file} 加载 {len(sections)} 个任务部分的提取规则")
+        return True
+
+    def rule(self, section_name):
+        return self.sections.get(section_name.lower())
+
+# 当前使用的提取规则，未指定规则文件时为None
+extraction_profile = None
+
+def load_extraction_profile(profile_file):
+    """加载提取规则文件，之后每次检查前检查文件是否修改"""
+    global extraction_profile
+    extraction_profile = ExtractionProfile(profile_file)
+    return extraction_profile.refresh()
+
+def section_rule(section_name):
+    """任务部分的提取规则，没有时返回None"""
+    if extraction_profile is None or not section_name:
+        return None
+    return extraction_profile.rule(section_name)
+
+# ==================== 流式读取 ====================
+# 没有结束标签的元素
+VOID_ELEMENTS = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+                           "param", "source", "track", "wbr"])
+
+# 开始标签隐式结束的同级元素（如<li>省略了</li>），只检查栈顶
+IMPLIED_END_TAGS = {
+    "li": ("li",), "p": ("p",), "option": ("option",), "dt": ("dt", "dd"), "dd": ("dt", "dd"),
+    "tr": ("tr", "td", "th"), "td": ("td", "th"), "th": ("td", "th"),
+}
+
+# 登录页面的特征文本，流式读取时逐块检查
+LOGIN_PAGE_MARKERS = ("You are being logged in", "auto-sign-in")
+
+class _StreamElement:
+    __slots__ = ("attrs",)
+
+    def __init__(self, attrs):
+        self.attrs = attrs
+
+class SectionStreamParser(HTMLParser):
+    """流式HTML分词器：维护打开的元素栈，只记录与锚点选择器匹配的元素子树
+
+    元素栈用与PageIndex同名的列表保存，锚点在开始标签处用CompiledSelector按栈判断；
+    子树重新序列化为HTML，连同祖先元素的开始标签一起保存，依赖祖先的选择器在截取的文档中仍能匹配
+    """
+
+    def __init__(self, anchors):
+        super().__init__(convert_charrefs=True)
+        self.anchors = dict(anchors)  # 尚未找到的锚点: 部分名称 -> CompiledSelector
+        self.names, self.classes, self.ids, self.parents, self.nodes = [], [], [], [], []
+        self.start_tags = []  # 栈中元素的原始开始标签
+        self.captures = []  # 正在记录的子树: [部分名称, 锚点在栈中的位置, 片段列表, 祖先标签名]
+        self.sections = []  # 已读完的(部分名称, HTML)
+
+    @property
+    def complete(self):
+        """所有锚点都已找到并读完"""
+        return not self.anchors and not self.captures
+
+    def _emit(self, text):
+        for capture in self.captures:
+            capture[2].append(text)
+
+    def handle_starttag(self, tag, attrs):
+        raw = self.get_starttag_text()
+        if tag in VOID_ELEMENTS:
+            self._emit(raw)
+            return
+        implied = IMPLIED_END_TAGS.get(tag)
+        while implied and self.names and self.names[-1] in implied:
+            self._close_top()
+        attr_dict = {}
+        for name, value in attrs:
+            attr_dict.setdefault(name, value or "")
+        class_value = attr_dict.get("class")
+        pos = len(self.names)
+        self.names.append(tag)
+        self.classes.append(class_value.lower() if class_value else "")
+        self.ids.append(attr_dict.get("id"))
+        self.parents.append(pos - 1)
+        self.nodes.append(_StreamElement(attr_dict))
+        self.start_tags.append(raw)
+        self._emit(raw)
+        for section_name, selector in list(self.anchors.items()):
+            if selector.matches(self, pos):
+                del self.anchors[section_name]
+                self.captures.append([section_name, pos, self.start_tags[:], self.names[:pos]])
+
+    def handle_startendtag(self, tag, attrs):
+        self._emit(self.get_starttag_text())
+
+    def _close_top(self):
+        """结束栈顶元素，锚点元素结束时补上祖先元素的结束标签，保存截取的部分"""
+        pos = len(self.names) - 1
+        name = self.names.pop()
+        del self.classes[pos], self.ids[pos], self.parents[pos], self.nodes[pos], self.start_tags[pos]
+        self._emit(f"</{name}>")
+        for capture in [capture for capture in self.captures if capture[1] == pos]:
+            self.captures.remove(capture)
+            section_name, _, parts, ancestors = capture
+            parts.extend(f"</{ancestor}>" for ancestor in reversed(ancestors))
+            self.sections.append((section_name, "".join(parts)))
+        return name
+
+    def handle_endtag(self, tag):
+        if tag not in self.names:
+            return
+        # 其余未闭合的元素随外层元素一起结束
+        while self.names and self._close_top() != tag:
+            pass
+
+    def handle_data(self, data):
+        if self.captures:
+            self._emit(html_escape(data, quote=False))
+
+    def handle_comment(self, data):
+        if self.captures:
+            self._emit(f"<!--{data}-->")
+
+def stream_anchors():
+    """流式读取时各任务部分的锚点，取自提取规则中不含文本条件的container选择器；有部分没有可用锚点时返回None"""
+    if extraction_profile is not None:
+        extraction_profile.refresh()
+    section_names = ["Eligible Tasks"] + (["Training Tasks"] if config.get("check_training", False) else [])
+    anchors = {}
+    for section_name in section_names:
+        rule = section_rule(section_name)
+        selector = rule.get("container") if rule else None
+        if selector is None or selector.uses_text:
+            return None
+        anchors[section_name] = selector
+    return anchors
+
+class StreamedResponse(ReplayResponse):
+    """流式读取后代替requests响应的对象：正文只有截取的任务部分，状态码、URL和响应头来自原响应
+
+    page_loaded为读取时整个页面中是否出现过正确加载时应有的内容，截取的部分本身不一定包含
+    """
+
+    def __init__(self, response, html, page_loaded=None):
+        super().__init__(html, response.url)
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.page_loaded = page_loaded
+
+def read_streamed_page(response, anchors, session, chunk_size=16384):
+    """逐块读取流式响应并交给分词器，只保留锚点匹配的任务部分，所有部分读完后不再读取剩余的页面
+
+    返回StreamedResponse；遇到登录页面特征时读完页面并返回该部分以后的内容，交给登录检测；
+    页面读完仍有锚点没有找到时返回包含完整页面的StreamedResponse，由调用方使用启发式查找，不再重新下载
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    parser = SectionStreamParser(anchors)
+    overlap = max(len(marker) for marker in LOGIN_PAGE_MARKERS + PAGE_LOADED_MARKERS)
+    tail = ""
+    page_loaded = False
+    login_text = None
+    # 所有部分找到之前保留已解码的文本，页面读完仍没有找到时直接作为完整页面使用
+    page_text = []
+    stopped = False
+    start = time.perf_counter()
+    try:
+        for chunk in response.iter_content(chunk_size):
+            text = decoder.decode(chunk)
+            if login_text is not None:
+                login_text.append(text)
+                continue
+            window = tail + text
+            if any(marker in window for marker in LOGIN_PAGE_MARKERS):
+                login_text = [window]
+                continue
+            tail = window[-overlap:]
+            if not page_loaded:
+                page_loaded = has_page_loaded_marker(window)
+            page_text.append(text)
+            parser.feed(text)
+            if parser.complete:
+                stopped = True
+                break
+        if not stopped:
+            text = decoder.decode(b"", final=True)
+            if login_text is not None:
+                login_text.append(text)
+            else:
+                page_text.append(text)
+                parser.feed(text)
+                parser.close()
+    finally:
+        downloaded = response.raw.tell() if hasattr(response.raw, "tell") else 0
+        # 提前停止时剩余的正文不再读取，连接随响应关闭
+        response.close()
+        session.record_stream(time.perf_counter() - start, downloaded, stopped)
+    
+    if login_text is not None:
+        return StreamedResponse(response, "".join(login_text))
+    if not parser.complete:
+        missing = ", ".join(sorted(parser.anchors) + [capture[0] for capture in parser.captures])
+        logging.warning(f"流式读取没有找到任务部分: {missing}，本次使用完整页面")
+        # 整个页面已经读完，页面是否已加载交给检测函数按完整页面判断
+        return StreamedResponse(response, "".join(page_text))
+    logging.debug(f"流式读取{'提前停止' if stopped else '读完页面'}，下载 {downloaded} 字节")
+    # 每个部分都带有自己的祖先元素，直接拼接即可；提前停止时剩余的页面没有读到，
+    # 所有锚点都已找到本身说明页面已正确加载
+    return StreamedResponse(response, "".join(section_html for _, section_html in parser.sections),
+                            page_loaded or stopped)
+
+# 当前线程正在处理的页面索引，检测函数通过它共用本次检查的文本缓存
+_poll_state = threading.local()
+
+@contextlib.contextmanager
+def poll_text_cache(page_index):
+    """在一次检查期间启用页面索引的文本缓存，检查结束后丢弃缓存"""
+    previous_index = getattr(_poll_state, "page_index", None)
+    _poll_state.page_index = page_index
+    _poll_state.real_task_cache = {}
+    try:
+        yield page_index
+    finally:
+        page_index.clear_text_cache()
+        _poll_state.page_index = previous_index
+        _poll_state.real_task_cache = {} if previous_index is not None else None
+
+def _cached_position(node):
+    page_index = getattr(_poll_state, "page_index", None)
+    if page_index is None:
+        return None, None
+    return page_index, page_index.position(node)
+
+def node_text(node):
+    """节点的get_text()结果，检查期间从缓存读取"""
+    page_index, pos = _cached_position(node)
+    if pos is None:
+        return node.get_text()
+    return page_index.text(pos)
+
+def node_text_lower(node):
+    """节点小写后的get_text()结果，检查期间从缓存读取"""
+    page_index, pos = _cached_position(node)
+    if pos is None:
+        return node.get_text().lower()
+    return page_index.text_lower(pos)
+
+def previous_headings(element, limit=3):
+    """元素之前最近的几个标题元素"""
+    heading_names = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+    page_index, pos = _cached_position(element)
+    if pos is None:
+        return element.find_all_previous(heading_names)[:limit]
+    return [page_index.nodes[previous] for previous in page_index.previous_elements(pos, heading_names, limit)]
+
+def _rule_scope(section):
+    """规则在部分中查找时使用的页面索引和部分的位置，检查期间共用本次检查的页面索引"""
+    page_index, pos = _cached_position(section)
+    if pos is None:
+        return build_page_index(section), 0
+    return page_index, pos
+
+def rule_has_tasks(section, rule):
+    """按规则判断部分是否有任务：empty匹配时为False，task匹配时为True，都没有匹配时返回None"""
+    index, pos = _rule_scope(section)
+    if "empty" in rule and rule["empty"].first(index, pos) is not None:
+        return False
+    if "task" in rule and rule["task"].first(index, pos) is not None:
+        return True
+    return None
+
+def extract_rule_entries(section, rule):
+    """按规则提取任务，返回[(任务文本, 来源元素)]；task和empty都没有匹配时返回None"""
+    if "task" not in rule:
+        return None
+    index, pos = _rule_scope(section)
+    task_positions = rule["task"].select(index, pos)
+    if not task_positions:
+        if "empty" in rule and rule["empty"].first(index, pos) is not None:
+            return []
+        return None
+    entries = []
+    for task_pos in task_positions:
+        name_pos = rule["name"].first(index, task_pos) if "name" in rule else None
+        task_name = index.text(task_pos if name_pos is None else name_pos).strip()
+        count_pos = rule["count"].first(index, task_pos) if "count" in rule else None
+        task_count = index.text(count_pos).strip() if count_pos is not None else ""
+        if task_name:
+            entries.append((f"{task_name} {task_count}" if task_count else task_name, index.nodes[task_pos]))
+    return entries
+
 # 尝试定位任务列表的通用方法，适用于同一容器中的多个任务类型
-def find_tasks_container(soup, section_name):
-    """查找包含任务列表的容器，支持多种任务类型在同一容器的情况"""
+@stage_timer.timed("find_tasks_container")
+def find_tasks_container(soup, section_name, index=None):
+    """查找包含任务列表的容器，支持多种任务类型在同一容器的情况
+
+    所有查找都基于一次遍历建立的页面索引，同一页面的多个部分应共用index
+    """
     logging.debug(f"尝试查找包含{section_name}的容器")
     
+    if index is None:
+        index = build_page_index(soup)
+    
+    # 配置了提取规则时先按规则查找，没有匹配时使用下面的启发式查找
+    rule = section_rule(section_name)
+    if rule and "container" in rule:
+        found = rule["container"].first(index)
+        if found is not None:
+            logging.debug(f"通过提取规则找到{section_name}的容器")
+            return index.nodes[found]
+        logging.debug(f"提取规则没有匹配到{section_name}的容器，使用启发式查找")
+    
+    section_name_lower = section_name.lower()
+    names = index.names
+    classes = index.classes
+    
     # 首先尝试找到包含任务部分标题的元素
-    section_header = soup.find(string=lambda text: text and section_name.lower() in text.lower())
-    if section_header:
+    header_string = index.find_string(section_name_lower)
+    if header_string is not None:
         logging.debug(f"找到了{section_name}文本")
+        header_pos = index.string_parents[header_string]
+        header_ancestors = [header_pos] + list(index.ancestors(header_pos))
         
         # 1. 检查是否在列表项中，表示可能是选项卡或分组任务
         list_item = None
-        for parent in section_header.parents:
-            if parent.name in ['li', 'div'] and (parent.get('role') == 'tab' or 'tab' in parent.get('class', '')):
-                list_item = parent
+        for pos in header_ancestors:
+            if names[pos] in ['li', 'div'] and (index.roles[pos] == 'tab' or 'tab' in classes[pos].split()):
+                list_item = pos
                 logging.debug(f"{section_name}在一个选项卡/标签中")
                 break
                 
-        if list_item:
+        if list_item is not None:
             # 查找关联的内容面板
-            tab_id = list_item.get('id', '')
-            aria_controls = list_item.get('aria-controls', '')
+            tab_id = index.ids[list_item] or ''
+            aria_controls = index.aria_controls[list_item] or ''
             
             # 尝试通过aria-controls找到对应的面板
-            if aria_controls:
-                panel = soup.find(id=aria_controls)
-                if panel:
-                    logging.debug(f"通过aria-controls找到了{section_name}对应的面板")
-                    return panel
+            if aria_controls and aria_controls in index.id_map:
+                logging.debug(f"通过aria-controls找到了{section_name}对应的面板")
+                return index.nodes[index.id_map[aria_controls]]
             
             # 尝试通过相似ID查找面板
             if tab_id:
                 panel_id = tab_id.replace('tab', 'panel').replace('Tab', 'Panel')
-                panel = soup.find(id=panel_id)
-                if panel:
+                if panel_id in index.id_map:
                     logging.debug(f"通过ID映射找到了{section_name}对应的面板")
-                    return panel
+                    return index.nodes[index.id_map[panel_id]]
             
-            # 如果找不到特定面板，尝试查找与标签对应的所有内容面板
-            panels = soup.find_all(['div', 'section'], 
-                                   class_=lambda c: c and ('panel' in c.lower() or 'content' in c.lower() or 'tasks' in c.lower()))
-            
-            # 检查每个面板是否包含与section_name相关的内容
-            for panel in panels:
-                panel_text = panel.get_text().lower()
-                if section_name.lower() in panel_text:
+            # 如果找不到特定面板，检查每个内容面板是否包含与section_name相关的内容
+            for pos in index.iter_elements(('div', 'section')):
+                panel_class = classes[pos]
+                if ('panel' in panel_class or 'content' in panel_class or 'tasks' in panel_class) and \
+                        section_name_lower in index.text_lower(pos):
                     logging.debug(f"在面板内容中找到了{section_name}相关文本")
-                    return panel
+                    return index.nodes[pos]
         
         # 2. 如果不是选项卡，查找包含该文本的最近的任务容器
-        for parent in section_header.parents:
-            if parent.name in ['div', 'section']:
+        for pos in header_ancestors:
+            if names[pos] in ['div', 'section']:
                 # 检查是否是任务容器
-                classes = parent.get('class', [])
-                if classes and any(c for c in classes if 'task' in c.lower() or 'list' in c.lower() or 'container' in c.lower()):
+                if any('task' in c or 'list' in c or 'container' in c for c in classes[pos].split()):
                     logging.debug(f"找到包含{section_name}的任务容器")
-                    return parent
+                    return index.nodes[pos]
                     
                 # 如果到达了相对较大的容器，直接返回
-                if len(list(parent.find_all())) > 10:  # 超过10个子元素视为较大容器
+                if index.descendant_count(pos) > 10:  # 超过10个子元素视为较大容器
                     logging.debug(f"找到包含{section_name}的较大容器")
-                    return parent
+                    return index.nodes[pos]
     
-    # 3. 尝试查找具有特定类名的容器
-    selectors = TRAINING_TASKS_SELECTORS if section_name.lower() == "training tasks" else ELIGIBLE_TASKS_SELECTORS
+    # 3. 尝试查找具有特定类名或ID的容器
+    selectors = TRAINING_TASKS_SELECTORS if section_name_lower == "training tasks" else ELIGIBLE_TASKS_SELECTORS
+    containers = list(index.iter_elements(('div', 'section')))
     for selector in selectors:
-        container = soup.find(['div', 'section'], 
-                             class_=lambda c: c and selector.lower() in c.lower()) or \
-                   soup.find(['div', 'section'], id=lambda i: i and selector.lower() in i.lower())
-        if container:
+        selector_lower = selector.lower()
+        found = next((pos for pos in containers if selector_lower in classes[pos]), None)
+        if found is None:
+            found = next((pos for pos in containers
+                          if index.ids[pos] and selector_lower in index.ids[pos].lower()), None)
+        if found is not None:
             logging.debug(f"通过选择器'{selector}'找到包含{section_name}的容器")
-            return container
+            return index.nodes[found]
     
     # 4. 尝试查找包含多种任务类型的主容器
-    main_containers = soup.find_all(['div', 'section'], 
-                                   class_=lambda c: c and ('tasks-container' in c.lower() or 
-                                                           'tasks-section' in c.lower() or 
-                                                           'task-types' in c.lower() or
-                                                           'task-list' in c.lower()))
-    for container in main_containers:
-        container_text = container.get_text().lower()
-        if section_name.lower() in container_text:
+    for pos in containers:
+        container_class = classes[pos]
+        if ('tasks-container' in container_class or 'tasks-section' in container_class or
+                'task-types' in container_class or 'task-list' in container_class) and \
+                section_name_lower in index.text_lower(pos):
             logging.debug(f"在主任务容器中找到了{section_name}相关文本")
-            return container
+            return index.nodes[pos]
     
     # 5. 尝试查找页面中所有包含"tasks"的主要区域
-    all_task_sections = soup.find_all(['div', 'section'], 
-                                     class_=lambda c: c and 'task' in c.lower())
-    for section in all_task_sections:
-        section_text = section.get_text().lower()
-        if section_name.lower() in section_text:
+    for pos in containers:
+        if 'task' in classes[pos] and section_name_lower in index.text_lower(pos):
             logging.debug(f"在任务区域中找到了{section_name}相关文本")
-            return section
+            return index.nodes[pos]
     
     # 6. 最后尝试在页面主要部分中查找任务相关文本
-    main_content = soup.find(['main', 'div'], class_='main-content') or soup.find('body')
-    if section_name.lower() in main_content.get_text().lower():
+    main_content = next((pos for pos in index.iter_elements(('main', 'div'))
+                         if 'main-content' in classes[pos].split() or classes[pos] == 'main-content'), None)
+    if main_content is None:
+        main_content = next(index.iter_elements(('body',)), None)
+    if main_content is not None and section_name_lower in index.text_lower(main_content):
         logging.debug(f"在页面主要内容中找到了{section_name}相关文本")
-        return main_content
+        return index.nodes[main_content]
         
     logging.warning(f"未能找到包含{section_name}的容器")
     return None
 
 def is_real_task(text):
-    """判断文本是否是真正的任务而不是UI元素"""
+    """判断文本是否是真正的任务而不是UI元素，检查期间相同文本只判断一次"""
+    cache = getattr(_poll_state, "real_task_cache", None)
+    if cache is None:
+        return _is_real_task(text)
+    result = cache.get(text)
+    if result is None:
+        result = cache[text] = _is_real_task(text)
+    return result
+
+def _is_real_task(text):
     text_lower = text.lower()
     
     # 排除已知的非任务文本
@@ -1464,22 +4588,175 @@ def is_real_task(text):
     
     return True
 
-def extract_task_texts(section):
-    """从页面部分提取实际的任务文本列表，用于比较变化"""
-    if not section:
-        return []
-        
-    task_texts = []
-    
-    # 1. 从任务元素中提取文本
-    task_elements = section.find_all(['li', 'article', 'card', 'div'], 
+class KeywordMatcher:
+    """把一组关键词编译成一个正则，一次扫描就能找出文本中包含的所有关键词（包括相互重叠的）"""
+
+    def __init__(self, keywords):
+        self.keywords = sorted({keyword.lower() for keyword in keywords if keyword}, key=len, reverse=True)
+        # 在每个位置用前瞻匹配最长的关键词，同一位置开始的较短关键词由prefixes补齐
+        self.pattern = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword in self.keywords) + "))")
+        self.prefixes = {
+            keyword: frozenset(other for other in self.keywords if keyword.startswith(other))
+            for keyword in self.keywords
+        }
+
+    def find_all(self, text_lower):
+        """返回小写文本中出现的所有关键词集合"""
+        found = set()
+        for keyword in self.pattern.findall(text_lower):
+            found |= self.prefixes[keyword]
+        return found
+
+# 任务文本匹配器，启动时编译一次
+_task_text_matcher = None
+
+def build_task_text_matcher():
+    """把任务指标、特定任务名称及其" - "两侧的关键词编译成一个匹配器"""
+    global _task_text_matcher
+    keywords = list(TASK_INDICATORS) + list(SPECIFIC_TRAINING_TASKS)
+    for specific_task in SPECIFIC_TRAINING_TASKS:
+        parts = specific_task.split(" - ")
+        if len(parts) >= 2:
+            keywords.extend(parts[:2])
+    _task_text_matcher = KeywordMatcher(keywords)
+    return _task_text_matcher
+
+def get_task_text_matcher():
+    return _task_text_matcher or build_task_text_matcher()
+
+# 任务文本末尾的数量，如"Search - Apple Music Top Hits 2"
+_TASK_COUNT_PATTERN = re.compile(r'^(.*\S)\s+(\d+)$')
+
+class TaskRecord:
+    """页面中的一个任务：所在部分、名称、数量（没有数量时为None）和来源元素
+
+    来源元素只保存简短描述，避免记录在两次检查之间持有整棵解析树
+    """
+    __slots__ = ("section", "name", "count", "source")
+
+    def __init__(self, section, name, count=None, source=None):
+        self.section = section
+        self.name = name
+        self.count = count
+        self.source = source
+
+    @classmethod
+    def from_text(cls, section, text, source=None):
+        """从"任务名称 数量"格式的任务文本创建记录"""
+        match = _TASK_COUNT_PATTERN.match(text)
+        if match:
+            return cls(section, match.group(1), int(match.group(2)), source)
+        return cls(section, text, None, source)
+
+    @property
+    def key(self):
+        return (self.section, self.name)
+
+    def __str__(self):
+        return self.name if self.count is None else f"{self.name} ({self.count})"
+
+    def __repr__(self):
+        return f"TaskRecord({self.section!r}, {self.name!r}, {self.count!r}, {self.source!r})"
+
+class TaskEvent:
+    """两次检查之间的任务差异：added新增、removed消失、count_changed数量变化"""
+    __slots__ = ("kind", "record", "previous_count")
+
+    def __init__(self, kind, record, previous_count=None):
+        self.kind = kind
+        self.record = record
+        self.previous_count = previous_count
+
+    @property
+    def is_new_work(self):
+        """是否表示有新的可做任务（新增任务或数量增加），只有这类事件触发提醒"""
+        if self.kind == "added":
+            return True
+        return self.kind == "count_changed" and (self.record.count or 0) > (self.previous_count or 0)
+
+    def __str__(self):
+        record = self.record
+        if self.kind == "added":
+            return f"[{record.section}] 新任务: {record}"
+        if self.kind == "removed":
+            return f"[{record.section}] 任务消失: {record}"
+        return f"[{record.section}] 数量变化: {record.name} {self.previous_count} → {record.count}"
+
+    def __repr__(self):
+        return f"TaskEvent({self.kind!r}, {self.record!r}, {self.previous_count!r})"
+
+def describe_element(element):
+    """元素的简短描述，如li#task-1.task-item"""
+    if element is None or not getattr(element, "name", None):
+        return None
+    description = element.name
+    element_id = element.get("id")
+    if element_id:
+        description += f"#{element_id}"
+    classes = element.get("class")
+    if classes:
+        description += "." + ".".join(classes if isinstance(classes, list) else str(classes).split())
+    return description
+
+def build_task_records(section_name, entries):
+    """把[(任务文本, 来源元素描述)]转换为按(部分, 名称)索引的任务记录，同名任务保留第一条"""
+    records = {}
+    for text, source in entries:
+        record = TaskRecord.from_text(section_name, text, source)
+        if record.key not in records:
+            records[record.key] = record
+    return records
+
+@stage_timer.timed("diff")
+def diff_task_records(previous, current):
+    """按键比较两次检查的任务记录，返回差异事件列表"""
+    events = []
+    for key, record in current.items():
+        previous_record = previous.get(key)
+        if previous_record is None:
+            events.append(TaskEvent("added", record))
+        elif previous_record.count != record.count:
+            events.append(TaskEvent("count_changed", record, previous_record.count))
+    for key, record in previous.items():
+        if key not in current:
+            events.append(TaskEvent("removed", record))
+    return events
+
+def extract_task_texts(section, section_name=None):
+    """从页面部分提取实际的任务文本列表，用于比较变化"""
+    return [text for text, _ in extract_task_entries(section, section_name)]
+
+@stage_timer.timed("extract_task_texts")
+def extract_task_entries(section, section_name=None):
+    """从页面部分提取任务，返回[(规范化后的任务文本, 来源元素)]
+
+    部分配置了提取规则且规则匹配时直接使用规则的结果，否则使用启发式提取
+    """
+    if not section:
+        return []
+    
+    rule = section_rule(section_name)
+    if rule:
+        entries = extract_rule_entries(section, rule)
+        if entries is not None:
+            return entries
+        
+    task_texts = []
+    task_sources = []  # 与task_texts一一对应的来源元素
+    
+    def add_task(text, source):
+        task_texts.append(text)
+        task_sources.append(source)
+    
+    # 1. 从任务元素中提取文本
+    task_elements = section.find_all(['li', 'article', 'card', 'div'], 
                                    class_=lambda c: c and any(term in (c.lower() if c else "") 
                                               for term in ['item', 'card', 'task', 'study', 'program']))
     
     for element in task_elements:
-        text = element.get_text().strip()
+        text = node_text(element).strip()
         if text and is_real_task(text):
-            task_texts.append(text)
+            add_task(text, element)
     
     # 2. 查找表格或列表中的任务
     # 表格元素
@@ -1492,22 +4769,22 @@ def extract_task_texts(section):
                 continue
             cells = row.find_all('td')
             if len(cells) >= 2:  # 假设至少有任务名称和状态两列
-                task_name = cells[0].get_text().strip()
+                task_name = node_text(cells[0]).strip()
                 if task_name and is_real_task(task_name):
                     # 提取任务名称和数量
                     task_count = ""
                     for cell in cells[1:]:
-                        cell_text = cell.get_text().strip()
+                        cell_text = node_text(cell).strip()
                         if cell_text.isdigit():
                             task_count = cell_text
                             break
                     
                     if task_count:
-                        task_texts.append(f"{task_name} {task_count}")
+                        add_task(f"{task_name} {task_count}", row)
                     else:
                         # 添加完整的行信息
-                        full_row_text = " ".join([cell.get_text().strip() for cell in cells])
-                        task_texts.append(full_row_text)
+                        full_row_text = " ".join([node_text(cell).strip() for cell in cells])
+                        add_task(full_row_text, row)
     
     # 3. 寻找Training Tasks特有的任务格式
     # Training任务通常有一个名称和计数/数量
@@ -1528,97 +4805,84 @@ def extract_task_texts(section):
                                                      'qty' in (c.lower() if c else "")))
         
         if name_elem:
-            task_name = name_elem.get_text().strip()
+            task_name = node_text(name_elem).strip()
         if count_elem:
-            task_count = count_elem.get_text().strip()
+            task_count = node_text(count_elem).strip()
         
         # 如果没有找到结构化的名称和计数，尝试提取整个元素文本
         if not task_name:
-            task_name = item.get_text().strip()
+            task_name = node_text(item).strip()
             
         if task_name and is_real_task(task_name):
             if task_count:
-                task_texts.append(f"{task_name} {task_count}")
+                add_task(f"{task_name} {task_count}", item)
             else:
-                task_texts.append(task_name)
+                add_task(task_name, item)
+    
+    # 所有文本节点只取一次，并用预编译的关键词匹配器逐个扫描一次，
+    # 得到每个文本节点包含的特定任务名称、任务关键词和任务指标
+    all_texts = section.find_all(string=True)
+    matcher = get_task_text_matcher()
+    text_hits = []
+    for text in all_texts:
+        found = matcher.find_all(text.lower())
+        if found:
+            text_hits.append((text, found))
     
     # 4. 特别查找用户提供的特定Training Tasks
     specific_tasks_found = set()  # 使用集合来跟踪已找到的特定任务
     
-    # 首先尝试在各种元素中精确匹配任务名称
+    def add_specific_task_from(element, specific_task):
+        """从包含任务名称的文本节点向上找最多3层任务容器，加入任务名称和数量"""
+        parent = element.parent
+        if not parent or parent.name in ['script', 'style']:
+            return
+        task_container = parent
+        for _ in range(3):
+            if task_container and task_container.name in ['li', 'div', 'article', 'tr']:
+                # 尝试找到任务对应的数量
+                quantity_elem = task_container.find(string=lambda text: text and text.strip().isdigit())
+                
+                if quantity_elem:
+                    task_text = f"{specific_task} {quantity_elem.strip()}"
+                else:
+                    # 如果找不到数量，使用预设的数量
+                    expected_count = SPECIFIC_TASK_EXPECTED_COUNTS.get(specific_task)
+                    if expected_count:
+                        task_text = f"{specific_task} {expected_count}"
+                    else:
+                        task_text = specific_task
+                        
+                if task_text and is_real_task(task_text) and task_text not in task_texts:
+                    add_task(task_text, task_container)
+                    specific_tasks_found.add(specific_task)
+                break
+            if task_container:
+                task_container = task_container.parent
+    
     for specific_task in SPECIFIC_TRAINING_TASKS:
         # 如果已找到该任务，跳过
         if specific_task in specific_tasks_found:
             continue
-            
-        # 直接在文本中搜索任务名称 - 精确匹配
-        elements_with_task = section.find_all(string=lambda text: text and specific_task in text)
-        if elements_with_task:
-            for element in elements_with_task:
-                parent = element.parent
-                if parent and parent.name not in ['script', 'style']:
-                    # 获取包含任务和数量的完整文本
-                    task_container = parent
-                    # 向上找最多3层，尝试找到完整的任务容器
-                    for _ in range(3):
-                        if task_container and task_container.name in ['li', 'div', 'article', 'tr']:
-                            # 尝试找到任务对应的数量
-                            quantity_elem = task_container.find(string=lambda text: text and text.strip().isdigit())
-                            
-                            if quantity_elem:
-                                task_text = f"{specific_task} {quantity_elem.strip()}"
-                            else:
-                                # 如果找不到数量，使用预设的数量
-                                expected_count = SPECIFIC_TASK_EXPECTED_COUNTS.get(specific_task)
-                                if expected_count:
-                                    task_text = f"{specific_task} {expected_count}"
-                                else:
-                                    task_text = specific_task
-                                    
-                            if task_text and is_real_task(task_text) and task_text not in task_texts:
-                                task_texts.append(task_text)
-                                specific_tasks_found.add(specific_task)
-                            break
-                        if task_container:
-                            task_container = task_container.parent
+        
+        # 直接在文本中搜索任务名称 - 精确匹配（区分大小写）
+        specific_task_lower = specific_task.lower()
+        for text, found in text_hits:
+            if specific_task_lower in found and specific_task in text:
+                add_specific_task_from(text, specific_task)
         
         # 如果没有精确匹配，尝试部分匹配
         if specific_task not in specific_tasks_found:
             # 提取关键词
             keywords = specific_task.split(" - ")
             if len(keywords) >= 2:
-                main_keyword = keywords[0]  # "Search" 或 "Podcast"
-                sub_keyword = keywords[1]   # 例如 "Apple Music Top Hits"
+                main_keyword = keywords[0].lower()  # "Search" 或 "Podcast"
+                sub_keyword = keywords[1].lower()   # 例如 "Apple Music Top Hits"
                 
-                # 查找包含这些关键词的元素
-                for element in section.find_all(string=lambda text: text and 
-                                             main_keyword.lower() in text.lower() and 
-                                             sub_keyword.lower() in text.lower()):
-                    parent = element.parent
-                    if parent and parent.name not in ['script', 'style']:
-                        # 向上找最多3层
-                        task_container = parent
-                        for _ in range(3):
-                            if task_container and task_container.name in ['li', 'div', 'article', 'tr']:
-                                # 尝试找到数量
-                                quantity_elem = task_container.find(string=lambda text: text and text.strip().isdigit())
-                                
-                                if quantity_elem:
-                                    task_text = f"{specific_task} {quantity_elem.strip()}"
-                                else:
-                                    # 如果找不到数量，使用预设的数量
-                                    expected_count = SPECIFIC_TASK_EXPECTED_COUNTS.get(specific_task)
-                                    if expected_count:
-                                        task_text = f"{specific_task} {expected_count}"
-                                    else:
-                                        task_text = specific_task
-                                
-                                if task_text and is_real_task(task_text) and task_text not in task_texts:
-                                    task_texts.append(task_text)
-                                    specific_tasks_found.add(specific_task)
-                                break
-                            if task_container:
-                                task_container = task_container.parent
+                # 查找同时包含这些关键词的文本
+                for text, found in text_hits:
+                    if main_keyword in found and sub_keyword in found:
+                        add_specific_task_from(text, specific_task)
     
     # 5. 如果有特定任务未找到，但我们确信它们应该存在，使用预设值添加
     for specific_task in SPECIFIC_TRAINING_TASKS:
@@ -1630,7 +4894,7 @@ def extract_task_texts(section):
             if len(keywords) >= 2:
                 for keyword in keywords:
                     if len(keyword) > 3:  # 跳过太短的关键词
-                        if keyword.lower() in section.get_text().lower():
+                        if keyword.lower() in node_text_lower(section):
                             has_related_content = True
                             break
             
@@ -1640,31 +4904,36 @@ def extract_task_texts(section):
                 if expected_count:
                     task_text = f"{specific_task} {expected_count}"
                     if task_text not in task_texts:
-                        task_texts.append(task_text)
+                        add_task(task_text, section)
                         specific_tasks_found.add(specific_task)
     
-    # 6. 从任务指标中提取文本
+    # 6. 从任务指标中提取文本，按指标顺序输出每个指标命中的文本节点
     for indicator in TASK_INDICATORS:
-        elements = section.find_all(string=lambda text: text and indicator.lower() in text.lower())
-        for element in elements:
+        indicator_lower = indicator.lower()
+        for element, found in text_hits:
+            if indicator_lower not in found:
+                continue
             parent = element.parent
             if parent and parent.name not in ['script', 'style']:
-                text = parent.get_text().strip()
+                text = node_text(parent).strip()
                 if text and is_real_task(text) and text not in task_texts:
-                    task_texts.append(text)
+                    add_task(text, parent)
     
     # 7. 从按钮和链接中提取文本
     action_elements = section.find_all(['button', 'a'])
     for element in action_elements:
+        element_text = node_text(element)
+        if not element_text:
+            continue
+        element_text_lower = node_text_lower(element)
         for indicator in ACTION_INDICATORS:
-            if element.get_text() and indicator.lower() in element.get_text().lower():
-                text = element.get_text().strip()
+            if indicator.lower() in element_text_lower:
+                text = element_text.strip()
                 if text and is_real_task(text) and text not in task_texts:
-                    task_texts.append(text)
+                    add_task(text, element)
     
     # 8. 特别处理表格布局的Training Tasks
     # 查找所有可能包含任务名称和数量的元素对
-    all_texts = section.find_all(string=True)
     for i, text in enumerate(all_texts):
         # 跳过脚本和样式文本
         if text.parent.name in ['script', 'style']:
@@ -1681,20 +4950,22 @@ def extract_task_texts(section):
                         if next_text.isdigit() or re.match(r'^\d+$', next_text):
                             combined = f"{text_content} {next_text}"
                             if combined not in task_texts:
-                                task_texts.append(combined)
+                                add_task(combined, text.parent)
                             break
     
-    # 9. 对任务文本进行规范化处理
-    normalized_texts = []
-    for text in task_texts:
+    # 9. 对任务文本进行规范化处理，重复的文本保留第一次出现时的来源
+    normalized_texts = set()
+    entries = []
+    for text, source in zip(task_texts, task_sources):
         # 移除多余空格和换行
         normalized = re.sub(r'\s+', ' ', text).strip()
         # 移除数字前缀（如 1. 2. 等）
         normalized = re.sub(r'^\d+\.\s*', '', normalized)
         if normalized and normalized not in normalized_texts:
-            normalized_texts.append(normalized)
+            normalized_texts.add(normalized)
+            entries.append((normalized, source))
     
-    return normalized_texts
+    return entries
 
 def display_training_tasks_table(tasks):
     """以表格形式在控制台显示Training Tasks"""
@@ -1752,13 +5023,28 @@ def signal_handler(signum, frame):
             print("2. 输入 'q' 或 'Q' 退出程序")
             print("3. 再次按 Ctrl+C 强制退出")
             
-            # 启动一个线程来监听用户输入
-            input_thread = threading.Thread(target=handle_user_input)
-            input_thread.daemon = True
-            input_thread.start()
+            if active_monitor is not None:
+                # 异步监控运行中，由操作台任务接收用户输入
+                active_monitor.loop.call_soon_threadsafe(active_monitor.pause)
+            else:
+                # 启动一个线程来监听用户输入
+                input_thread = threading.Thread(target=handle_user_input)
+                input_thread.daemon = True
+                input_thread.start()
         else:
             logging.info("\n再次检测到 Ctrl+C，强制退出程序...")
-            sys.exit(0)
+            if active_monitor is not None:
+                active_monitor.loop.call_soon_threadsafe(active_monitor.stopping.set)
+            else:
+                sys.exit(0)
+
+def stop_signal_handler(signum, frame):
+    """后台运行时处理Ctrl+C和SIGTERM：结束监控并正常退出"""
+    logging.info(f"收到信号 {signum}，正在退出...")
+    if active_monitor is not None:
+        active_monitor.loop.call_soon_threadsafe(active_monitor.stopping.set)
+    else:
+        sys.exit(0)
 
 def handle_user_input():
     """处理用户输入的函数"""
@@ -1799,22 +5085,787 @@ def update_operation_time():
     last_operation_time = time.time()
     logging.debug(f"更新操作时间: {datetime.now().strftime('%H:%M:%S')}")  # 添加调试日志
 
+# ==================== 异步监控核心 ====================
+def describe_task_events(events, limit=5):
+    """把新增任务和数量增加的事件整理成提醒文本"""
+    added = [event.record for event in events if event.kind == "added"]
+    increased = [event for event in events if event.kind == "count_changed"]
+    parts = []
+    if added:
+        names = "、".join(str(record) for record in added[:limit])
+        parts.append(f"发现{len(added)}个新任务: {names}{'等' if len(added) > limit else ''}")
+    if increased:
+        changes = "、".join(f"{event.record.name} {event.previous_count}→{event.record.count}" for event in increased[:limit])
+        parts.append(f"任务数量增加: {changes}{'等' if len(increased) > limit else ''}")
+    return "；".join(parts) + "。请查看网站。"
+
+def report_tasks(tasks, events, is_first_check):
+    """显示本次检查到的任务，并根据任务差异事件决定是否提醒
+
+    首次检查之后只有新增任务或任务数量增加的事件才触发提醒，
+    任务消失、数量减少以及页面上与任务无关的文本变化只记录日志。
+    返回提醒内容字典（供dispatch_alert使用），不需要提醒时返回None
+    """
+    if not tasks:
+        # 使用info级别，始终显示任务状态
+        logging.info("未检测到任何任务或变化")
+        
+        # 如果启用了显示预期任务，即使未检测到变化也显示
+        if config.get("display_expected", False) and config.get("check_training", True):
+            logging.info("显示预期的Training Tasks列表:")
+            display_training_tasks_table(["Training Tasks\tEvaluation\tIncomplete Tests"] + 
+                                       [f"{task}\t{count}" for task, count in SPECIFIC_TASK_EXPECTED_COUNTS.items()])
+        return None
+    
+    # 检查是否为Training Tasks格式，如果是，以表格形式显示
+    has_training_format = False
+    for task in tasks:
+        if "Training Tasks\t" in task or any(task.startswith(specific) for specific in SPECIFIC_TRAINING_TASKS):
+            has_training_format = True
+            break
+            
+    if has_training_format:
+        display_training_tasks_table(tasks)
+    
+    # 首次检查之后，由任务差异事件决定是否有新任务
+    new_work_events = [event for event in events if event.is_new_work]
+    
+    if new_work_events and not is_first_check:
+        message = describe_task_events(new_work_events)
+        
+        # 打印任务信息
+        logging.info("\n检测到以下任务:")
+        for i, task in enumerate(tasks, 1):
+            # 跳过标题行
+            if "Training Tasks\tEvaluation\tIncomplete Tests" in task:
+                continue
+            logging.info(f"{i}. {task}")
+        return {"title": "Apple Baseline 任务提醒", "message": message}
+    
+    if is_first_check:
+        # 判断首次检查任务类型
+        if any("首次检查发现" in task for task in tasks):
+            # 如果是首次检查发现的Training Tasks，也显示通知
+            training_count = sum(1 for task in tasks if "Training任务:" in task)
+            logging.info(f"\n首次检查发现 {training_count} 个Training Tasks:")
+            task_messages = [task for task in tasks if "Training任务:" in task]
+            for i, task in enumerate(task_messages, 1):
+                logging.info(f"{i}. {task}")
+            return {
+                "title": "Apple Baseline Training Tasks",
+                "message": f"首次检查发现{training_count}个Training Tasks！请查看网站了解详情。",
+            }
+        elif len(tasks) == 1 and (
+           "检测到Eligible Tasks部分有内容" in tasks[0] or 
+           "检测到Eligible Tasks部分发生变化" in tasks[0] or
+           "检测到Training Tasks" in tasks[0]):
+            logging.info(f"首次检查：{tasks[0]}，将在下次检查时比较变化")
+        else:
+            # 过滤掉标题行后再计算数量
+            filtered_tasks = [task for task in tasks if "Training Tasks\tEvaluation\tIncomplete Tests" not in task]
+            logging.info(f"\n首次检查发现 {len(filtered_tasks)} 个任务:")
+            for i, task in enumerate(filtered_tasks, 1):
+                logging.info(f"{i}. {task}")
+    return None
+
+def dispatch_alert(alert):
+    """执行一次提醒：有标题时先发送桌面通知并打开浏览器，最后播放语音"""
+    if alert.get("title"):
+        # 先把通知交给各通知目标，确保桌面通知优先执行
+        notify(alert["title"], alert["message"], alert.get("account"))
+        # 短暂延迟确保通知显示
+        time.sleep(0.5)
+        # 打开浏览器新窗口
+        open_new_browser_window(alert.get("account"))
+    speak_voice(alert.get("voice"))
+
+# 当前运行的异步监控实例，供信号处理函数使用
+active_monitor = None
+
+class AsyncMonitor:
+    """基于asyncio的监控核心
+
+    每个账号有自己的轮询任务，提醒分发和操作台是独立的任务：页面抓取与解析交给线程池执行，
+    提醒和重新登录提示在各自的任务中进行，因此播放提醒或等待用户输入时轮询仍按计划进行
+    """
+
+    def __init__(self, accounts=None, daemon=False, control_port=0):
+        self.accounts = list(accounts or [default_account])
+        # 后台运行时不读取标准输入，也不弹出登录提示，通过控制接口操作
+        self.daemon = daemon
+        self.control_port = control_port
+        self.control_server = None
+        self.started = time.time()
+        self.closed = False
+        self.console_closed = False
+        self.pending_prompt = None
+        self.loop = None
+        # 每类阻塞操作使用独立的执行器，互不等待；各账号的请求可以同时进行
+        self.fetch_executor = ThreadPoolExecutor(max_workers=len(self.accounts), thread_name_prefix="baseline-fetch")
+        # 启用解析进程池时每个解析进程对应一个等待线程，否则在一个线程中依次解析
+        self.parse_executor = ThreadPoolExecutor(max_workers=parse_pool.size if parse_pool else 1,
+                                                 thread_name_prefix="baseline-parse")
+        self.alert_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="baseline-alert")
+        self.login_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="baseline-login")
+
+    async def run(self):
+        """启动各任务并运行到用户退出"""
+        global active_monitor
+        self.loop = asyncio.get_event_loop()
+        self.alert_queue = asyncio.Queue()
+        self.console_lines = asyncio.Queue()
+        self.resumed = asyncio.Event()
+        self.stopping = asyncio.Event()
+        # 同一时间只进行一个账号的重新登录，避免多个提示争用操作台
+        self.login_lock = asyncio.Lock()
+        for account in self.accounts:
+            account.check_now = asyncio.Event()
+        if monitoring_active:
+            self.resumed.set()
+        active_monitor = self
+        
+        if self.daemon:
+            self.console_closed = True
+        else:
+            # 标准输入只由这个线程读取，读到的行交给操作台任务处理
+            threading.Thread(target=self._read_console, name="baseline-console", daemon=True).start()
+        if self.control_port:
+            try:
+                self.serve_control(self.control_port)
+            except OSError as e:
+                logging.error(f"无法在端口 {self.control_port} 启动控制接口: {e}")
+        
+        workers = [self.loop.create_task(self.poll_loop(account)) for account in self.accounts]
+        workers += [self.loop.create_task(self.alert_worker()), self.loop.create_task(self.console_worker())]
+        try:
+            await self.stopping.wait()
+        finally:
+            active_monitor = None
+            if self.control_server is not None:
+                self.control_server.shutdown()
+                self.control_server.server_close()
+            workers += [account.relogin_task for account in self.accounts if account.relogin_task is not None]
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.close()
+
+    def close(self):
+        """释放线程池，正在等待操作台输入的登录流程随之返回"""
+        self.closed = True
+        for executor in (self.fetch_executor, self.parse_executor, self.alert_executor, self.login_executor):
+            executor.shutdown(wait=False)
+
+    def find_account(self, name):
+        """按名称查找账号，未指定名称且只有一个账号时返回该账号"""
+        if not name:
+            return self.accounts[0] if len(self.accounts) == 1 else None
+        for account in self.accounts:
+            if account.name == name:
+                return account
+        return None
+
+    # ---------- 轮询 ----------
+    async def poll_loop(self, account):
+        """按账号的随机间隔检查页面，抓取和解析不占用事件循环"""
+        while True:
+            await self.resumed.wait()
+            try:
+                # 检查操作是否超时
+                if check_operation_timeout():
+                    logging.warning("检测到操作超时，尝试恢复...")
+                    # 不播放语音，直接重试
+                
+                # 检查是否有任务
+                tasks, success = await self.check_once(account)
+                if metrics:
+                    metrics.increment("baseline_checks_total", account, result="success" if success else "failure")
+                    if config.get("metrics_file"):
+                        metrics.dump(config["metrics_file"])
+                
+                if not success:
+                    # 如果检查失败，可能是需要重新登录
+                    account.failed_attempts += 1
+                    message = f"{account.label}检查失败({account.failed_attempts}/3)，可能需要重新登录。请检查浏览器是否登录了Baseline。"
+                    logging.warning(message)
+                    
+                    if account.failed_attempts >= 3:
+                        account.failed_attempts = 0
+                        # 已有重新登录提示在等待时不再重复提醒
+                        if not self.relogin_pending(account):
+                            self.queue_voice("连续三次检查失败，请选择如何处理")
+                            self.request_relogin(account, "连续3次请求失败。")
+                    
+                    # 失败后按调度器的退避时间等待
+                    wait_time, reason = account.next_delay()
+                    logging.info(f"{account.label}等待 {wait_time:.2f} 秒后再次检查（{reason}）...")
+                    await self.sleep(account, wait_time)
+                    continue
+                
+                # 成功检查，重置失败计数
+                account.failed_attempts = 0
+                account.scheduler.record_success()
+                
+                alert = report_tasks(tasks, account.take_task_events(), account.is_first_check)
+                if alert and not account.is_first_check:
+                    # 记录检测到新任务的时间，用于学习任务经常出现的时段
+                    account.scheduler.record_detection()
+                if alert:
+                    if metrics:
+                        metrics.increment("baseline_alerts_total", account)
+                    # 提醒交给提醒任务处理，轮询不等待提醒结束
+                    alert["account"] = account
+                    if account is not default_account:
+                        alert["title"] = f"{alert['title']} - {account.name}"
+                    self.alert_queue.put_nowait(alert)
+                
+                # 第一次检查完成
+                account.is_first_check = False
+                
+                # 按调度器计算的时间等待后再次检查
+                interval, reason = account.next_delay()
+                # 保持为info级别，显示等待时间
+                logging.info(f"{account.label}下次检查将在 {interval:.2f} 秒后进行（{reason}）...")
+                await self.sleep(account, interval)
+                
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"{account.label}发生错误: {e}", exc_info=True)
+                self.queue_voice("检测到错误，请检查程序状态")  # 只在发生错误时提示
+                await self.sleep(account, MIN_CHECK_INTERVAL)
+
+    async def check_once(self, account):
+        """执行一次检查：在线程池中抓取页面，再交给解析线程处理"""
+        update_operation_time()  # 更新操作时间
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        logging.info(f"{account.label}{current_time} - 开始检查任务...")
+        
+        self.check_cookie_health(account)
+        started = time.time()
+        response, status = await self.loop.run_in_executor(self.fetch_executor, fetch_baseline_page, account)
+        if status == "login" and account.cookie_health.promote():
+            # 已提前准备好替换cookie，换上后立即重新请求，不必等待重新登录
+            logging.info(f"{account.label}换上提前准备的cookie后重新检查...")
+            response, status = await self.loop.run_in_executor(self.fetch_executor, fetch_baseline_page, account)
+        latency = time.time() - started
+        if status in ("error", "login", "no_cookies"):
+            account.scheduler.record_failure(response)
+            account.last_check = {"time": started, "status": status, "success": False}
+            if check_history:
+                check_history.record(account, status, False, latency, started)
+        
+        if status == "error":
+            # 失败已记录，不再交给解析线程（否则会再记录一次失败和一条检查历史）
+            return None, False
+        
+        if self.daemon and status in ("no_cookies", "login"):
+            # 后台运行时只提醒一次，等待通过控制接口重新加载cookie
+            self.request_relogin(account)
+            return None, False
+        
+        if status == "no_cookies":
+            logging.error(f"{account.label}没有可用的cookie，请重新获取")
+            self.queue_voice("没有可用的登录信息，请重新登录")
+            return None, False
+        
+        if status == "login":
+            # 如果使用的是临时浏览器会话cookie，在后台提示重新登录，轮询继续
+            if account.browser == 'manual_clean':
+                if not self.relogin_pending(account):
+                    logging.info(f"{account.label}尝试重新打开临时浏览器会话获取新cookie...")
+                    self.request_relogin(account)
+            else:
+                self.queue_voice("登录已失效，请重新登录")  # 只在确认cookie失效时播放语音
+            return None, False
+        
+        tasks, success = await self.loop.run_in_executor(self.parse_executor, tasks_from_response, response, status, account)
+        if not success:
+            account.scheduler.record_failure(response)
+        account.last_check = {"time": started, "status": status, "success": success}
+        if check_history:
+            check_history.record(account, status, success, latency, started)
+        return tasks, success
+
+    async def sleep(self, account, seconds):
+        """等待到账号的下次检查，收到立即检查请求时提前结束"""
+        try:
+            await asyncio.wait_for(account.check_now.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        account.check_now.clear()
+
+    # ---------- 提醒 ----------
+    def queue_voice(self, message):
+        """排队一条只有语音的提醒"""
+        self.alert_queue.put_nowait({"voice": message})
+
+    async def alert_worker(self):
+        """按顺序执行排队的提醒，通知和语音播放在线程池中进行"""
+        while True:
+            alert = await self.alert_queue.get()
+            try:
+                start = time.perf_counter()
+                await self.loop.run_in_executor(self.alert_executor, dispatch_alert, alert)
+                if metrics:
+                    metrics.observe("alert", time.perf_counter() - start)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"发送提醒失败: {e}")
+
+    # ---------- 操作台 ----------
+    def _read_console(self):
+        """在后台线程中读取标准输入，读到的行转交给事件循环"""
+        while True:
+            try:
+                line = input()
+            except (EOFError, OSError, ValueError):
+                line = None
+            try:
+                self.loop.call_soon_threadsafe(self.console_lines.put_nowait, line)
+            except RuntimeError:
+                # 事件循环已关闭
+                return
+            if line is None:
+                return
+
+    async def console_worker(self):
+        """处理操作台输入：有提示在等待时作为回答，否则作为命令"""
+        while True:
+            line = await self.console_lines.get()
+            if line is None:
+                logging.info("标准输入已关闭，操作台不再接收命令")
+                self.console_closed = True
+                if self.pending_prompt is not None and not self.pending_prompt.done():
+                    self.pending_prompt.set_result("")
+                return
+            if self.pending_prompt is not None and not self.pending_prompt.done():
+                self.pending_prompt.set_result(line)
+                continue
+            self.handle_command(line.strip())
+
+    def handle_command(self, line):
+        """执行操作台命令"""
+        if not line:
+            return
+        command, _, argument = line.partition(" ")
+        command = command.lower()
+        if command in ['r', 'restart', 'resume']:
+            self.resume()
+        elif command in ['p', 'pause']:
+            self.pause()
+        elif command in ['l', 'login']:
+            account = self.find_account(argument.strip())
+            if account is None:
+                print(f"请指定账号: l <账号名称>，可用账号: {', '.join(a.name for a in self.accounts)}")
+            else:
+                self.request_relogin(account, "")
+        elif command in ['q', 'quit', 'exit']:
+            logging.info("用户选择退出程序...")
+            self.stopping.set()
+        else:
+            print("可用命令: p 暂停监控, r 恢复监控, l [账号名称] 重新获取cookie, q 退出程序")
+
+    def pause(self):
+        """暂停轮询，提醒和操作台不受影响"""
+        global monitoring_active
+        if monitoring_active:
+            logging.info("暂停监控...")
+        monitoring_active = False
+        self.resumed.clear()
+
+    def resume(self):
+        """恢复轮询"""
+        global monitoring_active
+        if not monitoring_active:
+            logging.info("恢复监控...")
+        monitoring_active = True
+        self.resumed.set()
+
+    async def ask(self, prompt):
+        """显示提示并等待操作台的下一行输入，标准输入已关闭时返回空字符串"""
+        print(prompt, end="", flush=True)
+        if self.console_closed:
+            return ""
+        self.pending_prompt = self.loop.create_future()
+        try:
+            return await self.pending_prompt
+        finally:
+            self.pending_prompt = None
+
+    def console_prompt(self, prompt):
+        """ask的同步版本，供线程池中运行的登录流程读取输入"""
+        future = asyncio.run_coroutine_threadsafe(self.ask(prompt), self.loop)
+        while not self.closed:
+            try:
+                return future.result(timeout=0.5)
+            except concurrent.futures.TimeoutError:
+                continue
+            except concurrent.futures.CancelledError:
+                break
+        return ""
+
+    def check_cookie_health(self, account):
+        """必要cookie即将过期时提醒一次并在后台提前获取替换cookie，已过期时换上暂存的cookie"""
+        health = account.cookie_health
+        if health.staged is not None:
+            if health.expired():
+                logging.info(f"{account.label}cookie已过期，换上提前准备的cookie")
+                health.promote()
+            return
+        remaining = health.expiring(config.get("cookie_warn_before"))
+        if remaining is None:
+            return
+        expiry_text = datetime.fromtimestamp(health.expiry()).strftime('%Y-%m-%d %H:%M:%S')
+        logging.warning(f"{account.label}cookie将于 {expiry_text} 过期（剩余 {max(0, remaining) / 3600:.1f} 小时）")
+        notify("Apple Baseline cookie即将过期", f"{account.name} 的cookie将于 {expiry_text} 过期", account)
+        if not self.daemon:
+            self.request_relogin(account, f"cookie将于 {expiry_text} 过期，可以提前获取新cookie，当前cookie在过期前继续使用。",
+                                 stage=True)
+
+    # ---------- 控制接口 ----------
+    def status(self):
+        """监控状态：是否暂停以及各账号最近一次检查的结果"""
+        now = time.time()
+        accounts = []
+        for account in self.accounts:
+            try:
+                cookie_age = round(now - os.path.getmtime(account.cookie_file))
+            except OSError:
+                cookie_age = None
+            last_check = dict(account.last_check) if account.last_check else None
+            if last_check:
+                last_check["time"] = _format_ts(last_check["time"])
+            accounts.append({
+                "name": account.name,
+                "cookie_source": account.browser,
+                "cookie_age_seconds": cookie_age,
+                "cookie_expires": _format_ts(account.cookie_health.expiry()) if account.cookie_health.expiry() else None,
+                "cookie_staged": account.cookie_health.staged is not None,
+                "needs_cookie": account.needs_cookie,
+                "relogin_pending": self.relogin_pending(account),
+                "failed_attempts": account.failed_attempts,
+                "last_check": last_check,
+                "tasks": [str(record) for records in account.previous_task_records.values() for record in records.values()],
+            })
+        return {"paused": not monitoring_active, "uptime_seconds": round(now - self.started), "accounts": accounts}
+
+    def stats(self):
+        """连接复用、条件请求和页面指纹快速路径的统计"""
+        return {
+            "fingerprint": dict(fingerprint_stats),
+            "accounts": [
+                dict(account.session.stats, name=account.name, reuse_rate=round(account.session.reuse_rate(), 3),
+                     last_timings=account.session.last_timings)
+                for account in self.accounts
+            ],
+            "parse_workers": parse_pool.stats() if parse_pool else None,
+        }
+
+    def force_check(self, name=None):
+        """立即检查指定账号（未指定时所有账号），暂停时恢复后才会执行"""
+        accounts = [self.find_account(name)] if name else self.accounts
+        if None in accounts:
+            raise KeyError(name)
+        for account in accounts:
+            account.check_now.set()
+        return [account.name for account in accounts]
+
+    async def reload_cookies(self, name=None):
+        """从cookie缓存文件重新加载指定账号（未指定时所有账号）的cookies，成功的账号立即检查"""
+        accounts = [self.find_account(name)] if name else self.accounts
+        if None in accounts:
+            raise KeyError(name)
+        results = {}
+        for account in accounts:
+            loaded = await self.loop.run_in_executor(self.login_executor, load_cookies_from_file, account)
+            if loaded:
+                account.needs_cookie = False
+                account.failed_attempts = 0
+                account.check_now.set()
+            results[account.name] = loaded
+        return results
+
+    async def handle_control(self, method, action, name):
+        """执行控制接口请求，返回(HTTP状态码, 结果)"""
+        if method == "GET" and action == "status":
+            return 200, self.status()
+        if method == "GET" and action == "stats":
+            return 200, self.stats()
+        if method != "POST":
+            return 404, {"error": f"未知的请求: {method} /{action}"}
+        try:
+            if action == "pause":
+                self.pause()
+            elif action == "resume":
+                self.resume()
+            elif action == "check":
+                return 200, {"checking": self.force_check(name), "paused": not monitoring_active}
+            elif action == "reload-cookies":
+                return 200, {"reloaded": await self.reload_cookies(name)}
+            elif action == "quit":
+                logging.info("通过控制接口退出程序...")
+                self.stopping.set()
+            else:
+                return 404, {"error": f"未知的命令: {action}"}
+        except KeyError:
+            return 404, {"error": f"没有账号: {name}"}
+        return 200, {"paused": not monitoring_active}
+
+    def serve_control(self, port):
+        """在本机端口上提供HTTP控制接口，请求交给事件循环处理"""
+        monitor = self
+
+        class ControlHandler(http.server.BaseHTTPRequestHandler):
+            def _handle(self, method):
+                path, _, query = self.path.partition("?")
+                name = dict(item.partition("=")[::2] for item in query.split("&") if item).get("account")
+                future = asyncio.run_coroutine_threadsafe(
+                    monitor.handle_control(method, path.strip("/"), name), monitor.loop)
+                try:
+                    code, result = future.result(timeout=30)
+                except Exception as e:
+                    code, result = 500, {"error": str(e)}
+                body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, format, *args):
+                logging.debug(f"控制接口请求: {format % args}")
+
+        self.control_server = http.server.ThreadingHTTPServer(("127.0.0.1", port), ControlHandler)
+        self.control_server.daemon_threads = True
+        threading.Thread(target=self.control_server.serve_forever, name="baseline-control", daemon=True).start()
+        logging.info(f"控制接口: http://127.0.0.1:{self.control_server.server_port}/ (GET status/stats, POST pause/resume/check/reload-cookies/quit)")
+
+    # ---------- 重新登录 ----------
+    def relogin_pending(self, account):
+        """账号是否有重新登录流程正在进行或排队"""
+        return account.relogin_task is not None and not account.relogin_task.done()
+
+    def request_relogin(self, account, reason=None, stage=False):
+        """在独立任务中启动账号的重新登录流程
+
+        reason为None时直接打开临时浏览器，否则先让用户选择获取cookie的方式；
+        stage为True时获取的cookie先暂存，当前cookie过期或失效时再换上
+        """
+        if self.relogin_pending(account):
+            return
+        if self.daemon:
+            # 后台运行时没有人回答提示
+            mark_needs_cookie(account)
+            return
+        if metrics:
+            metrics.increment("baseline_relogins_total", account)
+        account.relogin_task = self.loop.create_task(self.relogin(account, reason, stage))
+
+    async def relogin(self, account, reason, stage=False):
+        """重新获取账号的cookie，等待用户输入期间轮询照常进行"""
+        # 直接打开浏览器的流程在失败时需要语音提示用户
+        voice_on_failure = reason is None
+        async with self.login_lock:
+            try:
+                if account is not default_account:
+                    print(f"\n===== 账号 {account.name} 需要重新登录 =====")
+                choice = "1"
+                if reason is not None:
+                    choice = (await self.ask(f"\n{reason}请选择:\n1. 重新打开临时浏览器获取新cookie\n2. 手动输入新cookie\n3. 继续尝试使用当前cookie\n请输入选择(1/2/3): ")).strip()
+                
+                if choice == "1":
+                    # 重新启动临时浏览器获取新cookie
+                    cookie_str = await self.loop.run_in_executor(
+                        self.login_executor, open_clean_browser_for_login, self.console_prompt)
+                    browser = 'manual_clean'
+                elif choice == "2":
+                    # 手动输入新cookie
+                    print("\n请从浏览器中获取cookie:")
+                    print("1. 按F12打开开发者工具")
+                    print("2. 切换到'网络'(Network)标签")
+                    print("3. 刷新页面")
+                    print("4. 找到对baseline.apple.com的请求")
+                    print("5. 在请求头中找到并复制完整的Cookie值")
+                    cookie_str = await self.ask("请粘贴Cookie字符串: ")
+                    browser = 'manual'
+                else:
+                    # 第3个选项不需要操作，继续使用当前cookie
+                    return
+                
+                if not cookie_str or not cookie_str.strip():
+                    logging.warning(f"{account.label}未能获取新的cookies，将继续使用当前cookie")
+                    if voice_on_failure:
+                        self.queue_voice("无法获取登录信息，请重新登录")
+                    return
+                
+                cookie_jar = create_cookie_jar_from_string(cookie_str)
+                if not cookie_jar:
+                    logging.warning("无法创建cookie jar，cookie字符串可能无效")
+                    if voice_on_failure:
+                        self.queue_voice("登录信息无效，请重新登录")
+                    return
+                
+                if stage and not (account.failed_attempts or account.cookie_health.expired()):
+                    account.cookie_health.stage(cookie_jar, browser)
+                    logging.info(f"{account.label}已准备好新cookie，当前cookie过期或失效时自动换上")
+                    return
+                
+                # 更新账号会话中的cookies
+                replace_session_cookies(cookie_jar, account)
+                account.browser = browser
+                # 保存新cookies到账号的缓存文件
+                save_cookies_to_file(cookie_jar, account)
+                logging.info(f"{account.label}成功获取新cookies并保存到文件，立即重新检查...")
+                account.failed_attempts = 0
+                account.check_now.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"重试过程中出错: {e}")
+
+def check_once_headless(account=None):
+    """用缓存的cookie检查一次页面并输出找到的任务，不提示登录、不发送提醒，也不改动保存的比较基准
+
+    返回检查是否成功
+    """
+    account = account or default_account
+    account.state_store = BaselineStateStore(None)
+    if not load_cookies_from_file(account):
+        print("没有可用的cookie缓存，请先正常启动一次完成登录")
+        return False
+    response, status = fetch_baseline_page(account)
+    if status == "login":
+        print("cookie已失效，请重新登录")
+        return False
+    tasks, success = tasks_from_response(response, status, account)
+    if not success:
+        print(f"检查失败（{status}）")
+        return False
+    task_records = [record for records in account.previous_task_records.values() for record in records.values()]
+    if not task_records:
+        print("未检测到任务")
+    for record in task_records:
+        print(f"[{record.section}] {record}")
+    return True
+
+def prepare_account_cookies(account):
+    """启动时为账号准备有效的cookies：优先使用缓存文件，无效时打开临时浏览器重新登录"""
+    # 尝试从文件加载cookies
+    cookies_loaded = load_cookies_from_file(account)
+    
+    if not cookies_loaded:
+        print("未找到有效的cookie缓存，正在启动临时浏览器会话供您登录...")
+        # 使用临时浏览器会话登录
+        logging.info("启动临时浏览器会话登录")
+        cookie_str = open_clean_browser_for_login()
+        if cookie_str and isinstance(cookie_str, str) and len(cookie_str.strip()) > 10:
+            cookie_jar = create_cookie_jar_from_string(cookie_str)
+            if cookie_jar and isinstance(cookie_jar, requests.cookies.RequestsCookieJar) and len(cookie_jar) > 0:
+                # 更新账号会话中的cookies
+                replace_session_cookies(cookie_jar, account)
+                account.browser = 'manual_clean'
+                logging.info("成功获取cookies")
+                # 保存cookies到文件
+                save_result = save_cookies_to_file(cookie_jar, account)
+                if save_result:
+                    print("已成功获取并保存cookie")
+                else:
+                    print("已获取cookie但保存失败，程序将继续但不会缓存cookie")
+            else:
+                logging.error("无法创建cookie jar，cookie字符串可能无效")
+                print("错误: cookie格式无效，无法继续。")
+                return False
+        else:
+            logging.error("未能获取有效的cookies，无法继续")
+            print("错误: 未能获取有效的cookies，程序无法继续。")
+            return False
+    else:
+        print(f"已从缓存文件加载之前保存的cookies")
+        
+        # 验证加载的cookie是否有效
+        logging.info("正在验证已加载的cookie是否有效...")
+        try:
+            test_tasks, test_success = check_baseline_tasks(account)
+            if not test_success:
+                logging.warning("加载的cookie已失效，需要重新获取")
+                print("加载的cookie已失效，需要重新获取新的cookie...")
+                
+                # 使用临时浏览器会话重新登录
+                cookie_str = open_clean_browser_for_login()
+                if cookie_str:
+                    cookie_jar = create_cookie_jar_from_string(cookie_str)
+                    if cookie_jar and isinstance(cookie_jar, requests.cookies.RequestsCookieJar) and len(cookie_jar) > 0:
+                        # 更新账号会话中的cookies
+                        replace_session_cookies(cookie_jar, account)
+                        account.browser = 'manual_clean'
+                        logging.info("成功获取新cookies")
+                        # 保存cookies到文件
+                        save_cookies_to_file(cookie_jar, account)
+                        print("已成功获取并保存新cookie")
+                    else:
+                        logging.error("无法创建cookie jar，cookie字符串可能无效")
+                        print("错误: cookie格式无效，无法继续。")
+                        return False
+                else:
+                    logging.error("未能获取有效的cookies，无法继续")
+                    print("错误: 未能获取有效的cookies，程序无法继续。")
+                    return False
+            else:
+                logging.info("已验证cookie有效")
+        except Exception as e:
+            logging.error(f"验证cookie时出错: {e}")
+            print("验证cookie时出错，需要重新获取新的cookie...")
+            
+            # 使用临时浏览器会话重新登录
+            cookie_str = open_clean_browser_for_login()
+            if cookie_str:
+                cookie_jar = create_cookie_jar_from_string(cookie_str)
+                if cookie_jar and isinstance(cookie_jar, requests.cookies.RequestsCookieJar) and len(cookie_jar) > 0:
+                    # 更新账号会话中的cookies
+                    replace_session_cookies(cookie_jar, account)
+                    account.browser = 'manual_clean'
+                    logging.info("成功获取新cookies")
+                    # 保存cookies到文件
+                    save_cookies_to_file(cookie_jar, account)
+                    print("已成功获取并保存新cookie")
+                else:
+                    logging.error("无法创建cookie jar，cookie字符串可能无效")
+                    print("错误: cookie格式无效，无法继续。")
+                    return False
+            else:
+                logging.error("未能获取有效的cookies，无法继续")
+                print("错误: 未能获取有效的cookies，程序无法继续。")
+                return False
+    
+    return True
+
 def main():
-    global MIN_CHECK_INTERVAL, MAX_CHECK_INTERVAL, config, previous_eligible_section_html, previous_eligible_section_hash
-    global recent_cookies, recent_browser, previous_training_section_hash, previous_eligible_task_texts
-    global previous_training_task_texts, monitoring_active, operation_timeout
+    global MIN_CHECK_INTERVAL, MAX_CHECK_INTERVAL, config, monitoring_active, operation_timeout, check_history, metrics, notification_dispatcher, parse_pool
     
     # 增加操作超时时间到60秒
     operation_timeout = 60  # 操作超时时间（秒）
     
-    # 设置信号处理
-    signal.signal(signal.SIGINT, signal_handler)
-    
     # 解析命令行参数
     args = parse_arguments()
     
+    # 设置信号处理：交互运行时Ctrl+C暂停监控，后台运行时Ctrl+C和SIGTERM直接正常退出
+    if args.daemon:
+        signal.signal(signal.SIGINT, stop_signal_handler)
+        signal.signal(signal.SIGTERM, stop_signal_handler)
+    else:
+        signal.signal(signal.SIGINT, signal_handler)
+    
     # 更新配置
     config["debug"] = args.debug
+    config["daemon"] = args.daemon
     config["no_voice"] = args.no_voice
     config["quiet"] = args.quiet
     config["test_alert"] = args.test_alert
@@ -1822,11 +5873,45 @@ def main():
     config["only_eligible"] = args.only_eligible
     config["display_expected"] = args.display_expected
     config["mp3_voice_file"] = args.mp3_voice_file
+    config["fingerprint_rules"] = args.fingerprint_rules
+    config["extraction_profile"] = args.extraction_profile
+    config["stream"] = args.stream
+    config["stream_chunk"] = max(1024, args.stream_chunk)
+    config["parser"] = args.parser
+    config["hourly_budget"] = max(0, args.hourly_budget)
+    config["state_max_age"] = max(0, args.state_max_age)
+    config["cookie_warn_before"] = max(0, args.cookie_warn_before)
+    config["snapshot_dir"] = args.snapshot_dir
+    config["snapshot_ring"] = max(1, args.snapshot_ring)
+    config["metrics_file"] = args.metrics_file
+    poll_bounds = parse_interval(args.poll_bounds)
+    if poll_bounds and poll_bounds[0] <= poll_bounds[1]:
+        config["poll_bounds"] = poll_bounds
+    else:
+        logging.warning(f"无效的间隔上下限: {args.poll_bounds}，使用默认值")
+    
+    # 编译任务文本匹配器
+    build_task_text_matcher()
+    
+    # 编译整页指纹的规范化规则
+    if config["fingerprint_rules"]:
+        load_normalization_rules(config["fingerprint_rules"])
+    else:
+        compile_normalization_rules()
+    
+    # 加载提取规则，流式读取需要其中的container选择器作为锚点
+    if config["extraction_profile"]:
+        load_extraction_profile(config["extraction_profile"])
+    if config["stream"] and stream_anchors() is None:
+        logging.warning("流式读取需要在提取规则中为每个检查的部分配置不含文本条件的container选择器，暂时完整下载页面")
     
     # 检查MP3文件是否存在
     mp3_file = config.get("mp3_voice_file", "baseline_voice.mp3")
     if os.path.exists(mp3_file):
         logging.info(f"已设置MP3语音提醒文件: {mp3_file}")
+        # 在后台预先初始化音频并解码语音文件，第一次提醒不再等待
+        if not config["no_voice"]:
+            audio_service.preload(mp3_file)
     else:
         logging.warning(f"找不到MP3语音文件: {mp3_file}，将无法播放语音提醒")
     
@@ -1848,18 +5933,68 @@ def main():
         logging.getLogger().setLevel(logging.DEBUG)
         logging.info("已启用调试模式")
     
+    # 查询检查历史后退出
+    if args.history:
+        query_check_history(args.history_db or CHECK_HISTORY_DB, args.history[0], " ".join(args.history[1:]) or None)
+        return
+    
+    # 确定HTML解析后端
+    backend = resolve_parser_backend(config["parser"])
+    logging.info(f"使用HTML解析后端: {backend}")
+    
+    # 验证各解析后端结果一致后退出
+    if args.verify_parsers:
+        all_match = verify_parser_backends(args.verify_parsers, args.bless)
+        print("所有解析后端结果一致" if all_match else "解析后端结果存在差异")
+        sys.exit(0 if all_match else 1)
+    
+    # 运行webhook测试服务，用于离线测试webhook通知目标
+    if args.webhook_receiver is not None:
+        run_webhook_receiver(args.webhook_receiver)
+        return
+    
+    # 回放保存的页面，报告耗时和检测正确性后退出
+    if args.replay:
+        all_correct = replay_recorded_pages(args.replay, args.replay_repeat)
+        print("所有标注页面检测正确" if all_correct else "存在与标注不符的页面")
+        sys.exit(0 if all_correct else 1)
+    
+    # 无界面检查一次后退出，不提示登录、不播放提醒
+    if args.check_once:
+        sys.exit(0 if check_once_headless() else 1)
+    
     # 解析检查间隔
     if "-" in args.interval:
-        try:
-            min_val, max_val = map(int, args.interval.split("-"))
-            MIN_CHECK_INTERVAL = min_val
-            MAX_CHECK_INTERVAL = max_val
-        except ValueError:
+        interval = parse_interval(args.interval)
+        if interval:
+            MIN_CHECK_INTERVAL, MAX_CHECK_INTERVAL = interval
+        else:
             logging.warning(f"无效的间隔格式: {args.interval}，使用默认值")
     
+    # 加载账号列表，未指定账号文件时只监控默认账号
+    accounts = [default_account]
+    if args.accounts:
+        try:
+            accounts = load_accounts(args.accounts)
+        except Exception as e:
+            logging.error(f"加载账号文件失败: {e}")
+            print(f"错误: 无法加载账号文件 {args.accounts}，程序无法继续。")
+            return
+        logging.info(f"已加载 {len(accounts)} 个账号: {', '.join(account.name for account in accounts)}")
+    
     logging.info("Apple Baseline任务监控工具启动")
     logging.info(f"将每 {MIN_CHECK_INTERVAL}-{MAX_CHECK_INTERVAL} 秒检查一次是否有新任务")
     
+    # 创建通知目标，各目标在自己的线程中发送，互不等待
+    try:
+        notification_dispatcher = NotificationDispatcher(
+            [create_notification_sink(spec, args.notify_timeout, max(0, args.notify_retries))
+             for spec in (args.notify or ["desktop"])])
+    except ValueError as e:
+        logging.error(str(e))
+        print(f"错误: {e}，可用的通知目标: desktop、console、file=路径、webhook=URL")
+        return
+    
     # 如果启用了测试提醒模式，立即测试提醒功能
     if config.get("test_alert", False):
         logging.info("正在测试提醒功能...")
@@ -1869,7 +6004,7 @@ def main():
         
         # 测试所有三种提醒方式
         # 1. 发送桌面通知
-        send_notification(
+        notify(
             "Apple Baseline 任务提醒测试",
             "这是一个测试通知，确认提醒功能正常工作。"
         )
@@ -1888,7 +6023,7 @@ def main():
         logging.info("2. 是否看到浏览器自动打开")
         logging.info("3. 是否听到MP3语音提醒")
         
-        choice = input("\n测试完成后，您想要继续监控吗？(y/n): ")
+        choice = "y" if args.daemon else input("\n测试完成后，您想要继续监控吗？(y/n): ")
         if choice.lower() != 'y':
             logging.info("测试完成，程序退出")
             return
@@ -1899,332 +6034,76 @@ def main():
     print("\nApple Baseline任务监控工具")
     print("=" * 50)
     
-    # 尝试从文件加载cookies
-    cookies_loaded = load_cookies_from_file()
+    # 先恢复保存的比较基准，启动时验证cookie的那次检查就与重启前的基准比较，
+    # 重启期间出现的任务会在第一次轮询时提醒
+    restored_accounts = [account for account in accounts if account.restore_state()]
     
-    if not cookies_loaded:
-        print("未找到有效的cookie缓存，正在启动临时浏览器会话供您登录...")
-        # 使用临时浏览器会话登录
-        logging.info("启动临时浏览器会话登录")
-        cookie_str = open_clean_browser_for_login()
-        if cookie_str and isinstance(cookie_str, str) and len(cookie_str.strip()) > 10:
-            cookie_jar = create_cookie_jar_from_string(cookie_str)
-            if cookie_jar and isinstance(cookie_jar, requests.cookies.RequestsCookieJar) and len(cookie_jar) > 0:
-                # 更新全局变量
-                recent_cookies = cookie_jar
-                recent_browser = 'manual_clean'
-                logging.info("成功获取cookies")
-                # 保存cookies到文件
-                save_result = save_cookies_to_file(cookie_jar)
-                if save_result:
-                    print("已成功获取并保存cookie")
-                else:
-                    print("已获取cookie但保存失败，程序将继续但不会缓存cookie")
-            else:
-                logging.error("无法创建cookie jar，cookie字符串可能无效")
-                print("错误: cookie格式无效，无法继续。")
-                return
-        else:
-            logging.error("未能获取有效的cookies，无法继续")
-            print("错误: 未能获取有效的cookies，程序无法继续。")
-            return
+    if args.daemon:
+        # 后台运行时只使用缓存的cookie；加载失败的账号等待通过控制接口重新加载
+        for account in accounts:
+            if not load_cookies_from_file(account):
+                account.needs_cookie = True
+                logging.error(f"{account.label}无法加载缓存的cookie，请更新 {account.cookie_file} 后调用控制接口 reload-cookies")
     else:
-        print(f"已从缓存文件加载之前保存的cookies")
-        
-        # 验证加载的cookie是否有效
-        logging.info("正在验证已加载的cookie是否有效...")
-        try:
-            test_tasks, test_success = check_baseline_tasks()
-            if not test_success:
-                logging.warning("加载的cookie已失效，需要重新获取")
-                print("加载的cookie已失效，需要重新获取新的cookie...")
-                
-                # 使用临时浏览器会话重新登录
-                cookie_str = open_clean_browser_for_login()
-                if cookie_str:
-                    cookie_jar = create_cookie_jar_from_string(cookie_str)
-                    if cookie_jar and isinstance(cookie_jar, requests.cookies.RequestsCookieJar) and len(cookie_jar) > 0:
-                        # 更新全局变量
-                        recent_cookies = cookie_jar
-                        recent_browser = 'manual_clean'
-                        logging.info("成功获取新cookies")
-                        # 保存cookies到文件
-                        save_cookies_to_file(cookie_jar)
-                        print("已成功获取并保存新cookie")
-                    else:
-                        logging.error("无法创建cookie jar，cookie字符串可能无效")
-                        print("错误: cookie格式无效，无法继续。")
-                        return
-                else:
-                    logging.error("未能获取有效的cookies，无法继续")
-                    print("错误: 未能获取有效的cookies，程序无法继续。")
-                    return
-            else:
-                logging.info("已验证cookie有效")
-        except Exception as e:
-            logging.error(f"验证cookie时出错: {e}")
-            print("验证cookie时出错，需要重新获取新的cookie...")
-            
-            # 使用临时浏览器会话重新登录
-            cookie_str = open_clean_browser_for_login()
-            if cookie_str:
-                cookie_jar = create_cookie_jar_from_string(cookie_str)
-                if cookie_jar and isinstance(cookie_jar, requests.cookies.RequestsCookieJar) and len(cookie_jar) > 0:
-                    # 更新全局变量
-                    recent_cookies = cookie_jar
-                    recent_browser = 'manual_clean'
-                    logging.info("成功获取新cookies")
-                    # 保存cookies到文件
-                    save_cookies_to_file(cookie_jar)
-                    print("已成功获取并保存新cookie")
-                else:
-                    logging.error("无法创建cookie jar，cookie字符串可能无效")
-                    print("错误: cookie格式无效，无法继续。")
-                    return
-            else:
-                logging.error("未能获取有效的cookies，无法继续")
-                print("错误: 未能获取有效的cookies，程序无法继续。")
+        for account in accounts:
+            if account is not default_account:
+                print(f"\n===== 账号 {account.name} =====")
+            if not prepare_account_cookies(account):
                 return
     
-    print("\n已成功获取cookies，开始监控任务...")
+        print("\n已成功获取cookies，开始监控任务...")
     
-    # 执行一次初始检查，用于获取初始状态，不触发提醒
-    logging.info("执行初始检查获取基准状态...")
-    try:
-        initial_tasks, initial_success = check_baseline_tasks()
-        if not initial_success:
-            logging.warning("初始检查失败，可能需要重新登录")
-            logging.info("将在下次检查时重试")
-        else:
-            logging.info("初始检查完成，已获取基准状态")
-    except Exception as e:
-        logging.error(f"初始检查时出错: {e}")
-        logging.info("将在正常检查循环中重试")
+    # 执行一次初始检查，用于获取初始状态，不触发提醒；已恢复保存的比较基准或没有cookie时跳过
+    for account in accounts:
+        if account in restored_accounts or account.needs_cookie:
+            continue
+        logging.info(f"{account.label}执行初始检查获取基准状态...")
+        try:
+            initial_tasks, initial_success = check_baseline_tasks(account)
+            if not initial_success:
+                logging.warning(f"{account.label}初始检查失败，可能需要重新登录")
+                logging.info("将在下次检查时重试")
+            else:
+                logging.info(f"{account.label}初始检查完成，已获取基准状态")
+        except Exception as e:
+            logging.error(f"{account.label}初始检查时出错: {e}")
+            logging.info("将在正常检查循环中重试")
     
     # 重置比较数据，使用初始检查的结果作为基准
-    # 现在保留previous_eligible_section_html和previous_eligible_section_hash的值
+    # 现在保留previous_eligible_section_hash的值
     
-    # 存储上一次检测到的任务
-    previous_tasks = []
-    is_first_check = True  # 仍然设为True以便正确处理首次检查的消息显示
-    failed_attempts = 0
-    check_count = 0
+    # 记录检查历史，数据库打不开时只记录警告，不影响监控
+    if args.history_db:
+        try:
+            check_history = CheckHistory(args.history_db)
+            check_history.start()
+        except Exception as e:
+            logging.warning(f"无法打开检查历史数据库 {args.history_db}: {e}")
+            check_history = None
     
-    try:
-        while True:
-            if not monitoring_active:
-                time.sleep(0.1)  # 暂停时降低CPU使用
-                continue
-                
+    # 收集各阶段耗时和检查结果指标，页面处理阶段的耗时来自stage_timer
+    if args.metrics_port or args.metrics_file:
+        metrics = MonitorMetrics(accounts)
+        stage_timer.listeners.append(metrics.observe)
+        stage_timer.enabled = True
+        if args.metrics_port:
             try:
-                # 检查操作是否超时
-                if check_operation_timeout():
-                    logging.warning("检测到操作超时，尝试恢复...")
-                    # 不播放语音，直接重试
-                
-                # 每50次检查，清理一次旧文件
-                check_count += 1
-                if check_count >= 50:
-                    logging.info("执行定期清理...")
-                    clean_old_files("page_content_*.html", 3)  # 保留最新的3个完整页面
-                    clean_old_files("eligible_tasks_*.html", 5)  # 保留最新的5个Eligible Tasks部分
-                    clean_old_files("training_tasks_*.html", 5)  # 保留最新的5个Training Tasks部分
-                    check_count = 0
-                
-                # 检查是否有任务
-                tasks, success = check_baseline_tasks()
-                
-                if not success:
-                    # 如果检查失败，可能是需要重新登录
-                    failed_attempts += 1
-                    message = f"检查失败({failed_attempts}/3)，可能需要重新登录。请检查浏览器是否登录了Baseline。"
-                    logging.warning(message)
-                    
-                    if failed_attempts >= 3:
-                        failed_attempts = 0
-                        # 在连续失败3次时播放语音提醒，不管原因是什么
-                        speak_voice("连续三次检查失败，请选择如何处理")
-                        
-                        # 询问用户是否要尝试重新获取cookie
-                        try:
-                            retry_choice = input("\n连续3次请求失败。请选择:\n1. 重新打开临时浏览器获取新cookie\n2. 手动输入新cookie\n3. 继续尝试使用当前cookie\n请输入选择(1/2/3): ")
-                            
-                            if retry_choice == "1":
-                                # 重新启动临时浏览器获取新cookie
-                                cookie_str = open_clean_browser_for_login()
-                                if cookie_str:
-                                    cookie_jar = create_cookie_jar_from_string(cookie_str)
-                                    if cookie_jar:
-                                        # 更新全局变量
-                                        recent_cookies = cookie_jar
-                                        recent_browser = 'manual_clean'
-                                        # 保存新cookies到文件
-                                        save_cookies_to_file(cookie_jar)
-                                        logging.info("成功从临时浏览器会话获取新cookies并保存到文件")
-                                    else:
-                                        logging.warning("无法创建cookie jar，cookie字符串可能无效")
-                                else:
-                                    logging.warning("未能获取新的cookies")
-                            elif retry_choice == "2":
-                                # 手动输入新cookie
-                                print("\n请从浏览器中获取cookie:")
-                                print("1. 按F12打开开发者工具")
-                                print("2. 切换到'网络'(Network)标签")
-                                print("3. 刷新页面")
-                                print("4. 找到对baseline.apple.com的请求")
-                                print("5. 在请求头中找到并复制完整的Cookie值")
-                                
-                                cookie_str = input("请粘贴Cookie字符串: ")
-                                if cookie_str:
-                                    cookie_jar = create_cookie_jar_from_string(cookie_str)
-                                    if cookie_jar:
-                                        # 更新全局变量
-                                        recent_cookies = cookie_jar
-                                        recent_browser = 'manual'
-                                        # 保存新cookies到文件
-                                        save_cookies_to_file(cookie_jar)
-                                        logging.info("成功设置新的手动输入cookies并保存到文件")
-                                    else:
-                                        logging.warning("无法创建cookie jar，cookie字符串可能无效")
-                                else:
-                                    logging.warning("未输入cookie，将继续使用当前cookie")
-                            # 第3个选项不需要操作，继续使用当前cookie
-                        except KeyboardInterrupt:
-                            raise
-                        except Exception as e:
-                            logging.error(f"重试过程中出错: {e}")
-                    
-                    # 在失败后等待更短时间
-                    wait_time = random.uniform(5, 10)  # 减少等待时间到5-10秒
-                    logging.info(f"等待 {wait_time:.2f} 秒后再次检查...")
-                    time.sleep(wait_time)
-                    continue
-                
-                # 成功检查，重置失败计数
-                failed_attempts = 0
-                
-                if tasks:
-                    # 检查是否为Training Tasks格式，如果是，以表格形式显示
-                    has_training_format = False
-                    for task in tasks:
-                        if "Training Tasks\t" in task or any(task.startswith(specific) for specific in SPECIFIC_TRAINING_TASKS):
-                            has_training_format = True
-                            break
-                            
-                    if has_training_format:
-                        display_training_tasks_table(tasks)
-                    
-                    # 检查是否有新任务（排除第一次检查）
-                    has_new_tasks = is_first_check or any(task not in previous_tasks for task in tasks)
-                    
-                    if has_new_tasks and not is_first_check:
-                        task_count = len(tasks)
-                        # 判断是否有明确的任务或只是检测到变化
-                        if any("检测到Eligible Tasks部分有内容" in task for task in tasks) and task_count == 1:
-                            message = "Baseline网站中检测到Eligible Tasks部分有新内容，但无法识别具体任务。请查看网站。"
-                        elif any("检测到Eligible Tasks部分发生变化" in task for task in tasks) and task_count == 1:
-                            message = "Baseline网站中的Eligible Tasks部分发生了变化，可能有新任务。请查看网站。"
-                        # 添加对Training Tasks的特殊处理
-                        elif any("检测到Training Tasks" in task for task in tasks):
-                            training_count = sum(1 for task in tasks if "Training任务:" in task)
-                            if training_count > 0:
-                                message = f"发现{training_count}个Training Tasks！请查看网站查看详细内容。"
-                            else:
-                                message = "Baseline网站中的Training Tasks部分发生了变化，可能有新任务。请查看网站。"
-                        else:
-                            message = f"发现苹果Baseline页面有新任务！检测到 {task_count} 个任务。"
-                        
-                        # 先发送通知，确保桌面通知优先执行
-                        # 1. 发送通知
-                        send_notification(
-                            "Apple Baseline 任务提醒",
-                            message
-                        )
-                        
-                        # 2. 短暂延迟确保通知显示
-                        time.sleep(0.5)
-                        
-                        # 3. 打开浏览器新窗口
-                        open_new_browser_window()
-                        
-                        # 4. 播放语音
-                        speak_voice()
-                        
-                        # 打印任务信息
-                        logging.info("\n检测到以下任务:")
-                        for i, task in enumerate(tasks, 1):
-                            # 跳过标题行
-                            if "Training Tasks\tEvaluation\tIncomplete Tests" in task:
-                                continue
-                            logging.info(f"{i}. {task}")
-                    elif is_first_check and tasks:
-                        # 判断首次检查任务类型
-                        if any("首次检查发现" in task for task in tasks):
-                            # 如果是首次检查发现的Training Tasks，也显示通知
-                            training_count = sum(1 for task in tasks if "Training任务:" in task)
-                            message = f"首次检查发现{training_count}个Training Tasks！请查看网站了解详情。"
-                            
-                            # 发送通知
-                            send_notification(
-                                "Apple Baseline Training Tasks",
-                                message
-                            )
-                            
-                            # 短暂延迟确保通知显示
-                            time.sleep(0.5)
-                            
-                            # 打开浏览器新窗口
-                            open_new_browser_window()
-                            
-                            # 播放语音
-                            speak_voice()
-                            
-                            logging.info(f"\n首次检查发现 {training_count} 个Training Tasks:")
-                            task_messages = [task for task in tasks if "Training任务:" in task]
-                            for i, task in enumerate(task_messages, 1):
-                                logging.info(f"{i}. {task}")
-                        elif len(tasks) == 1 and (
-                           "检测到Eligible Tasks部分有内容" in tasks[0] or 
-                           "检测到Eligible Tasks部分发生变化" in tasks[0] or
-                           "检测到Training Tasks" in tasks[0]):
-                            logging.info(f"首次检查：{tasks[0]}，将在下次检查时比较变化")
-                        else:
-                            # 过滤掉标题行后再计算数量
-                            filtered_tasks = [task for task in tasks if "Training Tasks\tEvaluation\tIncomplete Tests" not in task]
-                            logging.info(f"\n首次检查发现 {len(filtered_tasks)} 个任务:")
-                            for i, task in enumerate(filtered_tasks, 1):
-                                logging.info(f"{i}. {task}")
-                    
-                    # 更新任务列表
-                    previous_tasks = tasks[:]
-                else:
-                    # 使用info级别，始终显示任务状态
-                    logging.info("未检测到任何任务或变化")
-                    
-                    # 如果启用了显示预期任务，即使未检测到变化也显示
-                    if config.get("display_expected", False) and config.get("check_training", True):
-                        logging.info("显示预期的Training Tasks列表:")
-                        display_training_tasks_table(["Training Tasks\tEvaluation\tIncomplete Tests"] + 
-                                                   [f"{task}\t{count}" for task, count in SPECIFIC_TASK_EXPECTED_COUNTS.items()])
-                    
-                    previous_tasks = []
-                
-                # 第一次检查完成
-                is_first_check = False
-                
-                # 等待随机时间后再次检查
-                interval = random.uniform(MIN_CHECK_INTERVAL, MAX_CHECK_INTERVAL)
-                # 保持为info级别，显示等待时间
-                logging.info(f"下次检查将在 {interval:.2f} 秒后进行...")
-                time.sleep(interval)
-                
-            except KeyboardInterrupt:
-                raise
-            except Exception as e:
-                logging.error(f"发生错误: {e}", exc_info=True)
-                speak_voice("检测到错误，请检查程序状态")  # 只在发生错误时提示
-                time.sleep(MIN_CHECK_INTERVAL)
+                metrics.serve(args.metrics_port)
+            except OSError as e:
+                logging.warning(f"无法在端口 {args.metrics_port} 提供指标: {e}")
+    
+    # 账号很多时在多个解析进程中解析页面
+    if args.parse_workers > 0:
+        parse_pool = ParseWorkerPool(args.parse_workers)
+        logging.info(f"已启动 {args.parse_workers} 个解析进程")
+    
+    # 轮询、提醒和操作台在事件循环中并行运行，提醒或登录提示不会推迟检查
+    monitor = AsyncMonitor(accounts, daemon=args.daemon, control_port=args.control_port)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
     
+    try:
+        loop.run_until_complete(monitor.run())
     except KeyboardInterrupt:
         logging.info("\n程序已停止")
     except Exception as e:
@@ -2232,10 +6111,17 @@ def main():
         speak_voice("程序发生严重错误，请检查日志")  # 只在发生严重错误时提示
     finally:
         # 确保清理资源
-        try:
-            pygame.mixer.quit()
-        except:
-            pass
+        monitor.close()
+        loop.close()
+        # 发完排队的通知、播放完排队的语音后关闭
+        notification_dispatcher.close()
+        audio_service.close()
+        for account in accounts:
+            account.session.close()
+        if check_history:
+            check_history.close()
+        if parse_pool:
+            parse_pool.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file